@@ -0,0 +1,44 @@
+from veides.sdk.stream_hub import AsyncStreamHubClient, AuthProperties, ConnectionProperties
+import asyncio
+import logging
+import argparse
+
+
+async def main(args):
+    client = AsyncStreamHubClient(
+        connection_properties=ConnectionProperties(host=args.host),
+        auth_properties=AuthProperties(
+            username=args.username,
+            token=args.token,
+        ),
+        log_level=logging.DEBUG
+    )
+
+    await client.connect()
+
+    async def on_event(agent, event):
+        print(agent, event)
+
+    # Set a coroutine handler for event
+    client.on_event(args.id, 'ready_to_rock', on_event)
+
+    try:
+        # Iterate over trails as they arrive
+        async for agent, trail in client.trails(args.id, 'uptime'):
+            print(agent, trail)
+    finally:
+        await client.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Example of connecting to Veides Stream Hub using asyncio")
+
+    parser.add_argument("-u", "--username", required=True, help="User's name")
+    parser.add_argument("-t", "--token", required=True, help="User's token")
+    parser.add_argument("-i", "--id", required=True, help="Agent's client id")
+    parser.add_argument("-H", "--host", required=True, help="Host to connect to")
+
+    try:
+        asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
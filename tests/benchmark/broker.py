@@ -0,0 +1,438 @@
+import asyncio
+import base64
+import hashlib
+import os
+import shutil
+import ssl
+import struct
+import subprocess
+import multiprocessing
+import tempfile
+
+from veides.sdk.stream_hub.topics import TopicTrie
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+CONNECT = 0x10
+PUBLISH = 0x30
+PUBACK = 0x40
+PUBREC = 0x50
+PUBREL = 0x60
+PUBCOMP = 0x70
+SUBSCRIBE = 0x80
+UNSUBSCRIBE = 0xA0
+PINGREQ = 0xC0
+DISCONNECT = 0xE0
+
+
+def openssl_available():
+    return shutil.which('openssl') is not None
+
+
+def create_certificate(directory, host='localhost'):
+    """
+    Generates a self-signed certificate for the host and stores it in directory as a hashed CA directory
+    entry, so the directory might be used as capath
+
+    :param directory: Directory to store the certificate and key in
+    :type directory: str
+    :param host: Hostname the certificate is issued for
+    :type host: str
+    :return tuple: (certificate path, key path)
+    """
+    cert = os.path.join(directory, 'broker.pem')
+    key = os.path.join(directory, 'broker.key')
+
+    subprocess.run(
+        [
+            'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+            '-keyout', key, '-out', cert, '-subj', '/CN={}'.format(host),
+            '-addext', 'subjectAltName=DNS:{},IP:127.0.0.1'.format(host),
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    cert_hash = subprocess.run(
+        ['openssl', 'x509', '-hash', '-noout', '-in', cert],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.decode('utf-8').strip()
+
+    shutil.copy(cert, os.path.join(directory, '{}.0'.format(cert_hash)))
+
+    return cert, key
+
+
+def _encode_length(length):
+    encoded = bytearray()
+
+    while True:
+        byte = length % 128
+        length //= 128
+
+        if length > 0:
+            byte |= 0x80
+
+        encoded.append(byte)
+
+        if length == 0:
+            return bytes(encoded)
+
+
+def _packet(header, body):
+    return bytes([header]) + _encode_length(len(body)) + body
+
+
+def _unmask(data, mask):
+    length = len(data)
+    key = int.from_bytes((mask * (length // 4 + 1))[:length], 'big')
+
+    return (int.from_bytes(data, 'big') ^ key).to_bytes(length, 'big')
+
+
+class _TcpStream(object):
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    async def read(self, n):
+        return await self._reader.readexactly(n)
+
+    def write(self, data):
+        self._writer.write(data)
+
+    def close(self):
+        self._writer.close()
+
+
+class _WebSocketStream(_TcpStream):
+    def __init__(self, reader, writer):
+        _TcpStream.__init__(self, reader, writer)
+
+        self._buffer = bytearray()
+
+    async def handshake(self):
+        request = await self._reader.readuntil(b'\r\n\r\n')
+        key = None
+
+        for line in request.decode('utf-8').split('\r\n')[1:]:
+            (name, _, value) = line.partition(':')
+
+            if name.strip().lower() == 'sec-websocket-key':
+                key = value.strip()
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('utf-8')).digest()).decode('utf-8')
+
+        self._writer.write((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            'Sec-WebSocket-Accept: {}\r\n'
+            'Sec-WebSocket-Protocol: mqtt\r\n\r\n'
+        ).format(accept).encode('utf-8'))
+
+    async def read(self, n):
+        while len(self._buffer) < n:
+            await self._read_frame()
+
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+
+        return data
+
+    def write(self, data):
+        length = len(data)
+
+        if length < 126:
+            header = struct.pack('!BB', 0x82, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x82, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x82, 127, length)
+
+        self._writer.write(header + data)
+
+    async def _read_frame(self):
+        (first, second) = await self._reader.readexactly(2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+
+        if length == 126:
+            (length,) = struct.unpack('!H', await self._reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack('!Q', await self._reader.readexactly(8))
+
+        mask = await self._reader.readexactly(4) if second & 0x80 else None
+        payload = await self._reader.readexactly(length)
+
+        if mask is not None and payload:
+            payload = _unmask(payload, mask)
+
+        if opcode == 0x8:
+            raise asyncio.IncompleteReadError(b'', None)
+
+        if opcode == 0x9:
+            self._writer.write(struct.pack('!BB', 0x8A, len(payload)) + payload)
+        elif opcode in (0x0, 0x1, 0x2):
+            self._buffer.extend(payload)
+
+
+class _Session(object):
+    def __init__(self, broker, stream):
+        self.broker = broker
+        self.stream = stream
+        self.filters = {}
+        self._mid = 0
+
+    def deliver(self, topic, payload, qos):
+        body = struct.pack('!H', len(topic)) + topic
+
+        if qos > 0:
+            self._mid = self._mid % 65535 + 1
+            body += struct.pack('!H', self._mid)
+
+        self.stream.write(_packet(PUBLISH | (qos << 1), body + payload))
+
+    async def run(self):
+        while True:
+            header = (await self.stream.read(1))[0]
+            length = 0
+            multiplier = 1
+
+            while True:
+                byte = (await self.stream.read(1))[0]
+                length += (byte & 0x7F) * multiplier
+                multiplier *= 128
+
+                if not byte & 0x80:
+                    break
+
+            body = await self.stream.read(length) if length else b''
+
+            if not self._handle(header, body):
+                return
+
+    def _handle(self, header, body):
+        packet_type = header & 0xF0
+
+        if packet_type == CONNECT:
+            self.stream.write(_packet(0x20, b'\x00\x00'))
+        elif packet_type == PUBLISH:
+            self._handle_publish(header, body)
+        elif packet_type == PUBREL:
+            self.stream.write(_packet(PUBCOMP, body[:2]))
+        elif packet_type == SUBSCRIBE:
+            self._handle_subscribe(body)
+        elif packet_type == UNSUBSCRIBE:
+            self._handle_unsubscribe(body)
+        elif packet_type == PINGREQ:
+            self.stream.write(_packet(0xD0, b''))
+        elif packet_type == DISCONNECT:
+            return False
+
+        return True
+
+    def _handle_publish(self, header, body):
+        qos = (header >> 1) & 0x03
+        (topic_length,) = struct.unpack_from('!H', body)
+        topic = body[2:2 + topic_length]
+        offset = 2 + topic_length
+
+        if qos > 0:
+            mid = body[offset:offset + 2]
+            offset += 2
+
+            self.stream.write(_packet(PUBACK if qos == 1 else PUBREC, mid))
+
+        self.broker.received.value += 1
+        self.broker.route(topic, body[offset:], qos)
+
+    def _handle_subscribe(self, body):
+        mid = body[:2]
+        offset = 2
+        granted = bytearray()
+
+        while offset < len(body):
+            (topic_length,) = struct.unpack_from('!H', body, offset)
+            topic_filter = body[offset + 2:offset + 2 + topic_length].decode('utf-8')
+            qos = min(body[offset + 2 + topic_length], 1)
+            offset += 3 + topic_length
+
+            self.filters[topic_filter] = qos
+            self.broker.subscribe(topic_filter, self, qos)
+            granted.append(qos)
+
+        self.stream.write(_packet(0x90, mid + bytes(granted)))
+
+    def _handle_unsubscribe(self, body):
+        offset = 2
+
+        while offset < len(body):
+            (topic_length,) = struct.unpack_from('!H', body, offset)
+            topic_filter = body[offset + 2:offset + 2 + topic_length].decode('utf-8')
+            offset += 2 + topic_length
+
+            self.filters.pop(topic_filter, None)
+            self.broker.unsubscribe(topic_filter, self)
+
+        self.stream.write(_packet(0xB0, body[:2]))
+
+
+class _Server(object):
+    def __init__(self, received):
+        self.received = received
+
+        self._subscriptions = TopicTrie()
+        self._sessions = set()
+
+    def route(self, topic, payload, qos):
+        for subscribers in self._subscriptions.match(topic.decode('utf-8')):
+            for session, granted_qos in list(subscribers.items()):
+                session.deliver(topic, payload, min(qos, granted_qos))
+
+    def subscribe(self, topic_filter, session, qos):
+        subscribers = self._subscriptions.get(topic_filter)
+
+        if subscribers is None:
+            subscribers = {}
+            self._subscriptions.add(topic_filter, subscribers)
+
+        subscribers[session] = qos
+
+    def unsubscribe(self, topic_filter, session):
+        subscribers = self._subscriptions.get(topic_filter)
+
+        if subscribers is not None:
+            subscribers.pop(session, None)
+
+    async def handle(self, reader, writer, transport):
+        if transport == 'websockets':
+            stream = _WebSocketStream(reader, writer)
+            await stream.handshake()
+        else:
+            stream = _TcpStream(reader, writer)
+
+        session = _Session(self, stream)
+        self._sessions.add(session)
+
+        try:
+            await session.run()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.discard(session)
+
+            for topic_filter in session.filters:
+                self.unsubscribe(topic_filter, session)
+
+            stream.close()
+
+
+def _serve(host, transport, cert, key, ports, received, stopping):
+    context = None
+
+    if cert is not None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+
+    server = _Server(received)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    listener = loop.run_until_complete(asyncio.start_server(
+        lambda reader, writer: server.handle(reader, writer, transport),
+        host,
+        0,
+        ssl=context
+    ))
+
+    ports.put(listener.sockets[0].getsockname()[1])
+
+    async def wait_for_stop():
+        while not stopping.is_set():
+            await asyncio.sleep(0.05)
+
+    loop.run_until_complete(wait_for_stop())
+
+    listener.close()
+
+    for session in list(server._sessions):
+        session.stream.close()
+
+    loop.run_until_complete(listener.wait_closed())
+    loop.close()
+
+
+class Broker(object):
+    def __init__(self, host='localhost', transport='websockets', tls=True):
+        """
+        Minimal MQTT 3.1.1 broker used as a local stand-in for Veides Stream Hub in benchmarks. Runs in a separate
+        process, so it doesn't compete with benchmarked client for GIL. QoS 2 is acknowledged, but delivered
+        to subscribers with QoS 1
+
+        :param host: Host to listen on
+        :type host: str
+        :param transport: 'websockets' or 'tcp'
+        :type transport: str
+        :param tls: Use TLS with a self-signed certificate generated on start (requires openssl)
+        :type tls: bool
+        """
+        self.host = host
+        self.transport = transport
+        self.tls = tls
+        self.port = None
+        self.capath = None
+
+        self._received = None
+        self._stopping = None
+        self._process = None
+        self._directory = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def received(self):
+        """
+        :return int: Number of messages published to the broker so far
+        """
+        return self._received.value
+
+    def start(self):
+        (cert, key) = (None, None)
+
+        if self.tls:
+            self._directory = tempfile.mkdtemp()
+            self.capath = self._directory
+
+            (cert, key) = create_certificate(self._directory, self.host)
+
+        context = multiprocessing.get_context('spawn')
+        ports = context.Queue()
+
+        self._received = context.Value('q', 0, lock=False)
+        self._stopping = context.Event()
+        self._process = context.Process(
+            target=_serve,
+            args=(self.host, self.transport, cert, key, ports, self._received, self._stopping),
+            daemon=True
+        )
+        self._process.start()
+
+        self.port = ports.get(timeout=30)
+
+    def stop(self):
+        self._stopping.set()
+        self._process.join(timeout=10)
+
+        if self._process.is_alive():
+            self._process.terminate()
+
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
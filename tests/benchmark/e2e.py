@@ -0,0 +1,188 @@
+import argparse
+import resource
+import threading
+import time
+
+from veides.sdk.stream_hub import StreamHubClient, AuthProperties, ConnectionProperties
+from tests.benchmark.broker import Broker
+from tests.benchmark.utils import report
+
+TIMESTAMP = '2021-01-01T12:00:00Z'
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def _percentile(values, percentile):
+    if not values:
+        return float('nan')
+
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(len(values) * percentile / 100.0))]
+
+
+def _connect(broker, name):
+    client = StreamHubClient(
+        AuthProperties(username=name, token='token'),
+        ConnectionProperties(host=broker.host, capath=broker.capath, transport=broker.transport, port=broker.port),
+        max_inflight_messages=1000
+    )
+    client.connect()
+
+    return client
+
+
+def run_scenario(broker, agents=100, messages=10000, rate=None, payload_size=64, qos=0, timeout=120):
+    """
+    Publishes trails of many agents to the broker with one client and receives them with another one,
+    subscribed to each agent separately
+
+    :param broker: Running broker
+    :type broker: Broker
+    :param agents: Number of agents (subscriptions)
+    :type agents: int
+    :param messages: Number of published trails
+    :type messages: int
+    :param rate: Target publish rate (trails per second). As fast as possible when None
+    :type rate: int|float
+    :param payload_size: Approximate size (in bytes) of a trail payload
+    :type payload_size: int
+    :param qos: QoS of published trails
+    :type qos: int
+    :param timeout: Maximum time (in seconds) to wait for trails
+    :type timeout: int|float
+    :return dict: subscribe_seconds, msgs_per_second, p50_ms, p99_ms, cpu_percent, cpu_us_per_message, max_rss_mb,
+        received
+    """
+    latencies = []
+    done = threading.Event()
+
+    def on_trail(agent, trail):
+        latencies.append(time.time() - trail.value)
+
+        if len(latencies) >= messages:
+            done.set()
+
+    subscriber = _connect(broker, 'subscriber')
+    publisher = _connect(broker, 'publisher')
+
+    try:
+        started = time.perf_counter()
+
+        with subscriber.subscription_batch():
+            for i in range(agents):
+                subscriber.on_trail(_agent(i), 'uptime', on_trail)
+
+        # Subscriptions are handled by the broker in order, so a probe trail of the last agent arrives
+        # once all of them are active
+        probe = threading.Event()
+        subscriber.on_trail(_agent(agents - 1), 'probe', lambda agent, trail: probe.set())
+
+        while not probe.is_set() and time.perf_counter() - started < timeout:
+            publisher._publish('agent/{}/trail/probe'.format(_agent(agents - 1)), {'value': 0, 'timestamp': TIMESTAMP})
+            probe.wait(0.05)
+
+        subscribe_seconds = time.perf_counter() - started
+
+        padding = 'x' * max(0, payload_size - 60)
+        topics = ['agent/{}/trail/uptime'.format(_agent(i)) for i in range(agents)]
+        interval = 1.0 / rate if rate else 0
+
+        cpu = time.process_time()
+        started = time.perf_counter()
+
+        for i in range(messages):
+            if interval:
+                delay = started + i * interval - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+            data = {'value': time.time(), 'timestamp': TIMESTAMP}
+
+            if padding:
+                data['padding'] = padding
+
+            publisher._publish(topics[i % agents], data, qos=qos)
+
+        done.wait(timeout)
+
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu
+    finally:
+        publisher.disconnect()
+        subscriber.disconnect()
+
+    return {
+        'subscribe_seconds': subscribe_seconds,
+        'msgs_per_second': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'cpu_percent': cpu / elapsed * 100,
+        # CPU time of both clients (publishing and receiving) per delivered trail
+        'cpu_us_per_message': cpu / max(1, len(latencies)) * 1e6,
+        # ru_maxrss is reported in kilobytes on Linux
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'received': len(latencies),
+    }
+
+
+def report_scenarios(title, scenarios):
+    """
+    :param title: Table title
+    :type title: str
+    :param scenarios: (parameters, result of run_scenario()) tuples
+    :type scenarios: list
+    :return void
+    """
+    rows = []
+
+    for (parameters, result) in scenarios:
+        rows.append((
+            parameters.get('agents'),
+            parameters.get('rate') or 'max',
+            parameters.get('payload_size'),
+            parameters.get('qos'),
+            '%.3f' % result['subscribe_seconds'],
+            '%.0f' % result['msgs_per_second'],
+            '%.2f' % result['p50_ms'],
+            '%.2f' % result['p99_ms'],
+            '%.0f' % result['cpu_percent'],
+            '%.1f' % result['max_rss_mb'],
+        ))
+
+    report(
+        title,
+        ['agents', 'rate', 'payload', 'qos', 'subscribe s', 'msgs/s', 'p50 ms', 'p99 ms', 'cpu %', 'max rss MB'],
+        rows
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end StreamHubClient benchmark against a local broker')
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=None, help='trails per second, as fast as possible if not set')
+    parser.add_argument('--payload-size', type=int, default=64)
+    parser.add_argument('--qos', type=int, default=0, choices=(0, 1))
+    parser.add_argument('--transport', default='websockets', choices=('websockets', 'tcp'))
+    arguments = parser.parse_args()
+
+    parameters = {
+        'agents': arguments.agents,
+        'messages': arguments.messages,
+        'rate': arguments.rate,
+        'payload_size': arguments.payload_size,
+        'qos': arguments.qos,
+    }
+
+    with Broker(transport=arguments.transport) as broker:
+        result = run_scenario(broker, **parameters)
+
+    report_scenarios('End-to-end (%s)' % arguments.transport, [(parameters, result)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import pytest
+from veides.sdk.stream_hub import StreamHubClient, AuthProperties, ConnectionProperties
+from tests.benchmark.broker import Broker, openssl_available
+
+
+@pytest.fixture(scope='module')
+def broker():
+    if not openssl_available():
+        pytest.skip('openssl is required to run local broker with TLS')
+
+    with Broker() as broker:
+        yield broker
+
+
+def connect_client(broker, client_class=StreamHubClient, **kwargs):
+    """
+    Returns client connected to the local broker
+
+    :param broker: Running broker
+    :type broker: Broker
+    :param client_class: Client class
+    :param kwargs: Additional client arguments
+    :return StreamHubClient
+    """
+    client = client_class(
+        AuthProperties(username='benchmark', token='token'),
+        ConnectionProperties(host=broker.host, capath=broker.capath, transport=broker.transport, port=broker.port),
+        **kwargs
+    )
+    client.connect()
+
+    return client
@@ -0,0 +1,39 @@
+import sys
+import pytest
+from veides.sdk.stream_hub import RollingAggregator
+from veides.sdk.stream_hub.aggregation import MINUTE
+from tests.benchmark.utils import measure, report
+
+pytestmark = pytest.mark.benchmark
+
+SERIES = 20000
+NOW = 1609502400
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def test_rolling_aggregator_cost():
+    aggregator = RollingAggregator()
+    keys = [(_agent(i), 'temperature') for i in range(SERIES)]
+
+    for (agent, name) in keys:
+        aggregator.add(agent, name, 20.5, NOW)
+
+    series = aggregator._series[keys[0]]
+    size = sys.getsizeof(series) + sys.getsizeof(series.epochs) + sys.getsizeof(series.stats)
+
+    agent = _agent(SERIES // 2)
+    batch = keys[:1000]
+
+    add = measure(lambda: aggregator.add(agent, 'temperature', 21.5, NOW), 50000)
+    stats = measure(lambda: aggregator.stats(agent, 'temperature', MINUTE, at=NOW), 50000)
+    stats_many = measure(lambda: aggregator.stats_many(batch, MINUTE, at=NOW), 50) / len(batch)
+
+    report('RollingAggregator (%d series, windows=%s)' % (SERIES, aggregator.windows), ['operation', 'value'], [
+        ('add (us)', '%.3f' % (add * 1e6)),
+        ('stats (us)', '%.3f' % (stats * 1e6)),
+        ('stats_many (us/series)', '%.3f' % (stats_many * 1e6)),
+        ('series size (bytes)', size),
+    ])
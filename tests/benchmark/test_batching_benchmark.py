@@ -0,0 +1,30 @@
+import pytest
+from tests.benchmark.utils import measure, report
+from tests.unit.fixtures import (
+    message,
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_trail_batch_delivery_vs_per_trail_callbacks(agent_client_id, connected_client):
+    msg = message(agent_client_id, 'trail', 'temperature', 21.5)
+    total = []
+
+    connected_client.on_trail(agent_client_id, 'temperature', lambda agent, trail: total.append(trail.value))
+    per_trail = measure(lambda: connected_client._on_trail(None, None, msg), 10000)
+
+    connected_client.on_trail_batch(agent_client_id, 'temperature', lambda batch: total.append(sum(batch.values)),
+                                    max_messages=1000)
+    batched = measure(lambda: connected_client._on_trail(None, None, msg), 10000)
+
+    report('Trail delivery', ['mode', 'us/trail', 'trails/s'], [
+        ('on_trail', '%.3f' % (per_trail * 1e6), '%d' % (1 / per_trail)),
+        ('on_trail_batch', '%.3f' % (batched * 1e6), '%d' % (1 / batched)),
+    ])
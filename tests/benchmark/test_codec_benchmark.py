@@ -0,0 +1,21 @@
+import json
+import pytest
+from tests.benchmark.utils import measure, report
+from tests.unit.test_stream_hub_codec import available_codecs
+
+pytestmark = pytest.mark.benchmark
+
+PAYLOAD = json.dumps({'value': 21.5, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+DATA = {'value': 21.5, 'timestamp': '2021-01-01T12:00:00Z'}
+
+
+def test_codecs():
+    rows = []
+
+    for codec in available_codecs():
+        decode = measure(lambda: codec.decode_trail(PAYLOAD), 20000)
+        encode = measure(lambda: codec.encode(DATA), 20000)
+
+        rows.append((codec.name, '%.3f' % (decode * 1e6), '%.3f' % (encode * 1e6)))
+
+    report('JSON codecs', ['codec', 'us/decode_trail', 'us/encode'], rows)
@@ -0,0 +1,42 @@
+import os
+import ssl
+import pytest
+from veides.sdk.stream_hub import StreamHubClient, AuthProperties, ConnectionProperties
+from veides.sdk.stream_hub.tls import invalidate_ssl_contexts
+from tests.benchmark.utils import measure, report
+
+pytestmark = pytest.mark.benchmark
+
+CLIENTS = 200
+
+CAFILE = ssl.get_default_verify_paths().cafile or '/etc/ssl/certs/ca-certificates.crt'
+
+
+def _construct(connection_properties, shared):
+    def construct():
+        if not shared:
+            invalidate_ssl_contexts()
+
+        StreamHubClient(AuthProperties(username='name', token='token'), connection_properties)
+
+    return construct
+
+
+@pytest.mark.skipif(not os.path.exists(CAFILE), reason='no CA bundle')
+def test_client_construction_time():
+    rows = []
+
+    for (certificates, connection_properties) in (
+        ('capath', ConnectionProperties(host='localhost')),
+        ('cafile', ConnectionProperties(host='localhost', capath=None, cafile=CAFILE)),
+    ):
+        for shared in (False, True):
+            cost = measure(_construct(connection_properties, shared), CLIENTS)
+
+            rows.append((certificates, shared, '%.1f' % (cost * 1e6), '%.1f' % (cost * CLIENTS * 1e3)))
+
+    report(
+        'StreamHubClient construction',
+        ['certificates', 'shared context', 'us/client', 'ms/%d clients' % CLIENTS],
+        rows
+    )
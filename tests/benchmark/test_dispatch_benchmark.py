@@ -0,0 +1,177 @@
+import json
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.metrics import MetricsRegistry
+from veides.sdk.stream_hub.client import _DispatchMetrics
+from veides.sdk.stream_hub.models import Timestamp
+from veides.sdk.stream_hub.reorder import ReorderBuffer
+from veides.sdk.stream_hub.throttling import Throttle
+from veides.sdk.stream_hub.filters import Deadband, Range
+from veides.sdk.stream_hub.topics import TopicTrie
+from tests.benchmark.utils import measure, report
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    username,
+    token,
+    hostname
+)
+
+pytestmark = pytest.mark.benchmark
+
+HANDLER_COUNTS = [1, 100, 1000, 10000]
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def test_topic_trie_match_cost_should_not_grow_with_number_of_handlers():
+    rows = []
+
+    for count in HANDLER_COUNTS:
+        trie = TopicTrie()
+
+        for i in range(count):
+            trie.add('agent/{}/trail/uptime'.format(_agent(i)), i)
+
+        trie.add('agent/+/trail/#', -1)
+
+        topic = 'agent/{}/trail/uptime'.format(_agent(count - 1))
+        cost = measure(lambda: trie.match(topic), 20000)
+
+        rows.append((count, '%.3f' % (cost * 1e6)))
+
+    report('Topic trie match', ['handlers', 'us/match'], rows)
+
+
+def test_stream_hub_client_dispatch_cost_per_trail(connected_client):
+    rows = []
+
+    for count in HANDLER_COUNTS:
+        connected_client._handlers = TopicTrie()
+
+        for i in range(count):
+            connected_client._handlers.add('agent/{}/trail/uptime'.format(_agent(i)), lambda *_: None)
+
+        msg = MQTTMessage()
+        msg.topic = 'agent/{}/trail/uptime'.format(_agent(count - 1)).encode('utf-8')
+        msg.payload = json.dumps({'value': 12, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+        cost = measure(lambda: connected_client._on_trail(None, None, msg), 5000)
+
+        rows.append((count, '%.3f' % (cost * 1e6)))
+
+    report('StreamHubClient._on_trail', ['handlers', 'us/message'], rows)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_stream_hub_client_dispatch_cost_of_filtered_out_trail(lazy, connected_client):
+    connected_client._handlers = TopicTrie()
+    connected_client.on_trail('+', 'uptime', lambda agent, trail: None, lazy=lazy)
+
+    msg = MQTTMessage()
+    msg.topic = 'agent/{}/trail/uptime'.format(_agent(1)).encode('utf-8')
+    msg.payload = json.dumps({'value': 12, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    cost = measure(lambda: connected_client._on_trail(None, None, msg), 20000)
+
+    report('Filtered out trail', ['lazy', 'us/message'], [(lazy, '%.3f' % (cost * 1e6))])
+
+
+def test_stream_hub_client_dispatch_cost_with_metrics(connected_client):
+    connected_client._handlers = TopicTrie()
+    connected_client.on_trail('+', 'uptime', lambda agent, trail: None)
+
+    msg = MQTTMessage()
+    msg.topic = 'agent/{}/trail/uptime'.format(_agent(1)).encode('utf-8')
+    msg.payload = json.dumps({'value': 12, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    disabled = measure(lambda: connected_client._on_trail(None, None, msg), 20000)
+
+    connected_client._trail_metrics = _DispatchMetrics(MetricsRegistry(), 'trail')
+    enabled = measure(lambda: connected_client._on_trail(None, None, msg), 20000)
+
+    report('Metrics overhead', ['metrics', 'us/message'], [
+        ('disabled', '%.3f' % (disabled * 1e6)),
+        ('enabled', '%.3f' % (enabled * 1e6)),
+    ])
+
+
+def test_stream_hub_client_dispatch_cost_with_reorder_buffer(connected_client):
+    connected_client._handlers = TopicTrie()
+    connected_client.on_trail('+', 'uptime', lambda agent, trail: None)
+
+    messages = []
+
+    for i in range(20000):
+        msg = MQTTMessage()
+        msg.topic = 'agent/{}/trail/uptime'.format(_agent(i % 100)).encode('utf-8')
+        # Every 10th trail arrives 2 seconds late
+        timestamp = Timestamp.from_epoch(1609502400 + i // 100 - (2 if i % 10 == 0 else 0))
+        msg.payload = json.dumps({'value': i, 'timestamp': str(timestamp)}).encode('utf-8')
+        messages.append(msg)
+
+    def dispatch():
+        for msg in messages:
+            connected_client._on_trail(None, None, msg)
+
+    rows = []
+
+    for buffer in [None, ReorderBuffer(lateness=5)]:
+        connected_client._reorder_buffer = buffer
+        cost = measure(dispatch, 1) / len(messages)
+
+        rows.append(('off' if buffer is None else 'lateness=5', '%.3f' % (cost * 1e6)))
+
+    report('StreamHubClient._on_trail with reorder buffer', ['reorder', 'us/message'], rows)
+
+
+def test_stream_hub_client_dispatch_cost_with_throttle(connected_client):
+    msg = MQTTMessage()
+    msg.topic = 'agent/{}/trail/uptime'.format(_agent(1)).encode('utf-8')
+    msg.payload = json.dumps({'value': 12, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    rows = []
+
+    # Suppressing throttles pass only the first trail, so measured cost is the cost of a dropped trail
+    for (label, throttle) in [
+        ('none', None),
+        ('max_rate=1 (suppressed)', Throttle(max_rate=1)),
+        ('sample_every=1000000 (suppressed)', Throttle(sample_every=1000000)),
+        ('coalesce (delivered)', Throttle(coalesce=True)),
+    ]:
+        connected_client._handlers = TopicTrie()
+        connected_client.on_trail('+', 'uptime', lambda agent, trail: None, throttle=throttle)
+        connected_client._on_trail(None, None, msg)
+
+        cost = measure(lambda: connected_client._on_trail(None, None, msg), 20000)
+
+        rows.append((label, '%.3f' % (cost * 1e6)))
+
+    report('StreamHubClient._on_trail with throttle', ['throttle', 'us/message'], rows)
+
+
+def test_stream_hub_client_dispatch_cost_with_filters(connected_client):
+    msg = MQTTMessage()
+    msg.topic = 'agent/{}/trail/uptime'.format(_agent(1)).encode('utf-8')
+    msg.payload = json.dumps({'value': 12, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    rows = []
+
+    for (label, filters) in [
+        ('none', None),
+        ('Range (rejected)', [Range(min_value=100)]),
+        ('Deadband (rejected)', [Deadband(delta=1)]),
+        ('Range, Deadband (rejected)', [Range(min_value=0), Deadband(delta=1)]),
+        ('Range (passed)', [Range(min_value=0)]),
+    ]:
+        connected_client._handlers = TopicTrie()
+        connected_client.on_trail('+', 'uptime', lambda agent, trail: None, filters=filters)
+        connected_client._on_trail(None, None, msg)
+
+        cost = measure(lambda: connected_client._on_trail(None, None, msg), 20000)
+
+        rows.append((label, '%.3f' % (cost * 1e6)))
+
+    report('StreamHubClient._on_trail with filters', ['filters', 'us/message'], rows)
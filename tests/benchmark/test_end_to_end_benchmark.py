@@ -0,0 +1,28 @@
+import pytest
+from tests.benchmark.e2e import run_scenario, report_scenarios
+from tests.benchmark.fixtures import broker
+
+pytestmark = pytest.mark.benchmark
+
+# Run other scenarios with `python -m tests.benchmark.e2e --agents ... --rate ... --payload-size ...`
+SCENARIOS = [
+    {'agents': 10, 'rate': None, 'payload_size': 64, 'qos': 0},
+    {'agents': 1000, 'rate': None, 'payload_size': 64, 'qos': 0},
+    {'agents': 1000, 'rate': None, 'payload_size': 1024, 'qos': 0},
+    {'agents': 1000, 'rate': None, 'payload_size': 64, 'qos': 1},
+    {'agents': 1000, 'rate': 2000, 'payload_size': 64, 'qos': 1},
+]
+
+MESSAGES = 10000
+
+
+def test_end_to_end_throughput_and_latency(broker):
+    results = []
+
+    for parameters in SCENARIOS:
+        result = run_scenario(broker, messages=MESSAGES, **parameters)
+        results.append((parameters, result))
+
+        assert result['received'] == MESSAGES
+
+    report_scenarios('End-to-end (%d trails per scenario)' % MESSAGES, results)
@@ -0,0 +1,46 @@
+import re
+import subprocess
+import sys
+import pytest
+from tests.benchmark.utils import report
+
+pytestmark = pytest.mark.benchmark
+
+IMPORTS = [
+    'veides.sdk.stream_hub.models',
+    'veides.sdk.api',
+    'veides.sdk.api.client',
+    'veides.sdk.stream_hub',
+    'veides.sdk.stream_hub.client',
+]
+
+REPEAT = 5
+
+
+def _import_time(module):
+    """
+    :return int: Best cumulative import time (in us) of module in a fresh interpreter, as reported by -X importtime
+    """
+    best = None
+
+    for _ in range(REPEAT):
+        output = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+            stderr=subprocess.PIPE,
+            check=True
+        ).stderr.decode('utf-8')
+
+        # Lines look like "import time:   self [us] | cumulative | imported package"
+        match = re.search(r'^import time:\s+\d+ \|\s+(\d+) \| %s$' % re.escape(module), output, re.MULTILINE)
+        cumulative = int(match.group(1))
+
+        if best is None or cumulative < best:
+            best = cumulative
+
+    return best
+
+
+def test_import_time():
+    rows = [(module, '%.1f' % (_import_time(module) / 1000.0)) for module in IMPORTS]
+
+    report('Import time (python -X importtime, best of %d)' % REPEAT, ['module', 'ms'], rows)
@@ -0,0 +1,33 @@
+import pytest
+from veides.sdk.stream_hub import LatestValueCache
+from tests.benchmark.utils import measure, report
+
+pytestmark = pytest.mark.benchmark
+
+ENTRIES = 100000
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+@pytest.mark.parametrize('ttl', [None, 60])
+def test_latest_value_cache_cost(ttl):
+    cache = LatestValueCache(max_entries=ENTRIES, ttl=ttl)
+    keys = [(_agent(i), 'uptime') for i in range(ENTRIES)]
+
+    for (agent, name) in keys:
+        cache.put(agent, name, 1)
+
+    agent = _agent(ENTRIES // 2)
+    batch = keys[:1000]
+
+    put = measure(lambda: cache.put(agent, 'uptime', 2), 50000)
+    get = measure(lambda: cache.get(agent, 'uptime'), 50000)
+    get_many = measure(lambda: cache.get_many(batch), 200) / len(batch)
+
+    report('LatestValueCache (%d entries, ttl=%s)' % (ENTRIES, ttl), ['operation', 'us/entry'], [
+        ('put', '%.3f' % (put * 1e6)),
+        ('get', '%.3f' % (get * 1e6)),
+        ('get_many', '%.3f' % (get_many * 1e6)),
+    ])
@@ -0,0 +1,80 @@
+import sys
+import tracemalloc
+import pytest
+from veides.sdk.stream_hub.models import Trail, Timestamp, epoch_seconds, _parse_timestamp, _split_timestamp
+from tests.benchmark.utils import measure, report
+
+pytestmark = pytest.mark.benchmark
+
+TIMESTAMP = '2021-01-01T12:00:00Z'
+
+
+def test_timestamp_parsing():
+    strptime = measure(lambda: Timestamp.strptime(TIMESTAMP, '%Y-%m-%dT%H:%M:%SZ'), 20000)
+    uncached = measure(lambda: Timestamp(*_split_timestamp(TIMESTAMP)), 20000)
+    cached = measure(lambda: Timestamp.from_string(TIMESTAMP), 20000)
+    epoch = measure(lambda: epoch_seconds(TIMESTAMP), 20000)
+
+    report('Timestamp parsing', ['parser', 'us/timestamp'], [
+        ('strptime', '%.3f' % (strptime * 1e6)),
+        ('fixed format', '%.3f' % (uncached * 1e6)),
+        ('fixed format, cached', '%.3f' % (cached * 1e6)),
+        ('epoch seconds, cached', '%.3f' % (epoch * 1e6)),
+    ])
+
+
+def test_timestamp_parsing_with_distinct_seconds():
+    timestamps = [str(Timestamp.from_epoch(1609459200 + i)) for i in range(20000)]
+    iterator = iter(timestamps * 3)
+
+    _parse_timestamp.cache_clear()
+    distinct = measure(lambda: Timestamp.from_string(next(iterator)), 20000)
+
+    report('Timestamp parsing (cache misses)', ['parser', 'us/timestamp'], [
+        ('fixed format, cached', '%.3f' % (distinct * 1e6)),
+    ])
+
+
+class DictTrail(object):
+    def __init__(self, name, value, timestamp):
+        if not any([isinstance(value, t) for t in [str, float, int]]):
+            raise TypeError()
+
+        self.name = name
+        self.value = value
+        self.timestamp = timestamp
+
+
+def _memory_per_object(factory, count=10000):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # List of references is not a part of object's size
+    allocated -= sys.getsizeof(objects)
+
+    return allocated / count
+
+
+def test_trail_memory_and_construction_rate():
+    timestamp = Timestamp.from_string(TIMESTAMP)
+
+    rows = []
+
+    for label, factory in [
+        ('__dict__ (previous)', lambda i: DictTrail('name', i, timestamp)),
+        ('__slots__', lambda i: Trail('name', i, timestamp)),
+        ('__slots__, trusted', lambda i: Trail._trusted('name', i, timestamp)),
+    ]:
+        cost = measure(lambda: factory(1), 20000)
+        memory = _memory_per_object(factory)
+
+        rows.append((label, '%.3f' % (cost * 1e6), '%d' % (1 / cost), '%.0f' % memory))
+
+    report('Trail construction', ['model', 'us/object', 'objects/s', 'bytes/object'], rows)
+
+    assert sys.getsizeof(Trail('name', 1, timestamp)) < sys.getsizeof(DictTrail('name', 1, timestamp)) + \
+        sys.getsizeof(DictTrail('name', 1, timestamp).__dict__)
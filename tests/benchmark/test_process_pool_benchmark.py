@@ -0,0 +1,56 @@
+import os
+import time
+import pytest
+from veides.sdk.stream_hub import ProcessHandlerPool
+from veides.sdk.stream_hub.models import Trail
+from tests.benchmark.utils import report
+
+pytestmark = pytest.mark.benchmark
+
+TRAILS = 2000
+AGENTS = 64
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def score(agent, trail):
+    """
+    Stand-in for CPU-bound feature extraction, about 100us of pure Python work
+    """
+    total = 0
+
+    for i in range(1000):
+        total += (i * trail.value) % 7
+
+    return total
+
+
+def test_process_pool_throughput_of_cpu_bound_handler():
+    trails = [(_agent(i % AGENTS), Trail('uptime', i, 1609502400)) for i in range(TRAILS)]
+    rows = []
+
+    start = time.perf_counter()
+
+    for (agent, trail) in trails:
+        score(agent, trail)
+
+    rows.append(('in-thread', '%.0f' % (TRAILS / (time.perf_counter() - start))))
+
+    for workers in (1, 2, 4):
+        pool = ProcessHandlerPool(workers=workers)
+        handler_id = pool.register(score)
+        pool.start()
+
+        start = time.perf_counter()
+
+        for (agent, trail) in trails:
+            pool.submit(handler_id, agent, trail)
+
+        # Waits until workers handle all trails
+        pool.shutdown()
+
+        rows.append(('%d workers' % workers, '%.0f' % (TRAILS / (time.perf_counter() - start))))
+
+    report('CPU-bound trail handler (%d trails, %d CPUs)' % (TRAILS, os.cpu_count()), ['execution', 'trails/s'], rows)
@@ -0,0 +1,61 @@
+import time
+import pytest
+from concurrent.futures import wait
+from tests.benchmark.utils import report
+from tests.benchmark.fixtures import broker, connect_client
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGES = 20000
+
+DATA = {'value': 12.5, 'timestamp': '2021-01-01T12:00:00Z'}
+
+
+def _wait_received(broker, count, timeout=60):
+    deadline = time.monotonic() + timeout
+
+    while broker.received < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    assert broker.received >= count
+
+
+def _blocking(client, qos):
+    for i in range(MESSAGES):
+        client._publish('benchmark/%d' % (i % 100), DATA, qos=qos)
+
+
+def _publish(client, qos):
+    futures = [client.publish('benchmark/%d' % (i % 100), DATA, qos=qos) for i in range(MESSAGES)]
+    wait(futures)
+
+    assert all(f.result() for f in futures)
+
+
+def _publish_many(client, qos):
+    futures = client.publish_many((('benchmark/%d' % (i % 100), DATA) for i in range(MESSAGES)), qos=qos)
+    wait(futures)
+
+    assert all(f.result() for f in futures)
+
+
+@pytest.mark.parametrize('max_inflight_messages', [20, 1000])
+def test_publish_throughput(broker, max_inflight_messages):
+    client = connect_client(broker, max_inflight_messages=max_inflight_messages)
+    rows = []
+
+    try:
+        for qos in (0, 1):
+            for (name, func) in (('_publish', _blocking), ('publish', _publish), ('publish_many', _publish_many)):
+                expected = broker.received + MESSAGES
+                start = time.perf_counter()
+
+                func(client, qos)
+                _wait_received(broker, expected)
+
+                elapsed = time.perf_counter() - start
+                rows.append((name, qos, '%.0f' % (MESSAGES / elapsed)))
+    finally:
+        client.disconnect()
+
+    report('Publish throughput (max_inflight_messages=%d)' % max_inflight_messages, ['method', 'qos', 'msgs/s'], rows)
@@ -0,0 +1,49 @@
+import json
+import time
+import pytest
+from veides.sdk.stream_hub import TrafficRecorder, TrafficReplayer
+from tests.benchmark.utils import measure, report
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    username,
+    token,
+    hostname
+)
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGES = 100000
+AGENTS = 100
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def test_record_and_replay_throughput(tmpdir, connected_client):
+    recorder = TrafficRecorder(str(tmpdir))
+    payload = json.dumps({'value': 12.5, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+    topics = ['agent/{}/trail/uptime'.format(_agent(i)) for i in range(AGENTS)]
+    counter = iter(range(10 ** 9))
+
+    record = measure(lambda: recorder.record(topics[next(counter) % AGENTS], payload), MESSAGES, repeat=1)
+    recorder.close()
+
+    replayer = TrafficReplayer(str(tmpdir))
+
+    start = time.perf_counter()
+    read = sum(1 for _ in replayer.messages())
+    read_rate = read / (time.perf_counter() - start)
+
+    connected_client.on_trail('+', 'uptime', lambda agent, trail: None)
+
+    start = time.perf_counter()
+    replayed = replayer.replay(connected_client)
+    replay_rate = replayed / (time.perf_counter() - start)
+
+    report('Traffic recording (%d messages)' % MESSAGES, ['operation', 'value'], [
+        ('record (us/message)', '%.3f' % (record * 1e6)),
+        ('read (msgs/s)', '%.0f' % read_rate),
+        ('replay to handler (msgs/s)', '%.0f' % replay_rate),
+    ])
@@ -0,0 +1,84 @@
+import multiprocessing
+import threading
+import time
+import pytest
+from veides.sdk.stream_hub import ShardedStreamHubClient
+from tests.benchmark.utils import report
+from tests.benchmark.fixtures import broker, connect_client
+
+pytestmark = pytest.mark.benchmark
+
+AGENTS = 64
+MESSAGES = 20000
+
+DATA = {'value': 12.5, 'timestamp': '2021-01-01T12:00:00Z'}
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def _publish(host, port, capath, count):
+    """
+    Publishes trails of many agents from a separate process, so publishing doesn't compete with
+    receiving shards for GIL
+    """
+    from veides.sdk.stream_hub import StreamHubClient, AuthProperties, ConnectionProperties
+    from concurrent.futures import wait
+
+    client = StreamHubClient(
+        AuthProperties(username='publisher', token='token'),
+        ConnectionProperties(host=host, capath=capath, port=port),
+        max_inflight_messages=1000
+    )
+    client.connect()
+
+    futures = [client.publish('agent/{}/trail/uptime'.format(_agent(i % AGENTS)), DATA, qos=0) for i in range(count)]
+    wait(futures)
+
+    client.disconnect()
+
+
+@pytest.mark.parametrize('shards', [1, 2, 4])
+def test_sharded_client_ingest_throughput(broker, shards):
+    client = connect_client(broker, ShardedStreamHubClient, shards=shards)
+    received = [0]
+    first = [None]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def on_trail(agent, trail):
+        with lock:
+            if first[0] is None:
+                first[0] = time.perf_counter()
+
+            received[0] += 1
+
+            if received[0] >= MESSAGES:
+                done.set()
+
+    try:
+        for i in range(AGENTS):
+            client.on_trail(_agent(i), 'uptime', on_trail)
+
+        # Wait for SUBACKs, so no message is published before subscriptions are active
+        time.sleep(0.5)
+
+        publisher = multiprocessing.get_context('spawn').Process(
+            target=_publish,
+            args=(broker.host, broker.port, broker.capath, MESSAGES)
+        )
+        publisher.start()
+
+        done.wait(timeout=120)
+        # Measured from the first received trail, so process start is not included
+        elapsed = time.perf_counter() - first[0]
+        publisher.join()
+    finally:
+        client.disconnect()
+
+    assert received[0] == MESSAGES
+
+    report('Sharded client ingest (%d agents)' % AGENTS, ['shards', 'msgs/s'], [
+        (shards, '%.0f' % (MESSAGES / elapsed)),
+    ])
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+import pytest
+from veides.sdk.stream_hub import FileSink
+from veides.sdk.stream_hub.codec import OrjsonCodec
+from veides.sdk.stream_hub.models import Trail, Timestamp
+from tests.benchmark.utils import report
+
+pytestmark = pytest.mark.benchmark
+
+RECORDS = 200000
+
+TIMESTAMP = Timestamp.from_string('2021-01-01T12:00:00Z')
+
+
+def _agent(i):
+    return '{:032d}'.format(i)
+
+
+def _callback(path, flush):
+    """
+    Per-message callback archiving trails on its own
+    """
+    file = open(path, 'a')
+
+    def callback(agent, trail):
+        file.write(json.dumps({
+            'type': 'trail',
+            'agent': agent,
+            'name': trail.name,
+            'value': trail.value,
+            'timestamp': str(trail.timestamp),
+        }) + '\n')
+
+        if flush:
+            file.flush()
+
+    return callback, file.close
+
+
+def _sink(directory, **kwargs):
+    sink = FileSink(directory, **kwargs)
+
+    return sink, sink.close
+
+
+def _writers():
+    writers = [
+        ('callback, write', lambda d: _callback(os.path.join(d, 'out.ndjson'), False)),
+        ('callback, write + flush', lambda d: _callback(os.path.join(d, 'out.ndjson'), True)),
+        ('FileSink ndjson', lambda d: _sink(d)),
+        ('FileSink csv', lambda d: _sink(d, file_format='csv')),
+        ('FileSink ndjson gzip', lambda d: _sink(d, compress=True, compress_level=1)),
+    ]
+
+    try:
+        codec = OrjsonCodec()
+    except ImportError:
+        return writers
+
+    return writers + [('FileSink ndjson orjson', lambda d: _sink(d, codec=codec))]
+
+
+def test_sustained_write_throughput(tmpdir):
+    agents = [_agent(i) for i in range(100)]
+    trails = [Trail('uptime', i, TIMESTAMP) for i in range(RECORDS)]
+    rows = []
+
+    for (label, factory) in _writers():
+        directory = str(tmpdir.mkdir(label.replace(' ', '_').replace(',', '').replace('+', 'and')))
+        (callback, close) = factory(directory)
+
+        started = time.perf_counter()
+
+        for i in range(RECORDS):
+            callback(agents[i % 100], trails[i])
+
+        # Time spent in callbacks, i.e. in the dispatch path
+        dispatch = time.perf_counter() - started
+
+        close()
+
+        total = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        rows.append((
+            label,
+            '%.3f' % (dispatch / RECORDS * 1e6),
+            '%.0f' % (RECORDS / total),
+            '%.1f' % (size / 1024.0 / 1024.0),
+        ))
+
+    report('Archiving %d trails' % RECORDS, ['writer', 'us/callback', 'records/s (to disk)', 'MB'], rows)
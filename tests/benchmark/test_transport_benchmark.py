@@ -0,0 +1,27 @@
+import pytest
+from tests.benchmark.broker import Broker
+from tests.benchmark.e2e import run_scenario
+from tests.benchmark.utils import report
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGES = 10000
+
+
+def test_cpu_per_message_by_transport():
+    rows = []
+
+    for transport in ('websockets', 'tcp'):
+        with Broker(transport=transport) as broker:
+            result = run_scenario(broker, agents=100, messages=MESSAGES, payload_size=64, qos=0)
+
+        assert result['received'] == MESSAGES
+
+        rows.append((
+            transport,
+            '%.1f' % result['cpu_us_per_message'],
+            '%.0f' % result['msgs_per_second'],
+            '%.2f' % result['p50_ms'],
+        ))
+
+    report('Transport (%d trails, TLS)' % MESSAGES, ['transport', 'cpu us/msg', 'msgs/s', 'p50 ms'], rows)
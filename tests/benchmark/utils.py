@@ -0,0 +1,50 @@
+import time
+
+
+def measure(func, number, repeat=3):
+    """
+    Returns the best time (in seconds) of a single call of func
+
+    :param func: Benchmarked callable
+    :type func: callable
+    :param number: Number of calls in a single round
+    :type number: int
+    :param repeat: Number of rounds
+    :type repeat: int
+    :return float
+    """
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for _ in range(number):
+            func()
+
+        elapsed = (time.perf_counter() - start) / number
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def report(title, header, rows):
+    """
+    Prints benchmark results as a table (use `pytest -s` to see it)
+
+    :param title: Table title
+    :type title: str
+    :param header: Column names
+    :type header: list
+    :param rows: Table rows
+    :type rows: list
+    :return void
+    """
+    widths = [max(len(str(v)) for v in column) for column in zip(header, *rows)]
+
+    print()
+    print(title)
+
+    for row in [header] + list(rows):
+        print('  '.join(str(v).rjust(w) for v, w in zip(row, widths)))
@@ -1,7 +1,13 @@
+import json
 import pytest
-from paho.mqtt.client import MQTT_ERR_SUCCESS
+from paho.mqtt.client import MQTTMessage, MQTT_ERR_SUCCESS
 from veides.sdk.api import ApiClient, AuthProperties, ConfigurationProperties
-from veides.sdk.stream_hub import StreamHubClient, AuthProperties as StreamHubAuthProperties, ConnectionProperties
+from veides.sdk.stream_hub import (
+    StreamHubClient,
+    AsyncStreamHubClient,
+    AuthProperties as StreamHubAuthProperties,
+    ConnectionProperties
+)
 from veides.sdk.stream_hub.models import Timestamp
 
 
@@ -9,6 +15,20 @@ TIMESTAMP = '2021-01-01T12:00:00Z'
 trail_timestamp = Timestamp.from_string(TIMESTAMP)
 
 
+def message(agent, message_type, name, value, timestamp=TIMESTAMP):
+    """
+    Builds MQTT message of a trail or event sent by an agent
+    """
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent}/{message_type}/{name}'.encode('utf-8')
+    msg.payload = json.dumps({
+        'value' if message_type == 'trail' else 'message': value,
+        'timestamp': timestamp
+    }).encode('utf-8')
+
+    return msg
+
+
 @pytest.fixture()
 def agent_client_id():
     return 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
@@ -41,6 +61,14 @@ def mocked_paho_client(mocker):
         message_callback_add = mocker.stub("message_callback_add")
         publish = mocker.stub("publish")
         subscribe = mocker.stub("subscribe")
+        unsubscribe = mocker.stub("unsubscribe")
+        socket = mocker.stub("socket")
+        want_write = mocker.stub("want_write")
+        loop_read = mocker.stub("loop_read")
+        loop_write = mocker.stub("loop_write")
+        loop_misc = mocker.stub("loop_misc")
+        max_inflight_messages_set = mocker.stub("max_inflight_messages_set")
+        max_queued_messages_set = mocker.stub("max_queued_messages_set")
 
     return MockedPahoClient()
 
@@ -55,7 +83,7 @@ def connected_client(mocker, mocked_paho_client, username, token, hostname):
     )
     client.connected.set()
 
-    client.client.subscribe.return_value = (MQTT_ERR_SUCCESS,)
+    client.client.subscribe.return_value = (MQTT_ERR_SUCCESS, 1)
 
     return client
 
@@ -72,6 +100,18 @@ def not_connected_client(mocker, mocked_paho_client, username, token, hostname):
     return client
 
 
+@pytest.fixture()
+def async_client(mocker, mocked_paho_client, username, token, hostname):
+    mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+
+    client = AsyncStreamHubClient(
+        StreamHubAuthProperties(username=username, token=token),
+        ConnectionProperties(host=hostname)
+    )
+
+    return client
+
+
 @pytest.fixture()
 def api_client(mocker, token, hostname):
     mocker.patch("requests.post")
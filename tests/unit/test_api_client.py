@@ -1,5 +1,5 @@
 import pytest
-from veides.sdk.api import __version__
+from veides.sdk.api import __version__, ApiClient, AuthProperties, ConfigurationProperties, MetricsRegistry
 from veides.sdk.api.exceptions import (
     MethodInvalidException,
     MethodInvokeException,
@@ -130,3 +130,30 @@ def test_api_client_should_use_error_on_invoke_method_when_client_error_occurred
 
     with pytest.raises(expected_error, match=error):
         api_client.invoke_method(agent_client_id, method_name, payload)
+
+
+def test_api_client_should_report_invoke_method_metrics(mocker, agent_client_id, token, hostname):
+    class MockedMethodResponse:
+        status_code = 504
+
+        def json(self):
+            return dict()
+
+    mocker.patch("requests.post")
+
+    metrics = MetricsRegistry()
+    api_client = ApiClient(AuthProperties(token=token), ConfigurationProperties(base_url=hostname), metrics=metrics)
+    api_client.http_client.post.side_effect = [MockedMethodResponse(), ConnectionError()]
+
+    with pytest.raises(MethodTimeoutException):
+        api_client.invoke_method(agent_client_id, 'some_method', {})
+
+    with pytest.raises(ConnectionError):
+        api_client.invoke_method(agent_client_id, 'some_method', {})
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot['veides_api_invoke_method_total{status="504"}'] == 1
+    assert snapshot['veides_api_invoke_method_total{status="error"}'] == 1
+    assert snapshot['veides_api_invoke_method_seconds']['count'] == 2
+    assert 'veides_api_invoke_method_total{status="error"} 1' in metrics.to_prometheus()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import pytest
+
+HEAVY_MODULES = ['requests', 'paho', 'ssl', 'json', 'asyncio', 'multiprocessing']
+
+
+def _imported_modules(code, modules=HEAVY_MODULES):
+    """
+    :return set: Modules imported by code run in a fresh interpreter
+    """
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        '%s\nimport sys\nprint(",".join(m for m in %r if m in sys.modules))' % (code, modules)
+    ])
+
+    return set(filter(None, output.decode('utf-8').strip().split(',')))
+
+
+@pytest.mark.parametrize('code', [
+    'import veides.sdk.api',
+    'import veides.sdk.stream_hub',
+    'from veides.sdk.stream_hub.models import Trail, Event, Timestamp',
+    'from veides.sdk.stream_hub import AuthProperties, ConnectionProperties, ReconnectPolicy',
+    'from veides.sdk.api import ApiClient, AuthProperties, ConfigurationProperties',
+])
+def test_import_should_not_load_heavy_modules(code):
+    assert _imported_modules(code) == set()
+
+
+def test_import_should_load_mqtt_lib_when_client_is_used():
+    assert 'paho' in _imported_modules('from veides.sdk.stream_hub import StreamHubClient')
+
+
+def test_import_should_not_load_file_sinks_with_client():
+    modules = ['veides.sdk.stream_hub.sinks', 'gzip', 'csv']
+
+    assert _imported_modules('from veides.sdk.stream_hub import StreamHubClient', modules) == set()
+
+
+def test_lazy_attributes_should_be_listed_and_raise_attribute_error_when_unknown():
+    import veides.sdk.stream_hub as stream_hub
+
+    assert 'StreamHubClient' in dir(stream_hub)
+
+    with pytest.raises(AttributeError):
+        stream_hub.UnknownClient
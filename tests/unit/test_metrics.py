@@ -0,0 +1,70 @@
+import pytest
+from veides.sdk.metrics import MetricsRegistry
+
+
+def test_metrics_registry_should_return_the_same_counter_for_the_same_name_and_labels():
+    registry = MetricsRegistry()
+
+    registry.counter('requests_total', labels={'status': 200}).inc()
+    registry.counter('requests_total', labels={'status': 200}).inc(2)
+    registry.counter('requests_total', labels={'status': 500}).inc()
+
+    assert registry.snapshot() == {
+        'requests_total{status="200"}': 3,
+        'requests_total{status="500"}': 1,
+    }
+
+
+def test_metrics_registry_should_count_histogram_values_in_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', buckets=(0.1, 1))
+
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+
+    snapshot = registry.snapshot()['latency_seconds']
+
+    assert snapshot['buckets'] == [(0.1, 2), (1, 3), (float('inf'), 4)]
+    assert snapshot['count'] == 4
+    assert snapshot['sum'] == pytest.approx(2.65)
+
+
+def test_metrics_registry_should_raise_value_error_when_name_is_registered_with_different_type():
+    registry = MetricsRegistry()
+    registry.counter('metric', labels={'a': 1})
+
+    with pytest.raises(ValueError):
+        registry.histogram('metric')
+
+
+def test_metrics_registry_should_export_prometheus_text_format():
+    registry = MetricsRegistry()
+
+    registry.counter('requests_total', 'Requests', {'status': 'a"b'}).inc()
+    registry.histogram('latency_seconds', 'Latency', buckets=(0.5,)).observe(0.25)
+
+    assert registry.to_prometheus() == (
+        '# HELP latency_seconds Latency\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{le="0.5"} 1\n'
+        'latency_seconds_bucket{le="+Inf"} 1\n'
+        'latency_seconds_sum 0.25\n'
+        'latency_seconds_count 1\n'
+        '# HELP requests_total Requests\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{status="a\\"b"} 1\n'
+    )
+
+
+def test_metrics_registry_should_export_prometheus_text_format_when_label_values_have_different_types():
+    registry = MetricsRegistry()
+
+    registry.counter('requests_total', labels={'status': 200}).inc()
+    registry.counter('requests_total', labels={'status': 'error'}).inc()
+    registry.counter('requests_total', labels={'status': '200'}).inc()
+
+    assert registry.to_prometheus() == (
+        '# TYPE requests_total counter\n'
+        'requests_total{status="200"} 2\n'
+        'requests_total{status="error"} 1\n'
+    )
@@ -0,0 +1,111 @@
+import json
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.stream_hub import RollingAggregator
+from veides.sdk.stream_hub.aggregation import MINUTE, FIVE_MINUTES, HOUR
+from veides.sdk.stream_hub.models import Trail, Timestamp
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+NOW = 1609502400
+
+
+def test_rolling_aggregator_should_return_window_statistics():
+    aggregator = RollingAggregator()
+
+    aggregator.add('agent', 'temperature', 20, NOW - 30)
+    aggregator.add('agent', 'temperature', 10.5, NOW - 10)
+    aggregator.add('agent', 'temperature', 30, NOW)
+
+    stats = aggregator.stats('agent', 'temperature', MINUTE, at=NOW)
+
+    assert stats.count == 3
+    assert stats.min == 10.5
+    assert stats.max == 30
+    assert stats.mean == pytest.approx(20.1666, abs=1e-3)
+
+
+def test_rolling_aggregator_should_expire_samples_per_window():
+    aggregator = RollingAggregator()
+
+    aggregator.add('agent', 'uptime', 1, NOW - 30 * MINUTE)
+    aggregator.add('agent', 'uptime', 2, NOW - 2 * MINUTE)
+    aggregator.add('agent', 'uptime', 3, NOW)
+
+    assert aggregator.stats('agent', 'uptime', MINUTE, at=NOW).count == 1
+    assert aggregator.stats('agent', 'uptime', FIVE_MINUTES, at=NOW).count == 2
+    assert aggregator.stats('agent', 'uptime', HOUR, at=NOW).count == 3
+    assert aggregator.stats('agent', 'uptime', MINUTE, at=NOW + 2 * MINUTE) is None
+
+
+def test_rolling_aggregator_should_reuse_expired_buckets():
+    aggregator = RollingAggregator(windows=(60,), buckets=6)
+
+    for t in range(0, 600, 5):
+        aggregator.add('agent', 'uptime', t, NOW + t)
+
+    stats = aggregator.stats('agent', 'uptime', 60, at=NOW + 595)
+
+    assert stats.count == 12
+    assert stats.min == 540
+    assert stats.max == 595
+
+
+def test_rolling_aggregator_should_ignore_non_numeric_values():
+    aggregator = RollingAggregator()
+
+    assert aggregator.add('agent', 'state', 'ready', NOW) is False
+    assert aggregator.add('agent', 'state', True, NOW) is False
+    assert aggregator.ignored == 2
+    assert aggregator.stats('agent', 'state', MINUTE, at=NOW) is None
+
+
+def test_rolling_aggregator_should_be_usable_as_trail_callback():
+    aggregator = RollingAggregator(clock=lambda: NOW)
+
+    aggregator('agent', Trail('uptime', 5, Timestamp.from_epoch(NOW)))
+    aggregator('agent', Trail('uptime', 7, NOW))
+
+    assert aggregator.stats('agent', 'uptime', MINUTE).sum == 12
+    assert aggregator.stats_many([('agent', 'uptime'), ('other', 'uptime')], MINUTE)[1] is None
+    assert aggregator.series() == [('agent', 'uptime')]
+
+    aggregator.remove('agent', 'uptime')
+
+    assert len(aggregator) == 0
+
+
+def test_rolling_aggregator_should_raise_value_error_when_window_is_not_configured():
+    aggregator = RollingAggregator(windows=(60,))
+
+    with pytest.raises(ValueError):
+        aggregator.stats('agent', 'uptime', 300)
+
+
+@pytest.mark.parametrize('kwargs', [{'windows': ()}, {'windows': (0,)}, {'windows': (1.5,)}, {'buckets': 0}])
+def test_rolling_aggregator_should_raise_value_error_when_given_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        RollingAggregator(**kwargs)
+
+
+def test_stream_hub_client_should_aggregate_subscribed_trails(agent_client_id, connected_client):
+    aggregator = RollingAggregator()
+    connected_client.on_trail('+', 'uptime', aggregator)
+
+    for value in (1, 2, 3):
+        msg = MQTTMessage()
+        msg.topic = f'agent/{agent_client_id}/trail/uptime'.encode('utf-8')
+        msg.payload = json.dumps({'value': value, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+        connected_client._on_trail(None, None, msg)
+
+    stats = aggregator.stats(agent_client_id, 'uptime', MINUTE, at=NOW)
+
+    assert stats.count == 3
+    assert stats.mean == 2
@@ -0,0 +1,182 @@
+import asyncio
+import pytest
+from paho.mqtt.client import MQTTMessageInfo, MQTT_ERR_SUCCESS
+from veides.sdk.stream_hub.exceptions import ConnectionException
+from veides.sdk.stream_hub import AsyncStreamHubClient, AuthProperties, ConnectionProperties
+from veides.sdk.stream_hub.sinks import FileSink
+from tests.unit.fixtures import (
+    message,
+    async_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_client_should_connect(async_client, hostname):
+    def side_effect(*_, **__):
+        async_client.client.on_connect(None, None, None, 0)
+
+    async_client.client.connect.side_effect = side_effect
+
+    async def scenario():
+        await async_client.connect()
+        connected = async_client.is_connected()
+        await async_client.disconnect()
+
+        return connected
+
+    assert run(scenario()) is True
+    async_client.client.connect.assert_called_once_with(hostname, keepalive=60, port=9001)
+    async_client.client.loop_start.assert_not_called()
+
+
+def test_async_client_should_raise_connection_exception_when_connection_refused(async_client):
+    def side_effect(*_, **__):
+        async_client.client.on_connect(None, None, None, 5)
+
+    async_client.client.connect.side_effect = side_effect
+
+    with pytest.raises(ConnectionException):
+        run(async_client.connect())
+
+
+def test_async_client_should_raise_connection_exception_on_timeout(async_client):
+    with pytest.raises(ConnectionException):
+        run(async_client.connect(timeout=0.01))
+
+
+def test_async_client_should_run_coroutine_trail_handler(async_client, agent_client_id):
+    received = []
+
+    async def handler(agent, trail):
+        received.append((agent, trail.name))
+
+    async def scenario():
+        async_client._loop = asyncio.get_event_loop()
+        async_client.on_trail(agent_client_id, 'some_trail', handler)
+        async_client._on_trail(None, None, message(agent_client_id, 'trail', 'some_trail', 'value'))
+        await asyncio.sleep(0)
+
+    run(scenario())
+
+    assert received == [(agent_client_id, 'some_trail')]
+
+
+def test_async_client_should_iterate_over_received_trails(async_client, agent_client_id):
+    async def scenario():
+        async_client._loop = asyncio.get_event_loop()
+        stream = async_client.trails('+', '#')
+
+        async_client._on_trail(None, None, message(agent_client_id, 'trail', 'first', 'value'))
+        async_client._on_trail(None, None, message(agent_client_id, 'trail', 'second', 'value'))
+
+        return [(await stream.__anext__())[1].name for _ in range(2)]
+
+    assert run(scenario()) == ['first', 'second']
+
+
+def test_async_client_should_subscribe_when_connected_and_wait_for_acknowledgement(async_client):
+    async_client.client.subscribe.return_value = (MQTT_ERR_SUCCESS, 7)
+
+    async def scenario():
+        async_client._loop = asyncio.get_event_loop()
+        async_client.connected.set()
+
+        subscription = asyncio.ensure_future(async_client.subscribe('agent/+/trail/#'))
+        await asyncio.sleep(0)
+        async_client._on_subscribe(None, None, 7, (1,))
+
+        return await subscription
+
+    assert run(scenario()) is True
+    async_client.client.subscribe.assert_called_once_with('agent/+/trail/#', qos=1)
+
+
+def test_async_client_should_not_subscribe_when_not_connected(async_client, agent_client_id):
+    assert async_client.on_trail(agent_client_id, 'some_trail', lambda *_: None) is True
+
+    async_client.client.subscribe.assert_not_called()
+    assert f'agent/{agent_client_id}/trail/some_trail' in async_client._subscribed_topics
+
+
+def test_async_client_should_wait_for_publish_acknowledgement(async_client):
+    info = MQTTMessageInfo(3)
+    info.rc = MQTT_ERR_SUCCESS
+    async_client.client.publish.return_value = info
+
+    async def scenario():
+        async_client._loop = asyncio.get_event_loop()
+        async_client.connected.set()
+
+        publishing = asyncio.ensure_future(async_client.publish('topic', {'value': 1}))
+        await asyncio.sleep(0)
+        async_client._on_publish(None, None, 3)
+
+        return await publishing
+
+    assert run(scenario()) is True
+
+
+def test_async_client_should_not_publish_when_not_connected(async_client):
+    assert run(async_client.publish('topic', {'value': 1}, timeout=0.01)) is False
+
+    async_client.client.publish.assert_not_called()
+
+
+def test_async_client_should_publish_many_and_wait_for_acknowledgements(async_client):
+    async_client.client.publish.side_effect = [(MQTT_ERR_SUCCESS, 1), (MQTT_ERR_SUCCESS, 2)]
+
+    async def scenario():
+        async_client._loop = asyncio.get_event_loop()
+        async_client.connected.set()
+
+        publishing = asyncio.ensure_future(async_client.publish_many([('a', {}), ('b', {})], timeout=0.5))
+        await asyncio.sleep(0)
+        async_client._on_publish(None, None, 1)
+
+        return await publishing
+
+    assert run(scenario()) == [True, False]
+
+
+def test_async_client_should_flush_batches_and_sinks_on_disconnect(async_client, agent_client_id, tmpdir):
+    batches = []
+    sink = FileSink(str(tmpdir), flush_interval=60)
+
+    async def scenario():
+        async_client._loop = asyncio.get_event_loop()
+        async_client.on_trail_batch(agent_client_id, 'uptime', batches.append, max_delay=60000)
+        async_client.on_trail(agent_client_id, 'status', sink)
+        async_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', 'value'))
+        async_client._on_trail(None, None, message(agent_client_id, 'trail', 'status', 'value'))
+
+        await async_client.disconnect()
+
+    run(scenario())
+
+    assert [len(batch) for batch in batches] == [1]
+    assert sink.written == 1
+
+
+def test_async_client_should_pass_subscribe_batch_size(mocker, mocked_paho_client, username, token, hostname):
+    mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+
+    client = AsyncStreamHubClient(
+        AuthProperties(username=username, token=token),
+        ConnectionProperties(host=hostname),
+        subscribe_batch_size=10
+    )
+
+    assert client.subscribe_batch_size == 10
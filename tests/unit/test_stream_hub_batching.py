@@ -0,0 +1,129 @@
+import json
+import math
+import time
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.stream_hub.batching import TrailBatcher
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+
+def test_trail_batcher_should_deliver_batch_when_max_messages_collected():
+    batches = []
+    batcher = TrailBatcher(batches.append, max_messages=3, max_delay=10000, use_numpy=False)
+
+    for i in range(4):
+        batcher.add('agent', 'uptime', i, 1609502400 + i)
+
+    assert len(batches) == 1
+    assert batches[0].agents == ['agent'] * 3
+    assert batches[0].names == ['uptime'] * 3
+    assert list(batches[0].values) == [0.0, 1.0, 2.0]
+    assert list(batches[0].timestamps) == [1609502400, 1609502401, 1609502402]
+
+    batcher.flush()
+
+    assert len(batches) == 2
+    assert len(batches[1]) == 1
+
+
+def test_trail_batcher_should_deliver_batch_after_max_delay():
+    batches = []
+    batcher = TrailBatcher(batches.append, max_messages=1000, max_delay=10, use_numpy=False)
+
+    batcher.add('agent', 'uptime', 1, 1609502400)
+
+    deadline = time.time() + 2
+    while not batches and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert len(batches) == 1
+    assert len(batches[0]) == 1
+
+
+def test_trail_batcher_should_use_nan_for_non_numeric_values():
+    batches = []
+    batcher = TrailBatcher(batches.append, max_messages=4, use_numpy=False)
+
+    batcher.add('agent', 'state', 'on', 1609502400)
+    batcher.add('agent', 'state', '2.5', 1609502400)
+    batcher.add('agent', 'state', True, 1609502400)
+    batcher.add('agent', 'state', 2.5, 1609502400)
+
+    assert math.isnan(batches[0].values[0])
+    assert math.isnan(batches[0].values[1])
+    assert math.isnan(batches[0].values[2])
+    assert batches[0].values[3] == 2.5
+
+
+def test_trail_batcher_should_deliver_batches_with_single_thread():
+    batches = []
+    batcher = TrailBatcher(batches.append, max_messages=1000, max_delay=10, use_numpy=False)
+
+    for i in range(3):
+        batcher.add('agent', 'uptime', i, 1609502400)
+
+        deadline = time.time() + 2
+        while len(batches) <= i and time.time() < deadline:
+            time.sleep(0.01)
+
+        if i == 0:
+            thread = batcher._thread
+
+    assert [list(batch.values) for batch in batches] == [[0.0], [1.0], [2.0]]
+    assert batcher._thread is thread
+
+
+def test_trail_batcher_should_flush_and_stop_thread_on_close():
+    batches = []
+    batcher = TrailBatcher(batches.append, max_messages=1000, max_delay=10000, use_numpy=False)
+
+    batcher.add('agent', 'uptime', 1, 1609502400)
+    thread = batcher._thread
+
+    batcher.close()
+
+    assert len(batches) == 1
+    assert not thread.is_alive()
+
+    batcher.add('agent', 'uptime', 2, 1609502400)
+
+    assert batcher._thread.is_alive()
+
+    batcher.close()
+
+    assert len(batches) == 2
+
+
+@pytest.mark.parametrize("max_messages,max_delay", [
+    (0, 100),
+    (10, 0),
+    ('10', 100),
+])
+def test_trail_batcher_should_raise_value_error_when_given_invalid_window(max_messages, max_delay):
+    with pytest.raises(ValueError):
+        TrailBatcher(lambda _: None, max_messages=max_messages, max_delay=max_delay)
+
+
+def test_stream_hub_client_should_deliver_trail_batch(agent_client_id, connected_client):
+    batches = []
+
+    connected_client.on_trail_batch('+', 'uptime', batches.append, max_messages=2)
+
+    for value in [1, 2]:
+        msg = MQTTMessage()
+        msg.topic = f'agent/{agent_client_id}/trail/uptime'.encode('utf-8')
+        msg.payload = json.dumps({'value': value, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+        connected_client._on_trail(None, None, msg)
+
+    assert len(batches) == 1
+    assert list(batches[0].values) == [1.0, 2.0]
+    assert list(batches[0].timestamps) == [1609502400, 1609502400]
+    connected_client.client.subscribe.assert_called_once_with('agent/+/trail/uptime', qos=1)
@@ -1,6 +1,18 @@
 import pytest
 import json
-from paho.mqtt.client import MQTTMessage
+import time
+from paho.mqtt.client import MQTTMessage, MQTT_ERR_SUCCESS, MQTT_ERR_CONN_LOST, MQTT_ERR_QUEUE_SIZE
+from veides.sdk.stream_hub import (
+    StreamHubClient,
+    OfflineQueue,
+    ReconnectPolicy,
+    AuthProperties as StreamHubAuthProperties,
+    ConnectionProperties,
+    MetricsRegistry
+)
+from veides.sdk.stream_hub.client import _DispatchMetrics
+from veides.sdk.stream_hub.exceptions import ConfigurationException
+from veides.sdk.stream_hub.models import Timestamp
 from tests.unit.fixtures import (
     connected_client,
     not_connected_client,
@@ -201,3 +213,507 @@ def test_stream_hub_client_on_event_should_accept_specific_parameters(agent_clie
 def test_stream_hub_client_on_event_should_raise_error_when_given_invalid_parameter(agent, event_name, func, connected_client):
     with pytest.raises(Exception):
         connected_client.on_event(agent, event_name, func)
+
+
+@pytest.mark.parametrize("agent,trail_name", [
+    ('+', 'some_trail'),
+    ('xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx', '+'),
+    ('+', '#'),
+])
+def test_stream_hub_client_should_use_wildcard_trail_handler_when_trail_received(agent, trail_name, mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 'value', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    func = mocker.stub('some_trail_handler')
+
+    connected_client.on_trail(agent, trail_name, func)
+
+    connected_client._on_trail(None, None, msg)
+
+    func.assert_called_once()
+    assert func.call_args[0][0] == agent_client_id
+    assert func.call_args[0][1].name == 'some_trail'
+
+
+def test_stream_hub_client_should_use_all_matching_trail_handlers(mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 'value', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    exact = mocker.stub('exact_handler')
+    wildcard = mocker.stub('wildcard_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', exact)
+    connected_client.on_trail('+', '+', wildcard)
+
+    connected_client._on_trail(None, None, msg)
+
+    exact.assert_called_once()
+    wildcard.assert_called_once()
+
+
+def test_stream_hub_client_should_subscribe_once_per_topic_filter(agent_client_id, connected_client):
+    connected_client.on_trail('+', '+', lambda *_: None)
+    connected_client.on_trail('+', '+', lambda *_: None)
+
+    connected_client.client.subscribe.assert_called_once_with('agent/+/trail/+', qos=1)
+
+
+@pytest.mark.parametrize("agent,name", [
+    ('#', 'name'),
+    ('+', 'na+me'),
+    ('+', '#/name'),
+])
+def test_stream_hub_client_on_trail_should_raise_value_error_when_given_invalid_wildcard(agent, name, connected_client):
+    with pytest.raises(ValueError):
+        connected_client.on_trail(agent, name, lambda *_: None)
+
+
+def test_stream_hub_client_should_pass_epoch_timestamps_when_enabled(mocker, agent_client_id, connected_client):
+    connected_client._epoch_timestamps = True
+
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 'value', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    func = mocker.stub('some_trail_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', func)
+    connected_client._on_trail(None, None, msg)
+
+    assert func.call_args[0][1].timestamp == 1609502400
+
+
+@pytest.mark.parametrize("value", [None, [], {}])
+def test_stream_hub_client_should_not_use_trail_handler_when_trail_value_is_invalid(value, mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': value, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    func = mocker.stub('some_trail_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', func)
+    connected_client._on_trail(None, None, msg)
+
+    func.assert_not_called()
+
+
+def test_stream_hub_client_should_send_batched_subscriptions_in_chunks(
+        mocker,
+        mocked_paho_client,
+        username,
+        token,
+        hostname
+):
+    mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+    connected_client = StreamHubClient(
+        StreamHubAuthProperties(username=username, token=token),
+        ConnectionProperties(host=hostname),
+        subscribe_batch_size=2
+    )
+    connected_client.connected.set()
+    connected_client.client.subscribe.return_value = (MQTT_ERR_SUCCESS, 1)
+    agents = ['{:032d}'.format(i) for i in range(5)]
+
+    with connected_client.subscription_batch() as batch:
+        for agent in agents:
+            connected_client.on_trail(agent, 'uptime', lambda *_: None)
+
+        connected_client.client.subscribe.assert_not_called()
+
+    assert batch.result is True
+    assert connected_client.client.subscribe.call_count == 3
+    assert connected_client.client.subscribe.call_args_list[0][0][0] == [
+        (f'agent/{agents[0]}/trail/uptime', 1),
+        (f'agent/{agents[1]}/trail/uptime', 1),
+    ]
+    assert len(connected_client._subscribed_topics) == 5
+
+
+def test_stream_hub_client_should_resubscribe_in_chunks_and_measure_duration(not_connected_client):
+    not_connected_client.subscribe_batch_size = 2
+    not_connected_client._subscribed_topics = {'topic/{}'.format(i): 1 for i in range(3)}
+    not_connected_client.client.subscribe.side_effect = [(0, 1), (0, 2)]
+
+    not_connected_client.client.on_connect(None, None, None, 0)
+
+    assert not_connected_client.client.subscribe.call_count == 2
+    assert not_connected_client.last_resubscribe_duration is None
+
+    not_connected_client._on_subscribe(None, None, 1, (1, 1))
+    not_connected_client._on_subscribe(None, None, 2, (1,))
+
+    assert not_connected_client.last_resubscribe_duration >= 0
+
+
+def test_stream_hub_client_should_queue_messages_published_when_disconnected(not_connected_client):
+    not_connected_client.offline_queue = OfflineQueue()
+
+    assert not_connected_client._publish('topic/0', {'value': 1}) is True
+    assert not_connected_client._publish('topic/1', {'value': 2}) is True
+
+    not_connected_client.client.publish.assert_not_called()
+    assert len(not_connected_client.offline_queue) == 2
+
+
+def test_stream_hub_client_should_flush_queued_messages_in_order_after_connect(not_connected_client):
+    not_connected_client.offline_queue = OfflineQueue()
+    not_connected_client.client.publish.return_value = (MQTT_ERR_SUCCESS, 1)
+
+    not_connected_client._publish('topic/0', {'value': 1})
+    not_connected_client._publish('topic/1', {'value': 2})
+
+    not_connected_client.client.on_connect(None, None, None, 0)
+    not_connected_client._offline_flusher.join(timeout=5)
+
+    topics = [c[0][0] for c in not_connected_client.client.publish.call_args_list]
+    payloads = [json.loads(c[0][1]) for c in not_connected_client.client.publish.call_args_list]
+
+    assert topics == ['topic/0', 'topic/1']
+    assert payloads == [{'value': 1}, {'value': 2}]
+    assert len(not_connected_client.offline_queue) == 0
+
+
+def test_stream_hub_client_should_supervise_connection_when_reconnect_policy_given(not_connected_client, mocker):
+    not_connected_client.reconnect_policy = ReconnectPolicy(min_delay=0.01, max_delay=0.01)
+    not_connected_client.client.loop = mocker.stub('loop')
+    not_connected_client.client.loop.return_value = MQTT_ERR_SUCCESS
+
+    def side_effect(*_, **__):
+        not_connected_client.client.on_connect(None, None, None, 0)
+
+    not_connected_client.client.connect.side_effect = side_effect
+    not_connected_client.connect()
+
+    not_connected_client.client.loop_start.assert_not_called()
+    assert not_connected_client.is_connected() is True
+
+    not_connected_client.disconnect()
+
+    not_connected_client.client.loop_stop.assert_not_called()
+    assert not_connected_client._network_thread is None
+
+
+def test_stream_hub_client_should_reconnect_with_backoff_when_loop_fails(not_connected_client, mocker):
+    not_connected_client.reconnect_policy = ReconnectPolicy(min_delay=0.01, max_delay=0.01)
+    not_connected_client.client.loop = mocker.stub('loop')
+    not_connected_client.client.loop.return_value = MQTT_ERR_CONN_LOST
+    not_connected_client.client.reconnect = mocker.stub('reconnect')
+
+    def side_effect(*_, **__):
+        not_connected_client.client.on_connect(None, None, None, 0)
+
+    not_connected_client.client.connect.side_effect = side_effect
+    not_connected_client.connect()
+
+    for _ in range(500):
+        if not_connected_client.reconnects >= 2:
+            break
+
+        time.sleep(0.01)
+
+    not_connected_client.disconnect()
+
+    assert not_connected_client.client.reconnect.call_count >= 2
+
+
+def test_stream_hub_client_should_reconnect_when_connection_is_refused_by_server(not_connected_client, mocker):
+    not_connected_client.reconnect_policy = ReconnectPolicy(min_delay=0.01, max_delay=0.01)
+    not_connected_client.client.reconnect = mocker.stub('reconnect')
+    not_connected_client.client.loop = mocker.stub('loop')
+    mocker.patch.object(not_connected_client, 'logger')
+
+    def loop(*_, **__):
+        # Every CONNACK after the first one says "Server unavailable"
+        not_connected_client.client.on_connect(None, None, None, 3)
+
+    def side_effect(*_, **__):
+        not_connected_client.client.on_connect(None, None, None, 0)
+
+    not_connected_client.client.loop.side_effect = loop
+    not_connected_client.client.connect.side_effect = side_effect
+    not_connected_client.connect()
+
+    for _ in range(500):
+        if not_connected_client.client.reconnect.call_count >= 2:
+            break
+
+        time.sleep(0.01)
+
+    not_connected_client.disconnect()
+
+    assert not_connected_client.client.reconnect.call_count >= 2
+    not_connected_client.logger.warning.assert_any_call('Connection refused: Server unavailable')
+
+
+def test_stream_hub_client_should_complete_publish_future_when_acknowledged(connected_client):
+    connected_client.client.publish.return_value = (MQTT_ERR_SUCCESS, 7)
+
+    future = connected_client.publish('topic', {'value': 1})
+
+    assert future.done() is False
+
+    connected_client.client.on_publish(None, None, 7)
+
+    assert future.result(timeout=1) is True
+
+
+def test_stream_hub_client_should_complete_publish_future_when_acknowledged_before_tracked(connected_client):
+    def side_effect(*_, **__):
+        connected_client.client.on_publish(None, None, 7)
+        return MQTT_ERR_SUCCESS, 7
+
+    connected_client.client.publish.side_effect = side_effect
+
+    future = connected_client.publish('topic', {'value': 1})
+
+    assert future.result(timeout=1) is True
+    assert connected_client._pending_publishes == {}
+    assert connected_client._early_publishes == set()
+
+
+def test_stream_hub_client_should_fail_publish_future_when_message_was_not_queued(connected_client):
+    connected_client.client.publish.return_value = (MQTT_ERR_QUEUE_SIZE, 7)
+
+    assert connected_client.publish('topic', {'value': 1}).result(timeout=1) is False
+    assert connected_client._pending_publishes == {}
+
+
+def test_stream_hub_client_should_fail_pending_qos0_futures_on_disconnect(connected_client):
+    connected_client.client.publish.side_effect = [(MQTT_ERR_SUCCESS, 1), (MQTT_ERR_SUCCESS, 2)]
+
+    qos0 = connected_client.publish('topic', {'value': 1}, qos=0)
+    qos1 = connected_client.publish('topic', {'value': 1}, qos=1)
+
+    connected_client.client.on_disconnect(None, None, 1)
+
+    assert qos0.result(timeout=1) is False
+    assert qos1.done() is False
+
+
+def test_stream_hub_client_should_publish_many_messages_in_order(connected_client):
+    connected_client.client.publish.side_effect = [(MQTT_ERR_SUCCESS, mid) for mid in range(1, 4)]
+
+    futures = connected_client.publish_many([('topic/%d' % i, {'value': i}) for i in range(3)])
+
+    topics = [c[0][0] for c in connected_client.client.publish.call_args_list]
+
+    for mid in range(1, 4):
+        connected_client.client.on_publish(None, None, mid)
+
+    assert topics == ['topic/0', 'topic/1', 'topic/2']
+    assert [f.result(timeout=1) for f in futures] == [True, True, True]
+
+
+def test_stream_hub_client_should_set_inflight_and_queue_limits(mocker, mocked_paho_client):
+    mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+
+    StreamHubClient(
+        StreamHubAuthProperties(username='name', token='token'),
+        ConnectionProperties(host='hostname'),
+        max_inflight_messages=100,
+        max_queued_messages=1000
+    )
+
+    mocked_paho_client.max_inflight_messages_set.assert_called_once_with(100)
+    mocked_paho_client.max_queued_messages_set.assert_called_once_with(1000)
+
+
+@pytest.mark.parametrize('kwargs', [{'max_inflight_messages': -1}, {'max_queued_messages': 1.5}])
+def test_stream_hub_client_should_raise_configuration_exception_when_given_invalid_limits(kwargs, mocker, mocked_paho_client):
+    mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+
+    with pytest.raises(ConfigurationException):
+        StreamHubClient(
+            StreamHubAuthProperties(username='name', token='token'),
+            ConnectionProperties(host='hostname'),
+            **kwargs
+        )
+
+
+def test_stream_hub_client_should_connect_over_tcp_when_configured(mocker, mocked_paho_client, hostname):
+    paho_client = mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+
+    client = StreamHubClient(
+        StreamHubAuthProperties(username='name', token='token'),
+        ConnectionProperties(host=hostname, transport='tcp')
+    )
+
+    def side_effect(*_, **__):
+        client.client.on_connect(None, None, None, 0)
+
+    client.client.connect.side_effect = side_effect
+    client.connect()
+
+    paho_client.assert_called_once_with(transport='tcp', clean_session=True)
+    client.client.connect.assert_called_once_with(hostname, keepalive=60, port=8883)
+
+
+@pytest.mark.parametrize('transport, port, expected_port', [
+    ('websockets', None, 9001),
+    ('tcp', None, 8883),
+    ('tcp', 1883, 1883),
+])
+def test_connection_properties_should_use_default_port_of_transport(transport, port, expected_port):
+    properties = ConnectionProperties(host='hostname', transport=transport, port=port)
+
+    assert properties.transport == transport
+    assert properties.port == expected_port
+
+
+@pytest.mark.parametrize('kwargs', [{'transport': 'udp'}, {'port': 0}, {'port': 65536}, {'port': '8883'}])
+def test_connection_properties_should_raise_configuration_exception_when_given_invalid_transport_or_port(kwargs):
+    with pytest.raises(ConfigurationException):
+        ConnectionProperties(host='hostname', **kwargs)
+
+
+def test_connection_properties_should_read_transport_and_port_from_env(monkeypatch):
+    monkeypatch.setenv('VEIDES_STREAM_HUB_CLIENT_HOST', 'hostname')
+    monkeypatch.setenv('VEIDES_STREAM_HUB_CLIENT_TRANSPORT', 'tcp')
+    monkeypatch.setenv('VEIDES_STREAM_HUB_CLIENT_PORT', '1883')
+
+    properties = ConnectionProperties.from_env()
+
+    assert properties.host == 'hostname'
+    assert properties.transport == 'tcp'
+    assert properties.port == 1883
+
+
+def test_connection_properties_should_raise_configuration_exception_when_port_in_env_is_invalid(monkeypatch):
+    monkeypatch.setenv('VEIDES_STREAM_HUB_CLIENT_HOST', 'hostname')
+    monkeypatch.setenv('VEIDES_STREAM_HUB_CLIENT_PORT', 'port')
+
+    with pytest.raises(ConfigurationException):
+        ConnectionProperties.from_env()
+
+
+def test_stream_hub_client_should_not_decode_trail_for_lazy_handler_until_accessed(mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 'value', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    decode_trail = mocker.spy(connected_client.codec, 'decode_trail')
+    func = mocker.stub('some_trail_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', func, lazy=True)
+    connected_client._on_trail(None, None, msg)
+
+    (agent, trail) = func.call_args[0]
+
+    assert agent == agent_client_id
+    assert trail.name == 'some_trail'
+    assert trail.payload == msg.payload
+    decode_trail.assert_not_called()
+
+    assert trail.value == 'value'
+    assert trail.timestamp == Timestamp.from_string('2021-01-01T12:00:00Z')
+    decode_trail.assert_called_once()
+
+
+def test_stream_hub_client_should_raise_on_access_when_lazy_trail_is_invalid(mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = b'not a json'
+
+    func = mocker.stub('some_trail_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', func, lazy=True)
+    connected_client._on_trail(None, None, msg)
+
+    trail = func.call_args[0][1]
+
+    with pytest.raises(ValueError):
+        trail.value
+
+
+def test_stream_hub_client_should_reuse_decoded_trail_for_lazy_handler(mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 1, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    decode_trail = mocker.spy(connected_client.codec, 'decode_trail')
+    eager = mocker.stub('eager_handler')
+    lazy = mocker.stub('lazy_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', eager)
+    connected_client.on_trail('+', 'some_trail', lazy, lazy=True)
+    connected_client._on_trail(None, None, msg)
+
+    assert eager.call_args[0][1].value == 1
+    assert lazy.call_args[0][1].value == 1
+    decode_trail.assert_called_once()
+
+
+def test_stream_hub_client_should_not_decode_event_for_lazy_handler_until_accessed(mocker, agent_client_id, connected_client):
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/event/some_event'.encode('utf-8')
+    msg.payload = json.dumps({'message': 'message', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    decode_event = mocker.spy(connected_client.codec, 'decode_event')
+    func = mocker.stub('some_event_handler')
+
+    connected_client.on_event(agent_client_id, 'some_event', func, lazy=True)
+    connected_client._on_event(None, None, msg)
+
+    event = func.call_args[0][1]
+
+    decode_event.assert_not_called()
+    assert event.name == 'some_event'
+    assert event.message == 'message'
+    assert str(event) == 'LazyEvent(name=some_event, message=message, timestamp=2021-01-01T12:00:00Z)'
+
+
+def test_stream_hub_client_should_report_dispatch_metrics(mocker, agent_client_id, connected_client):
+    registry = MetricsRegistry()
+    connected_client._trail_metrics = _DispatchMetrics(registry, 'trail')
+
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 1, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    def failing(*_):
+        raise RuntimeError('failed')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', mocker.stub('handler'))
+    connected_client.on_trail('+', 'some_trail', failing)
+    connected_client._on_trail(None, None, msg)
+
+    msg.payload = b'not a json'
+    connected_client._on_trail(None, None, msg)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot['veides_stream_hub_messages_received_total{type="trail"}'] == 2
+    assert snapshot['veides_stream_hub_messages_dispatched_total{type="trail"}'] == 1
+    assert snapshot['veides_stream_hub_handler_errors_total{type="trail"}'] == 1
+    assert snapshot['veides_stream_hub_decode_errors_total{type="trail"}'] == 1
+    assert snapshot['veides_stream_hub_decode_seconds{type="trail"}']['count'] == 1
+    assert snapshot['veides_stream_hub_model_seconds{type="trail"}']['count'] == 1
+    assert snapshot['veides_stream_hub_handler_seconds{type="trail"}']['count'] == 2
+
+
+def test_stream_hub_client_should_report_publish_metrics(mocker, mocked_paho_client):
+    mocker.patch("paho.mqtt.client.Client", return_value=mocked_paho_client)
+    registry = MetricsRegistry()
+
+    client = StreamHubClient(
+        StreamHubAuthProperties(username='name', token='token'),
+        ConnectionProperties(host='hostname'),
+        metrics=registry
+    )
+    client.connected.set()
+    client.client.publish.side_effect = [(MQTT_ERR_SUCCESS, 1), (MQTT_ERR_QUEUE_SIZE, 2)]
+
+    client.publish('topic', {'value': 1})
+    client.publish('topic', {'value': 2})
+    client.client.on_publish(None, None, 1)
+    client.client.on_disconnect(None, None, 1)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot['veides_stream_hub_publishes_total{result="sent"}'] == 1
+    assert snapshot['veides_stream_hub_publishes_total{result="failed"}'] == 1
+    assert snapshot['veides_stream_hub_publishes_acknowledged_total'] == 1
+    assert snapshot['veides_stream_hub_unexpected_disconnects_total'] == 1
+    assert snapshot['veides_stream_hub_publish_seconds']['count'] == 2
@@ -0,0 +1,91 @@
+import json
+import pytest
+from veides.sdk.stream_hub.codec import JsonCodec, OrjsonCodec, UjsonCodec, MsgspecCodec, default_codec
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+
+def available_codecs():
+    codecs = [JsonCodec()]
+
+    for codec in (OrjsonCodec, UjsonCodec, MsgspecCodec):
+        try:
+            codecs.append(codec())
+        except ImportError:
+            pass
+
+    return codecs
+
+
+@pytest.mark.parametrize("codec", available_codecs(), ids=lambda codec: codec.name)
+def test_codec_should_decode_trail_and_event_from_bytes(codec):
+    trail = json.dumps({'value': 1.5, 'timestamp': '2021-01-01T12:00:00Z', 'other': [1, 2]}).encode('utf-8')
+    event = json.dumps({'message': 'ready', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    assert codec.decode_trail(trail) == (1.5, '2021-01-01T12:00:00Z')
+    assert codec.decode_event(event) == ('ready', '2021-01-01T12:00:00Z')
+    assert codec.decode_trail(b'{}') == (None, None)
+
+
+@pytest.mark.parametrize("codec", available_codecs(), ids=lambda codec: codec.name)
+def test_codec_should_encode_data(codec):
+    assert json.loads(codec.encode({'value': 1, 'name': 'x'})) == {'value': 1, 'name': 'x'}
+
+
+@pytest.mark.parametrize("codec", available_codecs(), ids=lambda codec: codec.name)
+@pytest.mark.parametrize("payload", [b'', b'{', b'[1, 2]', b'\xff'])
+def test_codec_should_raise_value_error_on_invalid_payload(codec, payload):
+    with pytest.raises(ValueError):
+        codec.decode_trail(payload)
+
+
+def test_default_codec_should_return_codec():
+    assert isinstance(default_codec(), JsonCodec)
+
+
+def test_default_codec_should_encode_with_standard_library_json():
+    data = {'value': float('nan'), 1: 'key'}
+
+    assert default_codec().encode(data) == json.dumps(data)
+    assert default_codec().decode_trail(b'{"value": 1, "timestamp": 2}') == (1, 2)
+
+
+def test_stream_hub_client_should_publish_payload_encoded_with_codec(connected_client):
+    class UpperCodec(JsonCodec):
+        def encode(self, data):
+            return json.dumps(data).upper()
+
+    connected_client.codec = UpperCodec()
+    connected_client.client.publish.return_value = (0, 1)
+
+    connected_client._publish('topic', {'value': 'a'})
+
+    connected_client.client.publish.assert_called_once_with('topic', '{"VALUE": "A"}', qos=1, retain=False)
+
+
+def test_stream_hub_client_should_use_codec_to_decode_trail(mocker, agent_client_id, connected_client):
+    class SchemaCodec(JsonCodec):
+        def decode_trail(self, payload):
+            return 42, '2021-01-01T12:00:00Z'
+
+    connected_client.codec = SchemaCodec()
+    func = mocker.stub('some_trail_handler')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', func)
+    connected_client._dispatch_trail(agent_client_id, 'some_trail', b'ignored', [func])
+
+    assert func.call_args[0][1].value == 42
+
+
+def test_stream_hub_client_should_not_use_trail_handler_when_payload_is_invalid(mocker, agent_client_id, connected_client):
+    func = mocker.stub('some_trail_handler')
+
+    connected_client._dispatch_trail(agent_client_id, 'some_trail', b'not a json', [func])
+
+    func.assert_not_called()
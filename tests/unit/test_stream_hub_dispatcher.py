@@ -0,0 +1,152 @@
+import json
+import threading
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.stream_hub.dispatcher import (
+    DispatchExecutor,
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST
+)
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+
+def _blocked_executor(overflow):
+    executor = DispatchExecutor(workers=1, queue_size=2, overflow=overflow)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    executor.submit('key', block)
+    started.wait()
+
+    return executor, release
+
+
+def test_dispatch_executor_should_preserve_order_per_key():
+    executor = DispatchExecutor(workers=4)
+    results = {}
+
+    for i in range(1000):
+        key = 'agent{}'.format(i % 10)
+        executor.submit(key, lambda k, v: results.setdefault(k, []).append(v), key, i)
+
+    executor.shutdown()
+
+    for key, values in results.items():
+        assert values == sorted(values)
+
+    assert sum(len(values) for values in results.values()) == 1000
+
+
+def test_dispatch_executor_should_drop_newest_when_queue_is_full():
+    executor, release = _blocked_executor(OVERFLOW_DROP_NEWEST)
+    processed = []
+
+    assert executor.submit('key', processed.append, 1) is True
+    assert executor.submit('key', processed.append, 2) is True
+    assert executor.submit('key', processed.append, 3) is False
+
+    release.set()
+    executor.shutdown()
+
+    assert processed == [1, 2]
+    assert executor.dropped == 1
+    assert executor.stats()['dropped_newest'] == 1
+
+
+def test_dispatch_executor_should_drop_oldest_when_queue_is_full():
+    executor, release = _blocked_executor(OVERFLOW_DROP_OLDEST)
+    processed = []
+
+    for i in range(1, 4):
+        assert executor.submit('key', processed.append, i) is True
+
+    release.set()
+    executor.shutdown()
+
+    assert processed == [2, 3]
+    assert executor.stats()['dropped_oldest'] == 1
+
+
+def test_dispatch_executor_should_block_when_queue_is_full():
+    executor, release = _blocked_executor(OVERFLOW_BLOCK)
+    processed = []
+
+    executor.submit('key', processed.append, 1)
+    executor.submit('key', processed.append, 2)
+
+    submitter = threading.Thread(target=executor.submit, args=('key', processed.append, 3))
+    submitter.start()
+    submitter.join(timeout=0.1)
+
+    assert submitter.is_alive()
+
+    release.set()
+    submitter.join()
+    executor.shutdown()
+
+    assert processed == [1, 2, 3]
+    assert executor.dropped == 0
+
+
+def test_dispatch_executor_should_drop_tasks_submitted_after_shutdown():
+    executor = DispatchExecutor(workers=2)
+    processed = []
+
+    assert executor.submit('key', processed.append, 1) is True
+
+    executor.shutdown()
+
+    assert executor.submit('key', processed.append, 2) is False
+    assert not executor.running
+    assert processed == [1]
+    assert executor.stats()['dropped_stopped'] == 1
+    assert executor.dropped == 1
+
+    executor.start()
+
+    assert executor.submit('key', processed.append, 3) is True
+
+    executor.shutdown()
+
+    assert processed == [1, 3]
+
+
+@pytest.mark.parametrize("workers,queue_size,overflow", [
+    (0, 1, OVERFLOW_BLOCK),
+    (1, 0, OVERFLOW_BLOCK),
+    (1, 1, 'unknown'),
+])
+def test_dispatch_executor_should_raise_value_error_when_given_invalid_parameters(workers, queue_size, overflow):
+    with pytest.raises(ValueError):
+        DispatchExecutor(workers=workers, queue_size=queue_size, overflow=overflow)
+
+
+def test_stream_hub_client_should_run_trail_handler_in_dispatch_executor(mocker, agent_client_id, connected_client):
+    connected_client._executor = DispatchExecutor(workers=2)
+    threads = []
+
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/some_trail'.encode('utf-8')
+    msg.payload = json.dumps({'value': 'value', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    connected_client.on_trail(agent_client_id, 'some_trail', lambda *_: threads.append(threading.current_thread()))
+    connected_client._on_trail(None, None, msg)
+
+    connected_client._executor.join()
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
+
+    connected_client._executor.shutdown()
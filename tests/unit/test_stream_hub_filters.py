@@ -0,0 +1,123 @@
+import re
+import pytest
+from veides.sdk.stream_hub import Deadband, Range, Equals, Matches
+from veides.sdk.stream_hub.filters import Filter, compile_filters
+from veides.sdk.stream_hub.models import Trail
+from tests.unit.fixtures import (
+    message,
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+
+def accepted(item, values, agent='agent', name='uptime'):
+    return [value for value in values if item.accept(agent, name, value)]
+
+
+def test_deadband_should_pass_values_changed_by_more_than_delta_since_last_passed_one():
+    deadband = Deadband(delta=1)
+
+    assert accepted(deadband, [10, 10.5, 11, 11.5, 9.4, 'off', 'off', 9.4]) == [10, 11.5, 9.4, 'off', 9.4]
+    assert deadband.accept('other', 'uptime', 9.4) is True
+    assert deadband.rejected == 3
+
+
+def test_deadband_without_delta_should_pass_only_changed_values():
+    assert accepted(Deadband(), [1, 1, 2, 2, 1]) == [1, 2, 1]
+
+
+def test_range_should_pass_numeric_values_inside_or_outside_of_bounds():
+    assert accepted(Range(min_value=0, max_value=10), [-1, 0, 5, 10, 11, '5', True]) == [0, 5, 10]
+    assert accepted(Range(max_value=10, min_value=0, outside=True), [-1, 0, 5, 10, 11, '11']) == [-1, 11]
+    assert accepted(Range(min_value=100), [99, 100.5]) == [100.5]
+
+
+def test_equals_should_pass_values_equal_to_any_of_given_ones():
+    equals = Equals('on', 'off')
+
+    assert accepted(equals, ['on', 'standby', 'off', ['on']]) == ['on', 'off']
+    assert equals.rejected == 2
+
+
+def test_matches_should_pass_strings_containing_match():
+    assert accepted(Matches(r'^disk \d+ failed', re.IGNORECASE), ['Disk 1 failed', 'disk failed', 1]) == ['Disk 1 failed']
+
+
+@pytest.mark.parametrize('factory', [
+    lambda: Deadband(delta=-1),
+    lambda: Range(),
+    lambda: Range(min_value=2, max_value=1),
+    lambda: Range(min_value='1'),
+    lambda: Equals(),
+    lambda: Equals([1]),
+    lambda: Matches('('),
+])
+def test_filters_should_raise_value_error_when_given_invalid_parameters(factory):
+    with pytest.raises(ValueError):
+        factory()
+
+
+def test_filter_should_raise_type_error_when_accept_is_not_implemented():
+    class Incomplete(Filter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_compiled_filters_should_stop_at_first_rejecting_filter():
+    deadband = Deadband(delta=5)
+    accept = compile_filters([Range(min_value=0), deadband])
+
+    assert [v for v in [-100, 1, 3, 10, -50, 16] if accept('agent', 'uptime', v)] == [1, 10, 16]
+    assert deadband.rejected == 1
+
+    with pytest.raises(TypeError):
+        compile_filters([lambda agent, name, value: True])
+
+
+def test_stream_hub_client_should_not_create_trail_rejected_by_filters(mocker, agent_client_id, connected_client):
+    func = mocker.stub('temperature_handler')
+    unfiltered = mocker.stub('unfiltered_handler')
+    create = mocker.spy(Trail, '_trusted')
+
+    connected_client.on_trail(agent_client_id, 'temperature', func, filters=[Range(max_value=30), Deadband(delta=1)])
+    connected_client.on_trail('+', 'temperature', unfiltered)
+
+    for value in [20, 20.5, 35, 22]:
+        connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'temperature', value))
+
+    assert [call[0][1].value for call in func.call_args_list] == [20, 22]
+    assert unfiltered.call_count == 4
+    assert create.call_count == 4
+
+
+def test_stream_hub_client_should_not_create_trail_when_all_handlers_reject_it(mocker, agent_client_id, connected_client):
+    func = mocker.stub('temperature_handler')
+    create = mocker.spy(Trail, '_trusted')
+
+    connected_client.on_trail(agent_client_id, 'temperature', func, filters=[Range(min_value=30)])
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'temperature', 20))
+
+    func.assert_not_called()
+    create.assert_not_called()
+
+
+def test_stream_hub_client_should_filter_event_messages(mocker, agent_client_id, connected_client):
+    func = mocker.stub('alert_handler')
+
+    connected_client.on_event(agent_client_id, 'alert', func, filters=[Matches('critical')])
+
+    for text in ['disk critical', 'disk ok']:
+        connected_client._on_event(None, None, message(agent_client_id, 'event', 'alert', text))
+
+    assert [call[0][1].message for call in func.call_args_list] == ['disk critical']
+
+
+def test_stream_hub_client_should_raise_value_error_when_filters_are_used_with_lazy_handler(agent_client_id, connected_client):
+    with pytest.raises(ValueError):
+        connected_client.on_trail(agent_client_id, 'temperature', print, lazy=True, filters=[Range(min_value=0)])
@@ -0,0 +1,92 @@
+import pytest
+from veides.sdk.stream_hub import LatestValueCache
+from veides.sdk.stream_hub.exceptions import ConfigurationException
+from veides.sdk.stream_hub.models import Timestamp
+from tests.unit.fixtures import (
+    message,
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+
+def test_latest_value_cache_should_return_latest_item():
+    cache = LatestValueCache()
+
+    cache.put('agent', 'name', 1)
+    cache.put('agent', 'name', 2)
+
+    assert cache.get('agent', 'name') == 2
+    assert cache.get('agent', 'other') is None
+    assert len(cache) == 1
+
+
+def test_latest_value_cache_should_evict_least_recently_updated_entry():
+    cache = LatestValueCache(max_entries=2)
+
+    cache.put('a', 'name', 1)
+    cache.put('b', 'name', 2)
+    cache.put('a', 'name', 3)
+    cache.put('c', 'name', 4)
+
+    assert cache.get_many([('a', 'name'), ('b', 'name'), ('c', 'name')]) == [3, None, 4]
+    assert cache.evicted == 1
+
+
+def test_latest_value_cache_should_not_return_stale_entries(mocker):
+    now = mocker.patch('veides.sdk.stream_hub.latest.time.monotonic', return_value=100.0)
+    cache = LatestValueCache(ttl=10)
+
+    cache.put('a', 'name', 1)
+    now.return_value = 105.0
+    cache.put('b', 'name', 2)
+    now.return_value = 112.0
+
+    assert cache.get('a', 'name') is None
+    assert cache.get_many([('a', 'name'), ('b', 'name')]) == [None, 2]
+    assert cache.purge() == 1
+    assert len(cache) == 1
+
+
+@pytest.mark.parametrize('kwargs', [{'max_entries': 0}, {'max_entries': 1.5}, {'ttl': 0}, {'ttl': '1'}])
+def test_latest_value_cache_should_raise_value_error_when_given_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        LatestValueCache(**kwargs)
+
+
+def test_stream_hub_client_should_keep_latest_trails(agent_client_id, connected_client):
+    connected_client._latest_values = LatestValueCache()
+
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', 1))
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', 2))
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'temperature', 20.5))
+
+    trail = connected_client.get_latest(agent_client_id, 'uptime')
+
+    assert trail.name == 'uptime'
+    assert trail.value == 2
+    assert trail.timestamp == Timestamp.from_string('2021-01-01T12:00:00Z')
+
+    trails = connected_client.get_latest_many([
+        (agent_client_id, 'temperature'),
+        (agent_client_id, 'missing'),
+    ])
+
+    assert trails[0].value == 20.5
+    assert trails[1] is None
+
+
+def test_stream_hub_client_should_not_return_invalid_latest_trail(agent_client_id, connected_client):
+    connected_client._latest_values = LatestValueCache()
+
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', None))
+
+    assert connected_client.get_latest(agent_client_id, 'uptime') is None
+
+
+def test_stream_hub_client_should_raise_configuration_exception_when_latest_values_are_disabled(connected_client):
+    with pytest.raises(ConfigurationException):
+        connected_client.get_latest('agent', 'uptime')
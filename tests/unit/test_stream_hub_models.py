@@ -1,6 +1,6 @@
 import pytest
 from datetime import datetime
-from veides.sdk.stream_hub.models import Trail, Timestamp
+from veides.sdk.stream_hub.models import Event, Trail, Timestamp, epoch_seconds
 from tests.unit.fixtures import trail_timestamp
 
 
@@ -45,3 +45,61 @@ def test_should_raise_type_error_on_invalid_trail_parameters(name, value, timest
 def test_should_raise_value_error_on_invalid_trail_data(name, value):
     with pytest.raises(ValueError):
         Trail(name, value, trail_timestamp)
+
+
+@pytest.mark.parametrize("timestamp", [
+    '2021-01-01T12:00:00Z',
+    '1999-12-31T23:59:59Z',
+    '2024-02-29T00:00:01Z',
+])
+def test_timestamp_should_be_parsed_as_strptime_does(timestamp):
+    parsed = Timestamp.from_string(timestamp)
+
+    assert isinstance(parsed, Timestamp)
+    assert parsed == datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+    assert str(parsed) == timestamp
+
+
+@pytest.mark.parametrize("timestamp", [
+    '2021-01-01 12:00:00Z',
+    '2021-01-01T12:00:00',
+    '2021-1-01T12:00:00Z',
+    '2021-01-01T12:00:+0Z',
+    '2021-02-30T12:00:00Z',
+    '2021-01-01T24:00:00Z',
+    '',
+])
+def test_timestamp_should_raise_value_error_on_invalid_format(timestamp):
+    with pytest.raises(ValueError):
+        Timestamp.from_string(timestamp)
+
+
+def test_timestamp_should_raise_type_error_when_not_string():
+    with pytest.raises(TypeError):
+        Timestamp.from_string(None)
+
+
+def test_timestamp_should_convert_to_and_from_epoch_seconds():
+    assert epoch_seconds('2021-01-01T12:00:00Z') == 1609502400
+    assert trail_timestamp.epoch() == 1609502400
+    assert Timestamp.from_epoch(1609502400) == trail_timestamp
+    assert isinstance(Timestamp.from_epoch(1609502400), Timestamp)
+
+
+def test_trail_should_accept_epoch_seconds_timestamp():
+    trail = Trail('name', 1, 1609502400)
+
+    assert trail.timestamp == 1609502400
+
+
+def test_trail_and_event_should_not_have_instance_dict():
+    assert not hasattr(Trail('name', 1, trail_timestamp), '__dict__')
+    assert not hasattr(Event('name', 'message', trail_timestamp), '__dict__')
+    assert not hasattr(trail_timestamp, '__dict__')
+
+
+def test_trusted_trail_should_be_equivalent_to_validated_one():
+    trusted = Trail._trusted('name', 1, trail_timestamp)
+
+    assert isinstance(trusted, Trail)
+    assert str(trusted) == str(Trail('name', 1, trail_timestamp))
@@ -0,0 +1,118 @@
+import pytest
+from veides.sdk.stream_hub.offline_queue import OfflineQueue
+from veides.sdk.stream_hub.reconnect import ReconnectPolicy
+from veides.sdk.stream_hub.segments import list_segments
+
+
+def drain(queue):
+    messages = []
+
+    while True:
+        message = queue.peek()
+
+        if message is None:
+            return messages
+
+        messages.append(message)
+        queue.pop()
+
+
+def test_offline_queue_should_return_messages_in_order():
+    queue = OfflineQueue()
+
+    for i in range(3):
+        assert queue.put('topic/%d' % i, b'payload', 1) is True
+
+    assert len(queue) == 3
+    assert drain(queue) == [('topic/0', b'payload', 1), ('topic/1', b'payload', 1), ('topic/2', b'payload', 1)]
+    assert len(queue) == 0
+
+
+def test_offline_queue_should_drop_messages_when_memory_is_full():
+    queue = OfflineQueue(max_memory=300)
+
+    assert queue.put('topic', b'x' * 100, 1) is True
+    assert queue.put('topic', b'x' * 100, 1) is False
+    assert queue.dropped == 1
+    assert len(queue) == 1
+
+
+def test_offline_queue_should_spill_to_disk_and_keep_order(tmp_path):
+    queue = OfflineQueue(max_memory=300, spill_directory=str(tmp_path), segment_size=64)
+
+    for i in range(10):
+        assert queue.put('topic/%d' % i, b'x' * 10, i % 2) is True
+
+    assert len(queue) == 10
+    assert len(list_segments(str(tmp_path), 'offline')) > 1
+    assert drain(queue) == [('topic/%d' % i, b'x' * 10, i % 2) for i in range(10)]
+    assert list_segments(str(tmp_path), 'offline') == []
+
+
+def test_offline_queue_should_keep_spilling_until_disk_is_drained(tmp_path):
+    queue = OfflineQueue(max_memory=300, spill_directory=str(tmp_path))
+
+    queue.put('topic/0', b'x' * 100, 1)
+    queue.put('topic/1', b'x' * 100, 1)
+
+    queue.pop()
+
+    # Memory has room again, but older message is still on disk
+    queue.put('topic/2', b'x', 1)
+
+    assert [topic for (topic, _, _) in drain(queue)] == ['topic/1', 'topic/2']
+
+
+def test_offline_queue_should_drop_messages_when_disk_is_full(tmp_path):
+    queue = OfflineQueue(max_memory=0, spill_directory=str(tmp_path), max_disk=50)
+
+    assert queue.put('topic', b'x' * 20, 1) is True
+    assert queue.put('topic', b'x' * 20, 1) is False
+    assert queue.dropped == 1
+
+
+def test_offline_queue_should_resume_messages_spilled_by_previous_queue(tmp_path):
+    queue = OfflineQueue(max_memory=0, spill_directory=str(tmp_path))
+
+    queue.put('topic/0', b'first', 1)
+    queue.put('topic/1', b'second', 0)
+    queue.close()
+
+    queue = OfflineQueue(max_memory=0, spill_directory=str(tmp_path))
+    queue.put('topic/2', b'third', 1)
+
+    assert drain(queue) == [('topic/0', b'first', 1), ('topic/1', b'second', 0), ('topic/2', b'third', 1)]
+
+
+@pytest.mark.parametrize('flush_rate', [0, -1, None, '10'])
+def test_offline_queue_should_raise_value_error_when_given_invalid_flush_rate(flush_rate):
+    with pytest.raises(ValueError):
+        OfflineQueue(flush_rate=flush_rate)
+
+
+@pytest.mark.parametrize('attempt', [0, 1, 5, 100, 10000])
+def test_reconnect_policy_should_return_delay_within_bounds(attempt):
+    policy = ReconnectPolicy(min_delay=1, max_delay=60, factor=2, jitter=0.5)
+
+    base = min(60, 2 ** attempt) if attempt < 100 else 60
+
+    for _ in range(100):
+        assert base * 0.5 <= policy.delay(attempt) <= base
+
+
+def test_reconnect_policy_should_return_exact_delay_without_jitter():
+    policy = ReconnectPolicy(min_delay=0.5, max_delay=10, factor=3, jitter=0)
+
+    assert [policy.delay(i) for i in range(4)] == [0.5, 1.5, 4.5, 10]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'min_delay': 0},
+    {'min_delay': 10, 'max_delay': 5},
+    {'factor': 0.5},
+    {'jitter': -0.1},
+    {'jitter': 1.5},
+])
+def test_reconnect_policy_should_raise_value_error_when_given_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        ReconnectPolicy(**kwargs)
@@ -0,0 +1,206 @@
+import json
+import os
+import time
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.stream_hub import ProcessHandlerPool
+from veides.sdk.stream_hub.models import Trail, Timestamp
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+OUTPUT = 'VEIDES_TEST_PROCESS_POOL_OUTPUT'
+
+
+def record_trail(agent, trail):
+    with open(os.path.join(os.environ[OUTPUT], agent), 'a') as f:
+        f.write('%s %s %s %d\n' % (trail.name, trail.value, type(trail.timestamp).__name__, os.getpid()))
+
+
+def fail(agent, trail):
+    raise ValueError('invalid value %s' % trail.value)
+
+
+def read_output(directory, agent, count, timeout=10):
+    path = os.path.join(str(directory), agent)
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.read().splitlines()
+
+            if len(lines) >= count:
+                return [line.split(' ') for line in lines]
+
+        time.sleep(0.01)
+
+    raise AssertionError('worker did not handle %d trails in time' % count)
+
+
+@pytest.fixture()
+def output(tmpdir, monkeypatch):
+    monkeypatch.setenv(OUTPUT, str(tmpdir))
+
+    return tmpdir
+
+
+def test_process_pool_should_handle_trails_of_agent_in_order(output):
+    pool = ProcessHandlerPool(workers=2, max_batch=10)
+    handler_id = pool.register(record_trail)
+    pool.start()
+
+    try:
+        for i in range(25):
+            pool.submit(handler_id, 'first', Trail('uptime', i, Timestamp.from_epoch(1609502400)))
+            pool.submit(handler_id, 'second', Trail('uptime', i * 0.5, 1609502400))
+    finally:
+        pool.shutdown()
+
+    first = read_output(output, 'first', 25)
+    second = read_output(output, 'second', 25)
+
+    assert [line[1] for line in first] == [str(i) for i in range(25)]
+    assert [line[1] for line in second] == [str(i * 0.5) for i in range(25)]
+    assert {line[2] for line in first} == {'Timestamp'}
+    assert {line[2] for line in second} == {'int'}
+    assert len({line[3] for line in first}) == 1
+    assert pool.submitted == 50
+
+
+def test_process_pool_should_send_pending_trails_after_max_delay(output):
+    pool = ProcessHandlerPool(workers=1, max_delay=10)
+    handler_id = pool.register(record_trail)
+    pool.start()
+
+    try:
+        pool.submit(handler_id, 'agent', Trail('uptime', 1, 1609502400))
+
+        assert read_output(output, 'agent', 1)[0][1] == '1'
+    finally:
+        pool.shutdown()
+
+
+def test_process_pool_should_log_worker_exceptions(mocker):
+    logger = mocker.Mock()
+    pool = ProcessHandlerPool(workers=1, logger=logger)
+    handler_id = pool.register(fail)
+    pool.start()
+
+    pool.submit(handler_id, 'agent', Trail('uptime', 7, 1609502400))
+    pool.shutdown()
+
+    assert pool.failed == 1
+    logger.error.assert_called_once_with('Process handler failed: invalid value 7 (agent agent, trail uptime)')
+
+
+def test_process_pool_should_drop_trails_submitted_when_not_running(output):
+    pool = ProcessHandlerPool(workers=1)
+    handler_id = pool.register(record_trail)
+
+    pool.submit(handler_id, 'agent', Trail('uptime', 1, 1609502400))
+
+    assert not pool.running
+
+    pool.start()
+    pool.submit(handler_id, 'agent', Trail('uptime', 2, 1609502400))
+    pool.shutdown(wait=False)
+    pool.submit(handler_id, 'agent', Trail('uptime', 3, 1609502400))
+
+    assert not pool.running
+    assert [line[1] for line in read_output(output, 'agent', 1)] == ['2']
+    assert (pool.submitted, pool.dropped) == (1, 2)
+
+
+def test_process_pool_should_stop_error_collector_when_not_waiting_for_workers():
+    pool = ProcessHandlerPool(workers=1)
+    pool.start()
+    collector = pool._collector
+
+    pool.shutdown(wait=False)
+    collector.join(10)
+
+    assert not collector.is_alive()
+
+
+def test_process_pool_should_raise_type_error_when_callback_is_not_picklable():
+    pool = ProcessHandlerPool()
+
+    with pytest.raises(TypeError):
+        pool.register(lambda agent, trail: None)
+
+
+@pytest.mark.parametrize('kwargs', [{'workers': 0}, {'max_batch': 0}, {'max_delay': 0}])
+def test_process_pool_should_raise_value_error_when_given_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        ProcessHandlerPool(**kwargs)
+
+
+def test_stream_hub_client_should_pass_trails_to_process_pool(output, agent_client_id, connected_client, mocker):
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.connect')
+    pool = ProcessHandlerPool(workers=1)
+    connected_client.on_trail(agent_client_id, 'uptime', record_trail, process_pool=pool)
+
+    assert not pool.running
+
+    connected_client.connect()
+
+    assert pool.running
+
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/uptime'.encode('utf-8')
+    msg.payload = json.dumps({'value': 5, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    connected_client._on_trail(None, None, msg)
+
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.disconnect')
+    connected_client.disconnect()
+
+    assert read_output(output, agent_client_id, 1) == [['uptime', '5', 'Timestamp', mocker.ANY]]
+    assert pool.logger is connected_client.logger
+    assert not pool.running
+
+
+def test_stream_hub_client_should_keep_dispatching_when_worker_process_exits(
+        output,
+        agent_client_id,
+        connected_client,
+        mocker
+):
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.connect')
+    mocker.patch.object(connected_client, 'logger')
+    pool = ProcessHandlerPool(workers=2, max_batch=1)
+    connected_client.on_trail('+', 'uptime', record_trail, process_pool=pool)
+    connected_client.connect()
+
+    dead = pool._worker_for(pool._workers, agent_client_id)
+    dead.process.kill()
+    dead.process.join()
+
+    for value in range(3):
+        msg = MQTTMessage()
+        msg.topic = f'agent/{agent_client_id}/trail/uptime'.encode('utf-8')
+        msg.payload = json.dumps({'value': value, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+        connected_client._on_trail(None, None, msg)
+
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.disconnect')
+    connected_client.disconnect()
+
+    assert [line[1] for line in read_output(output, agent_client_id, 2)] == ['1', '2']
+    assert dead.dead
+    assert pool.dropped == 1
+    assert connected_client.logger.error.call_count == 1
+
+
+def test_stream_hub_client_should_raise_value_error_when_lazy_trails_are_passed_to_process_pool(
+        agent_client_id,
+        connected_client
+):
+    with pytest.raises(ValueError):
+        connected_client.on_trail(agent_client_id, 'uptime', record_trail, lazy=True, process_pool=ProcessHandlerPool())
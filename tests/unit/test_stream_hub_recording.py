@@ -0,0 +1,119 @@
+import json
+import os
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.stream_hub import TrafficRecorder, TrafficReplayer
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+START = 1609502400.0
+
+
+def payload(value):
+    return json.dumps({'value': value, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+
+def test_recorder_should_store_messages_readable_by_replayer(tmpdir):
+    recorder = TrafficRecorder(str(tmpdir), max_segment_size=200, index_interval=2)
+
+    for i in range(10):
+        recorder.record('agent/a/trail/uptime', payload(i), received=START + i)
+
+    recorder.close()
+
+    messages = list(TrafficReplayer(str(tmpdir)).messages())
+
+    assert len([name for name in os.listdir(str(tmpdir)) if name.endswith('.seg')]) > 1
+    assert [m[0] for m in messages] == [START + i for i in range(10)]
+    assert messages[3][1] == 'agent/a/trail/uptime'
+    assert json.loads(messages[3][2])['value'] == 3
+    assert recorder.recorded == 10
+
+
+def test_replayer_should_return_messages_between_start_and_end(tmpdir):
+    recorder = TrafficRecorder(str(tmpdir), index_interval=3)
+
+    for i in range(20):
+        recorder.record('agent/a/trail/uptime', payload(i), received=START + i // 2)
+
+    recorder.close()
+
+    messages = list(TrafficReplayer(str(tmpdir)).messages(start=START + 4, end=START + 6))
+
+    assert [json.loads(m[2])['value'] for m in messages] == [8, 9, 10, 11, 12, 13]
+
+
+def test_replayer_should_skip_incomplete_record(tmpdir):
+    recorder = TrafficRecorder(str(tmpdir))
+    recorder.record('agent/a/trail/uptime', payload(1), received=START)
+    recorder.record('agent/a/trail/uptime', payload(2), received=START)
+    recorder.close()
+
+    path = [os.path.join(str(tmpdir), n) for n in os.listdir(str(tmpdir)) if n.endswith('.seg')][0]
+
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    assert len(list(TrafficReplayer(str(tmpdir)).messages())) == 1
+
+
+def test_replayer_should_pass_messages_to_client_handlers(tmpdir, agent_client_id, connected_client):
+    recorder = TrafficRecorder(str(tmpdir))
+    recorder.record('agent/{}/trail/uptime'.format(agent_client_id), payload(5))
+    recorder.record(
+        'agent/{}/event/alarm'.format(agent_client_id),
+        json.dumps({'message': 'fire', 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+    )
+    recorder.close()
+
+    received = []
+    connected_client.on_trail(agent_client_id, 'uptime', lambda agent, trail: received.append(trail.value))
+    connected_client.on_event(agent_client_id, 'alarm', lambda agent, event: received.append(event.message))
+
+    assert TrafficReplayer(str(tmpdir)).replay(connected_client) == 2
+    assert received == [5, 'fire']
+
+
+def test_replayer_should_keep_recorded_intervals_scaled_by_speed(tmpdir, connected_client, mocker):
+    recorder = TrafficRecorder(str(tmpdir))
+
+    for i in range(3):
+        recorder.record('agent/a/trail/uptime', payload(i), received=START + i)
+
+    recorder.close()
+
+    sleep = mocker.patch('veides.sdk.stream_hub.recording.time.sleep')
+
+    TrafficReplayer(str(tmpdir)).replay(connected_client, speed=10)
+
+    delays = [call[0][0] for call in sleep.call_args_list]
+
+    assert len(delays) == 2
+    assert delays[0] == pytest.approx(0.1, abs=0.05)
+
+
+def test_replayer_should_raise_value_error_when_given_invalid_speed(tmpdir, connected_client):
+    with pytest.raises(ValueError):
+        TrafficReplayer(str(tmpdir)).replay(connected_client, speed=0)
+
+
+def test_stream_hub_client_should_record_received_messages(tmpdir, agent_client_id, connected_client):
+    recorder = TrafficRecorder(str(tmpdir))
+    connected_client._recorder = recorder
+
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/uptime'.encode('utf-8')
+    msg.payload = payload(1)
+
+    connected_client._on_trail(None, None, msg)
+    recorder.close()
+
+    messages = list(TrafficReplayer(str(tmpdir)).messages())
+
+    assert [(m[1], m[2]) for m in messages] == [(f'agent/{agent_client_id}/trail/uptime', payload(1))]
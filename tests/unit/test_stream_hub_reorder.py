@@ -0,0 +1,156 @@
+import threading
+import pytest
+from veides.sdk.stream_hub import ReorderBuffer
+from veides.sdk.stream_hub.models import Timestamp
+from tests.unit.fixtures import (
+    message,
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+NOW = 1609502400
+
+
+def add(buffer, timestamp, value, agent='agent', name='uptime'):
+    return [item for (_, _, item) in buffer.add(agent, name, timestamp, str((timestamp, value)).encode(), value)]
+
+
+def test_reorder_buffer_should_release_items_in_timestamp_order():
+    buffer = ReorderBuffer(lateness=2, max_delay=None)
+
+    assert add(buffer, NOW + 1, 'b') == []
+    assert add(buffer, NOW, 'a') == []
+    assert add(buffer, NOW + 2, 'c') == ['a']
+    assert add(buffer, NOW + 5, 'd') == ['b', 'c']
+    assert buffer.flush() == [('agent', 'uptime', 'd')]
+
+
+def test_reorder_buffer_should_drop_late_and_duplicated_items():
+    buffer = ReorderBuffer(lateness=1, max_delay=None)
+
+    add(buffer, NOW, 'a')
+    add(buffer, NOW, 'a')
+    add(buffer, NOW + 2, 'b')
+
+    assert add(buffer, NOW - 1, 'late') == []
+    assert buffer.late == 1
+    assert buffer.duplicates == 1
+    assert len(buffer) == 1
+
+
+def test_reorder_buffer_should_keep_agents_and_names_separately():
+    buffer = ReorderBuffer(lateness=1, max_delay=None)
+
+    add(buffer, NOW, 'a', agent='first')
+    add(buffer, NOW + 5, 'b', agent='second')
+
+    assert len(buffer) == 2
+    assert add(buffer, NOW - 10, 'c', name='other') == []
+
+
+def test_reorder_buffer_should_release_oldest_item_when_max_pending_exceeded():
+    buffer = ReorderBuffer(lateness=100, max_delay=None, max_pending=2)
+
+    add(buffer, NOW + 2, 'b')
+    add(buffer, NOW + 1, 'a')
+
+    assert add(buffer, NOW + 3, 'c') == ['a']
+    assert buffer.forced == 1
+
+
+def test_reorder_buffer_should_release_items_after_max_delay(mocker):
+    now = mocker.patch('veides.sdk.stream_hub.reorder.time.monotonic', return_value=100.0)
+    buffer = ReorderBuffer(lateness=5, max_delay=1)
+
+    add(buffer, NOW, 'a', agent='idle')
+    now.return_value = 102.0
+
+    assert buffer.add('other', 'uptime', NOW, b'x', 'b') == [('idle', 'uptime', 'a')]
+    assert buffer.release_expired() == []
+
+    now.return_value = 104.0
+
+    assert buffer.release_expired() == [('other', 'uptime', 'b')]
+
+
+def test_reorder_buffer_should_release_items_of_evicted_keys():
+    buffer = ReorderBuffer(lateness=5, max_delay=None, max_keys=1)
+
+    add(buffer, NOW, 'a', agent='first')
+
+    assert buffer.add('second', 'uptime', NOW, b'x', 'b') == [('first', 'uptime', 'a')]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'lateness': -1},
+    {'lateness': 1.5},
+    {'max_delay': 0},
+    {'max_pending': 0},
+    {'max_keys': 0},
+])
+def test_reorder_buffer_should_raise_value_error_when_given_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        ReorderBuffer(**kwargs)
+
+
+def test_stream_hub_client_should_dispatch_reordered_trails(agent_client_id, connected_client, mocker):
+    connected_client._reorder_buffer = ReorderBuffer(lateness=1, max_delay=None)
+    received = []
+    connected_client.on_trail(agent_client_id, 'uptime', lambda agent, trail: received.append(trail.value))
+
+    for (value, timestamp) in [(2, NOW + 1), (1, NOW), (2, NOW + 1), (0, NOW - 5), (3, NOW + 3)]:
+        msg = message(agent_client_id, 'trail', 'uptime', value, str(Timestamp.from_epoch(timestamp)))
+        connected_client._on_trail(None, None, msg)
+
+    assert received == [1, 2]
+    assert connected_client._reorder_buffer.late == 1
+    assert connected_client._reorder_buffer.duplicates == 1
+
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.disconnect')
+    connected_client.disconnect()
+
+    assert received == [1, 2, 3]
+
+
+def test_stream_hub_client_should_release_trails_after_max_delay_when_no_later_trail_arrives(
+        agent_client_id,
+        connected_client,
+        mocker
+):
+    connected_client._reorder_buffer = ReorderBuffer(lateness=10, max_delay=0.05)
+    received = threading.Event()
+    values = []
+
+    def handler(agent, trail):
+        values.append(trail.value)
+
+        if len(values) == 2:
+            received.set()
+
+    connected_client.on_trail(agent_client_id, 'uptime', handler)
+
+    for (value, timestamp) in [(2, NOW + 1), (1, NOW)]:
+        msg = message(agent_client_id, 'trail', 'uptime', value, str(Timestamp.from_epoch(timestamp)))
+        connected_client._on_trail(None, None, msg)
+
+    assert values == []
+    assert received.wait(5)
+    assert values == [1, 2]
+
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.disconnect')
+    connected_client.disconnect()
+
+    assert connected_client._reorder_timer is None
+
+
+def test_stream_hub_client_should_not_buffer_invalid_trails(agent_client_id, connected_client):
+    connected_client._reorder_buffer = ReorderBuffer()
+    connected_client.on_trail(agent_client_id, 'uptime', lambda agent, trail: None)
+
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', 1, timestamp=1))
+
+    assert len(connected_client._reorder_buffer) == 0
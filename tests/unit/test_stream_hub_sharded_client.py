@@ -0,0 +1,192 @@
+import threading
+import pytest
+from paho.mqtt.client import MQTT_ERR_SUCCESS
+from veides.sdk.stream_hub import ShardedStreamHubClient, AuthProperties, ConnectionProperties
+from veides.sdk.stream_hub.dispatcher import DispatchExecutor
+from veides.sdk.stream_hub.exceptions import ConfigurationException, ConnectionException
+
+
+def agent(i):
+    return '{:032d}'.format(i)
+
+
+def create_sharded_client(mocker, **kwargs):
+    def create_paho_client(*args, **kwargs):
+        client = mocker.MagicMock()
+        client.subscribe.return_value = (MQTT_ERR_SUCCESS, 1)
+        client.unsubscribe.return_value = (MQTT_ERR_SUCCESS, 1)
+
+        return client
+
+    mocker.patch('paho.mqtt.client.Client', side_effect=create_paho_client)
+
+    client = ShardedStreamHubClient(
+        AuthProperties(username='name', token='token'),
+        ConnectionProperties(host='hostname'),
+        shards=3,
+        **kwargs
+    )
+
+    for shard in client.shards:
+        shard.connected.set()
+
+    return client
+
+
+@pytest.fixture()
+def sharded_client(mocker):
+    return create_sharded_client(mocker)
+
+
+def subscribed_topics(shard):
+    topics = []
+
+    for call in shard.client.subscribe.call_args_list:
+        if isinstance(call[0][0], list):
+            topics.extend(topic for (topic, _) in call[0][0])
+        else:
+            topics.append(call[0][0])
+
+    return topics
+
+
+def test_sharded_client_should_assign_agents_to_shards_by_hash(sharded_client):
+    agents = [agent(i) for i in range(30)]
+
+    for a in agents:
+        sharded_client.on_trail(a, 'uptime', lambda *_: None)
+
+    for a in agents:
+        shard = sharded_client.shards[sharded_client.shard_for(a)]
+
+        assert 'agent/{}/trail/uptime'.format(a) in subscribed_topics(shard)
+
+    assert all(len(subscribed_topics(shard)) > 0 for shard in sharded_client.shards)
+
+
+def test_sharded_client_should_move_subscriptions_of_disconnected_shard(sharded_client):
+    a = next(agent(i) for i in range(100) if sharded_client.shard_for(agent(i)) == 0)
+    topic = 'agent/{}/event/alarm'.format(a)
+    (first, second, _) = sharded_client.shards
+
+    sharded_client.on_event(a, 'alarm', lambda *_: None)
+
+    first._on_disconnect(None, None, 1)
+
+    assert sharded_client._wait_rebalanced(5)
+    assert topic in subscribed_topics(second)
+    assert topic not in first._subscribed_topics
+    assert first._handlers.match(topic) == []
+    assert second._handlers.match(topic) != []
+
+    first._on_connect(None, None, {}, 0)
+
+    assert sharded_client._wait_rebalanced(5)
+    assert topic in first._subscribed_topics
+    assert topic not in second._subscribed_topics
+    second.client.unsubscribe.assert_called_once_with([topic])
+
+
+def test_sharded_client_should_not_move_subscriptions_on_requested_disconnect(sharded_client):
+    a = next(agent(i) for i in range(100) if sharded_client.shard_for(agent(i)) == 0)
+
+    sharded_client.on_trail(a, 'uptime', lambda *_: None)
+    sharded_client.shards[0]._on_disconnect(None, None, 0)
+
+    assert sharded_client._rebalance_requests == 0
+    assert sharded_client.shards[1].client.subscribe.call_count == 0
+
+
+def test_sharded_client_should_move_subscriptions_outside_of_shard_network_thread(sharded_client, mocker):
+    a = next(agent(i) for i in range(100) if sharded_client.shard_for(agent(i)) == 0)
+    rebalanced_by = []
+    rebalance = sharded_client._rebalance
+
+    def record_thread():
+        rebalanced_by.append(threading.current_thread())
+        rebalance()
+
+    mocker.patch.object(sharded_client, '_rebalance', side_effect=record_thread)
+    sharded_client.on_trail(a, 'uptime', lambda *_: None)
+
+    sharded_client.shards[0]._on_disconnect(None, None, 1)
+
+    assert sharded_client._wait_rebalanced(5)
+    assert threading.current_thread() not in rebalanced_by
+    assert 'agent/{}/trail/uptime'.format(a) in subscribed_topics(sharded_client.shards[1])
+
+    sharded_client.disconnect()
+
+    assert sharded_client._rebalance_thread is None
+
+
+def test_sharded_client_should_move_subscriptions_in_bulk(sharded_client):
+    agents = [agent(i) for i in range(100) if sharded_client.shard_for(agent(i)) == 0][:10]
+    (first, second, _) = sharded_client.shards
+
+    for a in agents:
+        sharded_client.on_trail(a, 'uptime', lambda *_: None)
+
+    second.client.subscribe.reset_mock()
+    first._on_disconnect(None, None, 1)
+
+    assert sharded_client._wait_rebalanced(5)
+    assert second.client.subscribe.call_count == 1
+    assert len(second.client.subscribe.call_args[0][0]) == len(agents)
+
+    first._on_connect(None, None, {}, 0)
+
+    assert sharded_client._wait_rebalanced(5)
+    assert second.client.unsubscribe.call_count == 1
+    assert len(first._subscribed_topics) == len(agents)
+
+
+def test_sharded_client_should_stop_shared_dispatch_executor_once_all_shards_are_disconnected(mocker):
+    executor = DispatchExecutor(workers=1)
+    sharded_client = create_sharded_client(mocker, dispatch_executor=executor)
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.connect')
+    mocker.patch('veides.sdk.stream_hub.client.BaseClient.disconnect')
+
+    sharded_client.connect()
+    sharded_client.shards[0].disconnect()
+
+    assert executor.running
+
+    sharded_client.disconnect()
+
+    assert not executor.running
+
+
+def test_sharded_client_should_assign_subscriptions_to_connected_shards(sharded_client):
+    sharded_client.shards[1].connected.clear()
+    a = next(agent(i) for i in range(100) if sharded_client.shard_for(agent(i)) == 1)
+
+    sharded_client.on_trail(a, 'uptime', lambda *_: None)
+
+    assert 'agent/{}/trail/uptime'.format(a) in subscribed_topics(sharded_client.shards[2])
+
+
+def test_sharded_client_should_connect_when_any_shard_connects(sharded_client, mocker):
+    for shard in sharded_client.shards[1:]:
+        mocker.patch.object(shard, 'connect', side_effect=ConnectionException('failed'))
+
+    mocker.patch.object(sharded_client.shards[0], 'connect')
+
+    sharded_client.connect()
+
+
+def test_sharded_client_should_raise_connection_exception_when_no_shard_connects(sharded_client, mocker):
+    for shard in sharded_client.shards:
+        mocker.patch.object(shard, 'connect', side_effect=ConnectionException('failed'))
+
+    with pytest.raises(ConnectionException):
+        sharded_client.connect()
+
+
+def test_sharded_client_should_raise_configuration_exception_when_given_invalid_shards():
+    with pytest.raises(ConfigurationException):
+        ShardedStreamHubClient(
+            AuthProperties(username='name', token='token'),
+            ConnectionProperties(host='hostname'),
+            shards=0
+        )
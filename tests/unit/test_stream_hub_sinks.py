@@ -0,0 +1,214 @@
+import csv
+import gzip
+import json
+import time
+import pytest
+from paho.mqtt.client import MQTTMessage
+from veides.sdk.stream_hub import FileSink
+from veides.sdk.stream_hub.models import Trail, Event, Timestamp
+from veides.sdk.stream_hub.sinks import list_files
+from tests.unit.fixtures import (
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+TIMESTAMP = Timestamp.from_string('2021-01-01T12:00:00Z')
+
+
+def paths(directory, file_format='ndjson', prefix='stream'):
+    return [path for (_, path) in list_files(str(directory), prefix, file_format)]
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+
+    with opener(path, 'rt') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_file_sink_should_write_trails_and_events_as_ndjson(tmpdir):
+    sink = FileSink(str(tmpdir), flush_interval=60)
+
+    sink('agent', Trail('uptime', 12, TIMESTAMP))
+    sink('agent', Event('alert', 'disk failed', TIMESTAMP))
+    sink.add('trail', 'other', 'uptime', 1.5, 1609502400)
+    sink.close()
+
+    assert read_lines(paths(tmpdir)[0]) == [
+        {'type': 'trail', 'agent': 'agent', 'name': 'uptime', 'value': 12, 'timestamp': '2021-01-01T12:00:00Z'},
+        {'type': 'event', 'agent': 'agent', 'name': 'alert', 'value': 'disk failed', 'timestamp': '2021-01-01T12:00:00Z'},
+        {'type': 'trail', 'agent': 'other', 'name': 'uptime', 'value': 1.5, 'timestamp': 1609502400},
+    ]
+    assert sink.written == 3
+
+
+def test_file_sink_should_rotate_csv_files_by_size_and_write_header_to_each_of_them(tmpdir):
+    sink = FileSink(str(tmpdir), file_format='csv', max_file_size=100, flush_interval=60)
+
+    for i in range(6):
+        sink.add('trail', 'agent', 'uptime', i, TIMESTAMP)
+        sink.flush()
+
+    sink.close()
+
+    files = paths(tmpdir, 'csv')
+    rows = []
+
+    assert len(files) > 1
+
+    for path in files:
+        with open(path) as file:
+            content = list(csv.reader(file))
+
+        assert content[0] == ['type', 'agent', 'name', 'value', 'timestamp']
+        rows.extend(content[1:])
+
+    assert [row[3] for row in rows] == ['0', '1', '2', '3', '4', '5']
+
+
+def test_file_sink_should_rotate_files_by_age(mocker, tmpdir):
+    clock = mocker.patch('veides.sdk.stream_hub.sinks.time')
+    clock.monotonic.return_value = 0
+    sink = FileSink(str(tmpdir), max_file_age=60, flush_interval=60)
+
+    sink.add('trail', 'agent', 'uptime', 1, TIMESTAMP)
+    sink.flush()
+    clock.monotonic.return_value = 30
+    sink.add('trail', 'agent', 'uptime', 2, TIMESTAMP)
+    sink.flush()
+    clock.monotonic.return_value = 61
+    sink.add('trail', 'agent', 'uptime', 3, TIMESTAMP)
+    sink.close()
+
+    assert [[line['value'] for line in read_lines(path)] for path in paths(tmpdir)] == [[1, 2], [3]]
+
+
+def test_file_sink_should_write_gzip_files_readable_after_many_flushes(tmpdir):
+    sink = FileSink(str(tmpdir), compress=True, flush_interval=60)
+
+    for i in range(3):
+        sink.add('trail', 'agent', 'uptime', i, TIMESTAMP)
+        sink.flush()
+
+    sink.close()
+
+    (path,) = paths(tmpdir)
+
+    assert path.endswith('.ndjson.gz')
+    assert [line['value'] for line in read_lines(path)] == [0, 1, 2]
+
+
+def test_file_sink_should_write_in_background_once_buffer_is_full(tmpdir):
+    sink = FileSink(str(tmpdir), max_buffer=10, flush_interval=60)
+
+    for i in range(10):
+        sink.add('trail', 'agent', 'uptime', i, TIMESTAMP)
+
+    deadline = time.time() + 5
+
+    while sink.written < 10 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert sink.written == 10
+
+    sink.close()
+
+
+def test_file_sink_should_write_batch_without_records_which_cannot_be_encoded(mocker, tmpdir):
+    logger = mocker.MagicMock()
+    sink = FileSink(str(tmpdir), max_buffer=100, flush_interval=60, logger=logger)
+
+    sink.add('trail', 'agent', 'uptime', 1, TIMESTAMP)
+    sink.add('trail', 'agent', 'state', object(), TIMESTAMP)
+    sink.add('trail', 'agent', 'uptime', 2, TIMESTAMP)
+
+    sink.close()
+
+    assert sink.written == 2
+    assert sink.failed == 1
+    assert [line['value'] for line in read_lines(paths(tmpdir)[0])] == [1, 2]
+    logger.error.assert_called_once()
+
+
+def test_file_sink_should_drop_records_when_too_many_are_pending(tmpdir):
+    sink = FileSink(str(tmpdir), max_buffer=100, max_pending=2, flush_interval=60)
+
+    for i in range(5):
+        sink.add('trail', 'agent', 'uptime', i, TIMESTAMP)
+
+    sink.close()
+
+    assert sink.dropped == 3
+    assert [line['value'] for line in read_lines(paths(tmpdir)[0])] == [0, 1]
+
+    with pytest.raises(ValueError):
+        sink.add('trail', 'agent', 'uptime', 5, TIMESTAMP)
+
+
+@pytest.mark.parametrize('fsync, expected_calls', [('never', 0), ('rotate', 2), ('always', 2)])
+def test_file_sink_should_call_fsync_according_to_policy(fsync, expected_calls, mocker, tmpdir):
+    calls = mocker.patch('os.fsync')
+    sink = FileSink(str(tmpdir), fsync=fsync, flush_interval=60)
+
+    sink.add('trail', 'agent', 'uptime', 1, TIMESTAMP)
+    sink.flush()
+    sink.close()
+
+    # flush() syncs unless policy is 'never', and so does closing the file
+    assert calls.call_count == expected_calls
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'file_format': 'xml'},
+    {'fsync': 'sometimes'},
+    {'max_file_size': 0},
+    {'flush_interval': 0},
+    {'compress_level': 10},
+])
+def test_file_sink_should_raise_value_error_when_given_invalid_parameters(kwargs, tmpdir):
+    with pytest.raises(ValueError):
+        FileSink(str(tmpdir), **kwargs)
+
+
+def test_stream_hub_client_should_flush_attached_sink_on_disconnect(agent_client_id, connected_client, tmpdir):
+    sink = FileSink(str(tmpdir), flush_interval=60)
+
+    connected_client.on_trail(agent_client_id, 'uptime', sink)
+
+    msg = MQTTMessage()
+    msg.topic = f'agent/{agent_client_id}/trail/uptime'.encode('utf-8')
+    msg.payload = json.dumps({'value': 12, 'timestamp': '2021-01-01T12:00:00Z'}).encode('utf-8')
+
+    connected_client._on_trail(None, None, msg)
+    connected_client.disconnect()
+
+    assert [line['value'] for line in read_lines(sink.path)] == [12]
+
+    sink.close()
+
+
+def test_stream_hub_client_should_flush_remaining_sinks_when_one_of_them_fails(
+        agent_client_id,
+        connected_client,
+        tmpdir,
+        mocker
+):
+    failing = FileSink(str(tmpdir.mkdir('failing')), flush_interval=60)
+    sink = FileSink(str(tmpdir.mkdir('sink')), flush_interval=60)
+    mocker.patch.object(failing, 'flush', side_effect=OSError('No space left on device'))
+    mocker.patch.object(connected_client, 'logger')
+
+    connected_client.on_trail(agent_client_id, 'uptime', failing)
+    connected_client.on_trail(agent_client_id, 'status', sink)
+    sink.add('trail', agent_client_id, 'status', 1, 1609502400)
+
+    connected_client.disconnect()
+
+    assert [line['value'] for line in read_lines(sink.path)] == [1]
+    connected_client.logger.error.assert_called_once_with('Could not flush sink: No space left on device')
+
+    sink.close()
@@ -0,0 +1,143 @@
+import threading
+import pytest
+from veides.sdk.stream_hub import Throttle, DispatchExecutor, ProcessHandlerPool
+from veides.sdk.stream_hub.dispatcher import OVERFLOW_DROP_OLDEST
+from tests.unit.fixtures import (
+    message,
+    connected_client,
+    mocked_paho_client,
+    agent_client_id,
+    username,
+    token,
+    hostname
+)
+
+KEY = ('agent', 'uptime')
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize('kwargs', [{'max_rate': 0}, {'max_rate': '1'}, {'sample_every': 0}, {'sample_every': 1.5}])
+def test_throttle_should_raise_value_error_when_given_invalid_parameters(kwargs):
+    with pytest.raises(ValueError):
+        Throttle(**kwargs)
+
+
+def test_throttle_should_pass_every_nth_message_of_each_key():
+    throttle = Throttle(sample_every=3)
+
+    assert [throttle.allow(KEY) for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert throttle.allow(('other', 'uptime')) is True
+    assert throttle.sampled_out == 4
+
+
+def test_throttle_should_limit_rate_of_each_key():
+    clock = Clock()
+    throttle = Throttle(max_rate=2, clock=clock)
+
+    assert throttle.allow(KEY) is True
+    assert throttle.allow(('other', 'uptime')) is True
+
+    clock.now = 0.4
+    assert throttle.allow(KEY) is False
+
+    clock.now = 0.5
+    assert throttle.allow(KEY) is True
+    assert throttle.allow(KEY) is False
+    assert throttle.rate_limited == 2
+    assert throttle.suppressed == 2
+
+
+def test_throttle_should_keep_only_the_newest_payload_while_delivery_is_scheduled():
+    throttle = Throttle(coalesce=True)
+
+    assert throttle.offer(KEY, b'1') is True
+    assert throttle.take(KEY) == b'1'
+    assert throttle.offer(KEY, b'2') is False
+    assert throttle.offer(KEY, b'3') is False
+    assert throttle.done(KEY) is True
+    assert throttle.take(KEY) == b'3'
+    assert throttle.done(KEY) is False
+    assert throttle.offer(KEY, b'4') is True
+    assert throttle.coalesced == 1
+
+
+def test_stream_hub_client_should_not_decode_trails_suppressed_by_throttle(mocker, agent_client_id, connected_client):
+    clock = Clock()
+    throttle = Throttle(max_rate=1, clock=clock)
+    func = mocker.stub('uptime_handler')
+    decode = mocker.spy(connected_client.codec, 'decode_trail')
+
+    connected_client.on_trail(agent_client_id, 'uptime', func, throttle=throttle)
+
+    for value in range(5):
+        connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', value))
+
+    clock.now = 1
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', 5))
+
+    assert [call[0][1].value for call in func.call_args_list] == [0, 5]
+    assert decode.call_count == 2
+    assert throttle.rate_limited == 4
+
+
+def test_stream_hub_client_should_throttle_only_subscription_given_throttle(mocker, agent_client_id, connected_client):
+    sampled = mocker.stub('sampled_handler')
+    every = mocker.stub('every_handler')
+
+    connected_client.on_event(agent_client_id, 'alert', sampled, throttle=Throttle(sample_every=2))
+    connected_client.on_event('+', 'alert', every)
+
+    for i in range(4):
+        connected_client._on_event(None, None, message(agent_client_id, 'event', 'alert', str(i)))
+
+    assert [call[0][1].message for call in sampled.call_args_list] == ['0', '2']
+    assert every.call_count == 4
+
+
+def test_stream_hub_client_should_pass_the_newest_trail_once_coalesced_handler_is_free(agent_client_id, connected_client):
+    connected_client._executor = DispatchExecutor(workers=1)
+    throttle = Throttle(coalesce=True)
+    started = threading.Event()
+    release = threading.Event()
+    values = []
+
+    def handler(agent, trail):
+        values.append(trail.value)
+        started.set()
+        release.wait()
+
+    connected_client.on_trail(agent_client_id, 'uptime', handler, throttle=throttle)
+
+    connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', 0))
+    started.wait(1)
+
+    for value in range(1, 5):
+        connected_client._on_trail(None, None, message(agent_client_id, 'trail', 'uptime', value))
+
+    release.set()
+    connected_client._executor.shutdown()
+
+    assert values == [0, 4]
+    assert throttle.coalesced == 3
+
+
+def test_stream_hub_client_should_raise_value_error_when_coalesced_trails_can_be_dropped(agent_client_id, connected_client):
+    with pytest.raises(ValueError):
+        connected_client.on_trail(
+            agent_client_id, 'uptime', print, process_pool=ProcessHandlerPool(), throttle=Throttle(coalesce=True)
+        )
+
+    connected_client._executor = DispatchExecutor(overflow=OVERFLOW_DROP_OLDEST)
+
+    with pytest.raises(ValueError):
+        connected_client.on_trail(agent_client_id, 'uptime', print, throttle=Throttle(coalesce=True))
+
+    with pytest.raises(TypeError):
+        connected_client.on_event(agent_client_id, 'alert', print, throttle={'max_rate': 1})
@@ -0,0 +1,68 @@
+import os
+import logging
+from veides.sdk.logs import build_logger
+from veides.sdk.stream_hub.tls import SessionReusingContext, shared_ssl_context, invalidate_ssl_contexts
+
+
+def test_shared_ssl_context_should_be_reused_for_the_same_certificates(tmpdir):
+    capath = str(tmpdir)
+
+    context = shared_ssl_context(capath=capath)
+
+    assert shared_ssl_context(capath=capath) is context
+    assert shared_ssl_context(capath=capath, cafile=None) is context
+
+
+def test_shared_ssl_context_should_be_created_again_when_certificates_changed(tmpdir):
+    capath = str(tmpdir.mkdir('certs'))
+    context = shared_ssl_context(capath=capath)
+
+    tmpdir.join('certs', 'cert.pem').write('')
+    os.utime(capath, ns=(0, 0))
+
+    assert shared_ssl_context(capath=capath) is not context
+
+
+def test_invalidate_ssl_contexts_should_drop_only_matching_contexts(tmpdir):
+    (first, second) = (str(tmpdir.mkdir('first')), str(tmpdir.mkdir('second')))
+    first_context = shared_ssl_context(capath=first)
+    second_context = shared_ssl_context(capath=second)
+
+    assert invalidate_ssl_contexts(capath=first) == 1
+
+    assert shared_ssl_context(capath=first) is not first_context
+    assert shared_ssl_context(capath=second) is second_context
+
+
+def test_session_reusing_context_should_offer_session_of_previous_connection(mocker):
+    sockets = [mocker.Mock(session='first', session_reused=False), mocker.Mock(session='second', session_reused=True)]
+    context = mocker.Mock()
+    context.wrap_socket.side_effect = sockets
+    context.check_hostname = True
+
+    wrapper = SessionReusingContext(context)
+
+    assert wrapper.check_hostname is True
+    assert wrapper.wrap_socket('sock', server_hostname='hostname') is sockets[0]
+    wrapper.save_session()
+
+    wrapper.wrap_socket('sock', server_hostname='hostname')
+    wrapper.save_session()
+
+    assert context.wrap_socket.call_args_list[0] == mocker.call('sock', server_hostname='hostname')
+    assert context.wrap_socket.call_args_list[1] == mocker.call('sock', server_hostname='hostname', session='first')
+    assert wrapper.session == 'second'
+    assert wrapper.resumed == 1
+
+
+def test_build_logger_should_add_handler_once_and_keep_application_handlers():
+    name = 'veides.test.build_logger'
+    handler = logging.NullHandler()
+    logging.getLogger(name).addHandler(handler)
+
+    build_logger(name, logging.INFO)
+    logger = build_logger(name, logging.DEBUG)
+
+    assert logger.level == logging.DEBUG
+    assert handler in logger.handlers
+    assert len(logger.handlers) == 2
@@ -0,0 +1,60 @@
+import pytest
+from veides.sdk.stream_hub.topics import TopicTrie
+
+
+@pytest.mark.parametrize("topic_filter,topic,matches", [
+    ('agent/a/trail/t', 'agent/a/trail/t', True),
+    ('agent/a/trail/t', 'agent/b/trail/t', False),
+    ('agent/+/trail/t', 'agent/b/trail/t', True),
+    ('agent/+/trail/+', 'agent/b/trail/t', True),
+    ('agent/+/trail/+', 'agent/b/trail/t/u', False),
+    ('agent/+/trail/#', 'agent/b/trail/t/u', True),
+    ('agent/+/trail/#', 'agent/b/trail', True),
+    ('agent/+/event/#', 'agent/b/trail/t', False),
+    ('#', 'agent/b/trail/t', True),
+])
+def test_topic_trie_should_match_topic_filters(topic_filter, topic, matches):
+    trie = TopicTrie()
+    trie.add(topic_filter, 'value')
+
+    assert (trie.match(topic) == ['value']) is matches
+
+
+def test_topic_trie_should_return_all_matching_values():
+    trie = TopicTrie()
+    trie.add('agent/a/trail/t', 1)
+    trie.add('agent/+/trail/t', 2)
+    trie.add('agent/+/trail/#', 3)
+    trie.add('agent/b/trail/t', 4)
+
+    assert sorted(trie.match('agent/a/trail/t')) == [1, 2, 3]
+
+
+def test_topic_trie_should_replace_value_for_the_same_filter():
+    trie = TopicTrie()
+    trie.add('agent/+/trail/t', 1)
+    trie.add('agent/+/trail/t', 2)
+
+    assert trie.match('agent/a/trail/t') == [2]
+    assert len(trie) == 1
+
+
+def test_topic_trie_should_remove_filter():
+    trie = TopicTrie()
+    trie.add('agent/+/trail/t', 1)
+    trie.add('agent/+/trail/#', 2)
+
+    assert trie.remove('agent/+/trail/t') is True
+    assert trie.remove('agent/+/trail/t') is False
+    assert trie.match('agent/a/trail/t') == [2]
+    assert trie.filters() == ['agent/+/trail/#']
+
+
+@pytest.mark.parametrize("topic_filter", [
+    'agent/#/trail',
+    'agent/a+/trail',
+    'agent/a#',
+])
+def test_topic_trie_should_raise_value_error_when_given_invalid_filter(topic_filter):
+    with pytest.raises(ValueError):
+        TopicTrie().add(topic_filter, 1)
@@ -1,5 +1,35 @@
 __version__ = '0.2.0'
 
-from veides.sdk.api.base_client import BaseClient
-from veides.sdk.api.client import ApiClient
-from veides.sdk.api.properties import AuthProperties, ConfigurationProperties
+import sys
+from importlib import import_module
+
+# Public names and modules defining them. Modules are imported on first access (PEP 562)
+_EXPORTS = {
+    'BaseClient': 'veides.sdk.api.base_client',
+    'ApiClient': 'veides.sdk.api.client',
+    'AuthProperties': 'veides.sdk.api.properties',
+    'ConfigurationProperties': 'veides.sdk.api.properties',
+    'MetricsRegistry': 'veides.sdk.metrics',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Module __getattr__ is not supported before Python 3.7
+if sys.version_info < (3, 7):
+    for _name in _EXPORTS:
+        __getattr__(_name)
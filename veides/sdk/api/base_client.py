@@ -1,11 +1,10 @@
-import requests
-import logging
 from veides.sdk.api import __version__ as api_client_version
+from veides.sdk.logs import build_logger
 
 
 class BaseClient(object):
     def __init__(self, base_url, token, log_level, logger=None, version='v1'):
-        self.http_client = requests
+        self._http_client = None
 
         self._base_url = '{}/{}'.format(base_url, version)
         self._token = token
@@ -18,6 +17,21 @@ class BaseClient(object):
         else:
             self.logger = logger
 
+    @property
+    def http_client(self):
+        """
+        HTTP lib, imported on first request
+        """
+        if self._http_client is None:
+            import requests
+            self._http_client = requests
+
+        return self._http_client
+
+    @http_client.setter
+    def http_client(self, http_client):
+        self._http_client = http_client
+
     def _post(self, uri, payload, params):
         url = self._base_url + uri
 
@@ -27,15 +41,4 @@ class BaseClient(object):
         })
 
     def _build_logger(self, name, log_level):
-        logger = logging.getLogger(name)
-        logger.handlers = []
-        logger.setLevel(log_level)
-
-        handler = logging.StreamHandler()
-        handler.setFormatter(
-            logging.Formatter("%(asctime)s %(name)s [%(levelname)s] %(message)s")
-        )
-
-        logger.addHandler(handler)
-
-        return logger
+        return build_logger(name, log_level)
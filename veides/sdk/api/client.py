@@ -6,6 +6,7 @@ from veides.sdk.api.exceptions import (
     MethodUnauthorizedException
 )
 import logging
+import time
 
 
 class ApiClient(BaseClient):
@@ -14,8 +15,20 @@ class ApiClient(BaseClient):
             auth_properties,
             configuration_properties,
             log_level=logging.WARN,
-            logger=None
+            logger=None,
+            metrics=None
     ):
+        """
+        :param auth_properties: Auth related properties
+        :type auth_properties: AuthProperties
+        :param configuration_properties: Veides API related properties
+        :type configuration_properties: ConfigurationProperties
+        :param log_level: SDK logging level
+        :param logger: Custom SDK logger
+        :type logger: logging.Logger
+        :param metrics: Registry to report client metrics to. Metrics are not collected by default
+        :type metrics: MetricsRegistry
+        """
         BaseClient.__init__(
             self,
             base_url=configuration_properties.base_url,
@@ -24,6 +37,14 @@ class ApiClient(BaseClient):
             logger=logger
         )
 
+        self.metrics = metrics
+
+        if metrics is not None:
+            self._invoke_seconds = metrics.histogram(
+                'veides_api_invoke_method_seconds',
+                'Duration of invoke method requests'
+            )
+
     def invoke_method(self, agent, name, payload, timeout=30000):
         """
         Invokes a method on an agent and returns the method response (code and payload) sent by agent
@@ -69,7 +90,15 @@ class ApiClient(BaseClient):
 
         self.logger.info('Invoking method {} on agent {}'.format(name, agent))
 
-        response = self._post('/agents/{}/methods/{}'.format(agent, name), payload, {'timeout': timeout})
+        started = time.perf_counter()
+
+        try:
+            response = self._post('/agents/{}/methods/{}'.format(agent, name), payload, {'timeout': timeout})
+        except Exception:
+            self._report_invoke(started, 'error')
+            raise
+
+        self._report_invoke(started, response.status_code)
 
         if response.status_code == 504:
             raise MethodTimeoutException('Method {} on agent {} timeouted after {} ms'.format(name, agent, timeout))
@@ -84,3 +113,14 @@ class ApiClient(BaseClient):
             raise MethodUnauthorizedException(response.json().get('error'))
 
         return response.status_code, response.json()
+
+    def _report_invoke(self, started, status):
+        if self.metrics is None:
+            return
+
+        self._invoke_seconds.observe(time.perf_counter() - started)
+        self.metrics.counter(
+            'veides_api_invoke_method_total',
+            'Invoke method requests by response status code',
+            {'status': status}
+        ).inc()
@@ -0,0 +1,30 @@
+import logging
+
+FORMAT = "%(asctime)s %(name)s [%(levelname)s] %(message)s"
+
+
+class _SdkHandler(logging.StreamHandler):
+    pass
+
+
+def build_logger(name, log_level):
+    """
+    Returns named logger writing to stderr. Loggers are shared by all clients of the same class, so the
+    handler is added only once and handlers added by the application are kept
+
+    :param name: Logger name
+    :type name: str
+    :param log_level: Logger level
+    :type log_level: int
+    :return logging.Logger
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(log_level)
+
+    if not any(isinstance(handler, _SdkHandler) for handler in logger.handlers):
+        handler = _SdkHandler()
+        handler.setFormatter(logging.Formatter(FORMAT))
+
+        logger.addHandler(handler)
+
+    return logger
@@ -0,0 +1,224 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds (in seconds) of latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Counter(object):
+    __slots__ = ('name', 'labels', 'value', '_lock')
+
+    def __init__(self, name, labels):
+        """
+        :param name: Metric name
+        :type name: str
+        :param labels: Metric labels
+        :type labels: tuple
+        """
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        :param amount: Value to add
+        :type amount: int|float
+        :return void
+        """
+        with self._lock:
+            self.value += amount
+
+
+class Histogram(object):
+    __slots__ = ('name', 'labels', 'buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, name, labels, buckets=DEFAULT_BUCKETS):
+        """
+        Histogram with fixed buckets
+
+        :param name: Metric name
+        :type name: str
+        :param labels: Metric labels
+        :type labels: tuple
+        :param buckets: Sorted upper bounds of buckets. Values greater than the last one are counted in +Inf bucket
+        :type buckets: tuple
+        """
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        :param value: Observed value
+        :type value: int|float
+        :return void
+        """
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative_counts(self):
+        """
+        :return list: (upper bound, number of values lower or equal to it) tuples, ending with +Inf bucket
+        """
+        with self._lock:
+            counts = list(self.counts)
+
+        result = []
+        total = 0
+
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+
+class MetricsRegistry(object):
+    def __init__(self):
+        """
+        Keeps counters and histograms reported by clients. The same registry might be shared by many clients
+        """
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help='', labels=None):
+        """
+        Returns counter with given name and labels, creating it if needed
+
+        :param name: Metric name
+        :type name: str
+        :param help: Metric description
+        :type help: str
+        :param labels: Metric labels. Values are converted to strings
+        :type labels: dict
+        :return Counter
+        """
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help='', labels=None, buckets=DEFAULT_BUCKETS):
+        """
+        Returns histogram with given name and labels, creating it if needed
+
+        :param name: Metric name
+        :type name: str
+        :param help: Metric description
+        :type help: str
+        :param labels: Metric labels. Values are converted to strings
+        :type labels: dict
+        :param buckets: Sorted upper bounds of buckets
+        :type buckets: tuple
+        :return Histogram
+        """
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def snapshot(self):
+        """
+        Returns current values of all metrics keyed by name with labels, e.g. `name{label="value"}`.
+        Histograms are returned as dicts with `buckets` (cumulative counts), `sum` and `count`
+
+        :return dict
+        """
+        result = {}
+
+        for metric in self._all():
+            key = metric.name + _format_labels(metric.labels)
+
+            if isinstance(metric, Counter):
+                result[key] = metric.value
+            else:
+                result[key] = {
+                    'buckets': metric.cumulative_counts(),
+                    'sum': metric.sum,
+                    'count': metric.count,
+                }
+
+        return result
+
+    def to_prometheus(self):
+        """
+        Returns all metrics in Prometheus text exposition format
+
+        :return str
+        """
+        lines = []
+        described = set()
+
+        for metric in sorted(self._all(), key=lambda m: (m.name, m.labels)):
+            if metric.name not in described:
+                described.add(metric.name)
+
+                if self._help.get(metric.name):
+                    lines.append('# HELP {} {}'.format(metric.name, self._help[metric.name]))
+
+                metric_type = 'counter' if isinstance(metric, Counter) else 'histogram'
+                lines.append('# TYPE {} {}'.format(metric.name, metric_type))
+
+            if isinstance(metric, Counter):
+                lines.append('{}{} {}'.format(metric.name, _format_labels(metric.labels), metric.value))
+                continue
+
+            for bound, count in metric.cumulative_counts():
+                labels = metric.labels + (('le', '+Inf' if bound == float('inf') else str(bound)),)
+                lines.append('{}_bucket{} {}'.format(metric.name, _format_labels(labels), count))
+
+            lines.append('{}_sum{} {}'.format(metric.name, _format_labels(metric.labels), metric.sum))
+            lines.append('{}_count{} {}'.format(metric.name, _format_labels(metric.labels), metric.count))
+
+        return '\n'.join(lines) + '\n'
+
+    def _get(self, metric_type, name, help, labels, *args):
+        # Values are kept as strings, so labels like status code 200 and 'error' can be sorted together
+        labels = tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+        key = (name, labels)
+        metric = self._metrics.get(key)
+
+        if metric is not None:
+            if not isinstance(metric, metric_type):
+                raise ValueError('metric {} is already registered with different type'.format(name))
+
+            return metric
+
+        with self._lock:
+            metric = self._metrics.get(key)
+
+            if metric is None:
+                for (other_name, _), other in self._metrics.items():
+                    if other_name == name and not isinstance(other, metric_type):
+                        raise ValueError('metric {} is already registered with different type'.format(name))
+
+                metric = metric_type(name, labels, *args)
+                self._metrics[key] = metric
+
+                if help:
+                    self._help.setdefault(name, help)
+
+            return metric
+
+    def _all(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels) + '}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -1,5 +1,54 @@
 __version__ = '0.2.0'
 
-from veides.sdk.stream_hub.client import StreamHubClient
-from veides.sdk.stream_hub.base_client import BaseClient
-from veides.sdk.stream_hub.properties import AuthProperties, ConnectionProperties
+import sys
+from importlib import import_module
+
+# Public names and modules defining them. Modules are imported on first access (PEP 562), so using e.g. only
+# models doesn't import MQTT lib
+_EXPORTS = {
+    'StreamHubClient': 'veides.sdk.stream_hub.client',
+    'AsyncStreamHubClient': 'veides.sdk.stream_hub.async_client',
+    'ShardedStreamHubClient': 'veides.sdk.stream_hub.sharded_client',
+    'BaseClient': 'veides.sdk.stream_hub.base_client',
+    'AuthProperties': 'veides.sdk.stream_hub.properties',
+    'ConnectionProperties': 'veides.sdk.stream_hub.properties',
+    'DispatchExecutor': 'veides.sdk.stream_hub.dispatcher',
+    'ProcessHandlerPool': 'veides.sdk.stream_hub.process_pool',
+    'ReconnectPolicy': 'veides.sdk.stream_hub.reconnect',
+    'OfflineQueue': 'veides.sdk.stream_hub.offline_queue',
+    'LatestValueCache': 'veides.sdk.stream_hub.latest',
+    'RollingAggregator': 'veides.sdk.stream_hub.aggregation',
+    'WindowStats': 'veides.sdk.stream_hub.aggregation',
+    'ReorderBuffer': 'veides.sdk.stream_hub.reorder',
+    'Throttle': 'veides.sdk.stream_hub.throttling',
+    'Deadband': 'veides.sdk.stream_hub.filters',
+    'Range': 'veides.sdk.stream_hub.filters',
+    'Equals': 'veides.sdk.stream_hub.filters',
+    'Matches': 'veides.sdk.stream_hub.filters',
+    'FileSink': 'veides.sdk.stream_hub.sinks',
+    'TrafficRecorder': 'veides.sdk.stream_hub.recording',
+    'TrafficReplayer': 'veides.sdk.stream_hub.recording',
+    'MetricsRegistry': 'veides.sdk.metrics',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Module __getattr__ is not supported before Python 3.7
+if sys.version_info < (3, 7):
+    for _name in _EXPORTS:
+        __getattr__(_name)
@@ -0,0 +1,262 @@
+import threading
+import time
+from array import array
+
+MINUTE = 60
+FIVE_MINUTES = 5 * MINUTE
+HOUR = 60 * MINUTE
+
+DEFAULT_WINDOWS = (MINUTE, FIVE_MINUTES, HOUR)
+
+# Offsets of bucket statistics, each bucket takes _STATS_SIZE subsequent values
+_COUNT = 0
+_SUM = 1
+_MIN = 2
+_MAX = 3
+_STATS_SIZE = 4
+
+# Exact types, so bools are not aggregated as numbers
+_NUMBER_TYPES = (int, float)
+
+
+class WindowStats(object):
+    __slots__ = ('count', 'sum', 'min', 'max')
+
+    def __init__(self, count, sum, min, max):
+        """
+        :param count: Number of samples
+        :type count: int
+        :param sum: Sum of samples
+        :type sum: float
+        :param min: Minimum sample
+        :type min: float
+        :param max: Maximum sample
+        :type max: float
+        """
+        self.count = count
+        self.sum = sum
+        self.min = min
+        self.max = max
+
+    @property
+    def mean(self):
+        return self.sum / self.count
+
+    def __str__(self):
+        return 'WindowStats(count={}, min={}, max={}, mean={})'.format(self.count, self.min, self.max, self.mean)
+
+
+class _Series(object):
+    __slots__ = ('epochs', 'stats')
+
+    def __init__(self, size):
+        # Bucket number (timestamp // bucket width) held by each slot, -1 for never used slot
+        self.epochs = array('q', [-1]) * size
+        self.stats = array('d', [0.0]) * (size * _STATS_SIZE)
+
+
+class RollingAggregator(object):
+    def __init__(self, windows=DEFAULT_WINDOWS, buckets=12, clock=time.time):
+        """
+        Maintains rolling count, sum, min, max and mean of numeric trails for each agent and trail name.
+        Pass it as on_trail callback:
+
+            aggregator = RollingAggregator()
+            client.on_trail('+', 'temperature', aggregator)
+            aggregator.stats(agent, 'temperature', MINUTE)
+
+        Each window is split into buckets, so adding a sample is O(number of windows) and a query
+        is O(buckets). Window boundaries are accurate to window / buckets. Samples are placed by trail
+        timestamp, non-numeric values are ignored
+
+        :param windows: Window lengths (in seconds)
+        :type windows: tuple
+        :param buckets: Number of buckets per window
+        :type buckets: int
+        :param clock: Function returning current time as epoch seconds, used by queries
+        :type clock: callable
+        """
+        if not windows or any(not isinstance(w, int) or w < 1 for w in windows):
+            raise ValueError('windows should be positive integers (seconds)')
+
+        if not isinstance(buckets, int) or buckets < 1:
+            raise ValueError('buckets should be a positive integer')
+
+        self.windows = tuple(sorted(set(windows)))
+        self.buckets = buckets
+        self.ignored = 0
+
+        self._clock = clock
+        self._widths = tuple(float(w) / buckets for w in self.windows)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, agent, trail):
+        """
+        on_trail callback
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param trail: Received trail
+        :type trail: Trail
+        :return void
+        """
+        timestamp = trail.timestamp
+
+        self.add(agent, trail.name, trail.value, timestamp if isinstance(timestamp, int) else timestamp.epoch())
+
+    def __len__(self):
+        return len(self._series)
+
+    def add(self, agent, name, value, timestamp):
+        """
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param value: Trail value
+        :type value: int|float
+        :param timestamp: Sample time as epoch seconds
+        :type timestamp: int|float
+        :return bool: False if value was ignored because it's not a number
+        """
+        if value.__class__ not in _NUMBER_TYPES:
+            self.ignored += 1
+            return False
+
+        key = (agent, name)
+        buckets = self.buckets
+
+        with self._lock:
+            series = self._series.get(key)
+
+            if series is None:
+                series = self._series[key] = _Series(len(self.windows) * buckets)
+
+            epochs = series.epochs
+            stats = series.stats
+            offset = 0
+
+            for width in self._widths:
+                bucket = int(timestamp // width)
+                slot = offset + bucket % buckets
+                current = epochs[slot]
+                i = slot * _STATS_SIZE
+
+                if current == bucket:
+                    stats[i + _COUNT] += 1
+                    stats[i + _SUM] += value
+
+                    if value < stats[i + _MIN]:
+                        stats[i + _MIN] = value
+
+                    if value > stats[i + _MAX]:
+                        stats[i + _MAX] = value
+                elif current < bucket:
+                    epochs[slot] = bucket
+                    stats[i + _COUNT] = 1
+                    stats[i + _SUM] = value
+                    stats[i + _MIN] = value
+                    stats[i + _MAX] = value
+
+                # Samples older than the bucket held by the slot are already out of the window
+
+                offset += buckets
+
+        return True
+
+    def stats(self, agent, name, window, at=None):
+        """
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param window: Window length (in seconds), one of configured windows
+        :type window: int
+        :param at: Epoch seconds the window ends at. Current time by default
+        :type at: int|float
+        :raises ValueError: If window is not configured
+        :return WindowStats|None: Statistics or None if there are no samples in the window
+        """
+        index = self._window_index(window)
+
+        with self._lock:
+            return self._stats(self._series.get((agent, name)), index, self._clock() if at is None else at)
+
+    def stats_many(self, keys, window, at=None):
+        """
+        :param keys: Iterable of (agent, name) tuples
+        :type keys: iterable
+        :param window: Window length (in seconds), one of configured windows
+        :type window: int
+        :param at: Epoch seconds the window ends at. Current time by default
+        :type at: int|float
+        :raises ValueError: If window is not configured
+        :return list: WindowStats (or None) in order of keys
+        """
+        index = self._window_index(window)
+        at = self._clock() if at is None else at
+
+        with self._lock:
+            return [self._stats(self._series.get(key), index, at) for key in keys]
+
+    def series(self):
+        """
+        :return list: (agent, name) tuples of aggregated trails
+        """
+        with self._lock:
+            return list(self._series)
+
+    def remove(self, agent, name):
+        """
+        Drops statistics of the trail
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :return void
+        """
+        with self._lock:
+            self._series.pop((agent, name), None)
+
+    def _window_index(self, window):
+        try:
+            return self.windows.index(window)
+        except ValueError:
+            raise ValueError('window should be one of: {}'.format(', '.join(str(w) for w in self.windows)))
+
+    def _stats(self, series, index, at):
+        if series is None:
+            return None
+
+        buckets = self.buckets
+        last = int(at // self._widths[index])
+        first = last - buckets + 1
+        offset = index * buckets
+        epochs = series.epochs
+        stats = series.stats
+
+        count = 0
+        total = 0.0
+        minimum = None
+        maximum = None
+
+        for slot in range(offset, offset + buckets):
+            if not first <= epochs[slot] <= last:
+                continue
+
+            i = slot * _STATS_SIZE
+            count += int(stats[i + _COUNT])
+            total += stats[i + _SUM]
+
+            if minimum is None or stats[i + _MIN] < minimum:
+                minimum = stats[i + _MIN]
+
+            if maximum is None or stats[i + _MAX] > maximum:
+                maximum = stats[i + _MAX]
+
+        if count == 0:
+            return None
+
+        return WindowStats(count, total, minimum, maximum)
@@ -0,0 +1,543 @@
+import asyncio
+import functools
+import logging
+import threading
+import paho.mqtt.client as paho
+
+from veides.sdk.stream_hub.client import StreamHubClient
+from veides.sdk.stream_hub.exceptions import ConnectionException
+from veides.sdk.stream_hub.reconnect import ReconnectPolicy
+
+
+class _Stream(object):
+    def __init__(self, queue):
+        """
+        Async iterator over (agent, trail) or (agent, event) pairs received by a subscription
+
+        :param queue: Queue filled by the subscription handler
+        :type queue: asyncio.Queue
+        """
+        self._queue = queue
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._queue.get()
+
+
+class AsyncStreamHubClient(StreamHubClient):
+    def __init__(
+            self,
+            auth_properties,
+            connection_properties,
+            logger=None,
+            mqtt_logger=None,
+            log_level=logging.WARN,
+            mqtt_log_level=logging.ERROR,
+            reconnect_policy=None,
+            epoch_timestamps=False,
+            codec=None,
+            max_inflight_messages=20,
+            max_queued_messages=0,
+            metrics=None,
+            latest_values=None,
+            subscribe_batch_size=100
+    ):
+        """
+        Veides Stream Hub client driven by asyncio event loop. MQTT socket is handled by the loop the client
+        was connected in, so no background network thread is used
+
+        :param auth_properties: Auth related properties
+        :type auth_properties: AuthProperties
+        :param connection_properties: Properties related to Veides Stream Hub connection
+        :type connection_properties: ConnectionProperties
+        :param logger: Custom SDK logger
+        :type logger: logging.Logger
+        :param mqtt_logger: Custom MQTT lib logger
+        :type mqtt_logger: logging.Logger
+        :param log_level: SDK logging level
+        :param mqtt_log_level: MQTT lib logging level
+        :param reconnect_policy: Backoff used between reconnect attempts
+        :type reconnect_policy: ReconnectPolicy
+        :param epoch_timestamps: Pass trail and event timestamps as integer epoch seconds instead of Timestamp
+        :type epoch_timestamps: bool
+        :param codec: JSON codec used to encode and decode messages. By default messages are decoded with the fastest
+            installed library and encoded with standard library json module, see default_codec()
+        :type codec: JsonCodec
+        :param max_inflight_messages: Maximum number of QoS>0 messages sent and not yet acknowledged. 0 means no limit
+        :type max_inflight_messages: int
+        :param max_queued_messages: Maximum number of messages waiting to be sent or acknowledged. 0 means no limit
+        :type max_queued_messages: int
+        :param metrics: Registry to report client metrics to. Metrics are not collected by default
+        :type metrics: MetricsRegistry
+        :param latest_values: Cache of the latest trail received for each agent and trail name
+        :type latest_values: LatestValueCache
+        :param subscribe_batch_size: Maximum number of topics sent in a single SUBSCRIBE packet by
+            subscription_batch() and resubscription after reconnect
+        :type subscribe_batch_size: int
+        """
+        StreamHubClient.__init__(
+            self,
+            auth_properties=auth_properties,
+            connection_properties=connection_properties,
+            logger=logger,
+            mqtt_logger=mqtt_logger,
+            log_level=log_level,
+            mqtt_log_level=mqtt_log_level,
+            epoch_timestamps=epoch_timestamps,
+            codec=codec,
+            reconnect_policy=reconnect_policy or ReconnectPolicy(),
+            max_inflight_messages=max_inflight_messages,
+            max_queued_messages=max_queued_messages,
+            metrics=metrics,
+            latest_values=latest_values,
+            subscribe_batch_size=subscribe_batch_size,
+        )
+
+        self._loop = None
+        self._loop_thread_id = None
+        self._fd = None
+        self._misc_task = None
+        self._connecting = None
+        self._reconnect = False
+        self._subscription_futures = {}
+        self._subscription_topics = {}
+
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+        self.client.on_subscribe = self._on_subscribe
+
+    async def connect(self, timeout=30):
+        """
+        :param timeout: Time (in seconds) to wait for connection
+        :type timeout: int|float
+        :raises ConnectionException: If there's any connection problem
+        """
+        self.logger.debug("Connecting to %s:%d" % (self.host, self.port))
+
+        loop = asyncio.get_event_loop()
+
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._connecting = loop.create_future()
+        self._reconnect = True
+        self.connected.clear()
+        self._start_pipelines()
+
+        try:
+            # Socket connection and TLS/WebSocket handshakes are blocking in MQTT lib
+            await loop.run_in_executor(
+                None,
+                functools.partial(self.client.connect, self.host, port=self.port, keepalive=60)
+            )
+        except OSError as e:
+            self._reconnect = False
+            raise ConnectionException("Failed to connect to Veides Stream Hub: %s" % str(e))
+
+        if self._misc_task is None:
+            self._misc_task = loop.create_task(self._misc_loop())
+
+        try:
+            await asyncio.wait_for(self._connecting, timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.disconnect()
+            raise ConnectionException("Timeout occurred while connecting to Veides Stream Hub: %s" % self.host)
+        except ConnectionException:
+            await self.disconnect()
+            raise
+
+    async def disconnect(self):
+        self.logger.info("Closing connection to Veides Stream Hub")
+
+        self._reconnect = False
+        self.client.disconnect()
+
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+
+        self._remove_socket()
+        self._close_pipelines()
+
+        self.logger.info("Closed connection to Veides Stream Hub")
+
+    async def subscribe(self, topic, qos=1, timeout=10):
+        """
+        Subscribes to the topic and waits for broker acknowledgement
+
+        :param topic: Topic to subscribe to
+        :type topic: str
+        :param qos
+        :type qos: int
+        :param timeout: Time (in seconds) to wait for connection and acknowledgement
+        :type timeout: int|float
+        :return bool
+        """
+        if not await self._wait_connected(timeout):
+            self.logger.warning("Could not subscribe in disconnected state")
+            return False
+
+        if not self._subscribe(topic, qos):
+            return False
+
+        future = self._subscription_futures.get(topic)
+
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                return False
+
+        return True
+
+    async def publish(self, topic, data, qos=1, timeout=10):
+        """
+        Publishes the message and waits until it's delivered (QoS 1) or written to the socket (QoS 0)
+
+        :param topic: Topic to publish message to
+        :type topic: str
+        :param data
+        :type data: dict
+        :param qos
+        :type qos: int
+        :param timeout: Time (in seconds) to wait for connection and delivery
+        :type timeout: int|float
+        :return bool
+        """
+        if not await self._wait_connected(timeout):
+            self.logger.warning("Could not send message in disconnected state")
+            return False
+
+        future = self._publish_nowait(topic, data, qos)
+
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    async def publish_many(self, messages, qos=1, timeout=10):
+        """
+        Publishes many messages at once and waits until all of them are delivered (QoS 1) or written
+        to the socket (QoS 0)
+
+        :param messages: Iterable of (topic, data) tuples
+        :type messages: iterable
+        :param qos
+        :type qos: int
+        :param timeout: Time (in seconds) to wait for connection and delivery
+        :type timeout: int|float
+        :return list: Result of publishing each message
+        """
+        messages = list(messages)
+
+        if not await self._wait_connected(timeout):
+            self.logger.warning("Could not send messages in disconnected state")
+            return [False] * len(messages)
+
+        futures = [self._publish_nowait(topic, data, qos) for (topic, data) in messages]
+
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+
+        return [future.done() and future.result() for future in futures]
+
+    def on_trail(self, agent, name, func, lazy=False, throttle=None, filters=None):
+        """
+        Register a callback for the trail sent by particular agent. Callback might be a coroutine function
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected trail name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param func: Callback for trail arrival
+        :type func: callable
+        :param lazy: Pass LazyTrail decoded on first access to value or timestamp
+        :type lazy: bool
+        :param throttle: Rate limit or sampling of trails passed to the callback
+        :type throttle: Throttle
+        :param filters: Filters evaluated on decoded trail value before the callback is called
+        :type filters: list
+        :return bool
+        """
+        return StreamHubClient.on_trail(
+            self, agent, name, self._wrap_coroutine_function(func), lazy=lazy, throttle=throttle, filters=filters
+        )
+
+    def on_event(self, agent, name, func, lazy=False, throttle=None, filters=None):
+        """
+        Register a callback for the event sent by particular agent. Callback might be a coroutine function
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected event name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param func: Callback for event arrival
+        :type func: callable
+        :param lazy: Pass LazyEvent decoded on first access to message or timestamp
+        :type lazy: bool
+        :param throttle: Rate limit or sampling of events passed to the callback
+        :type throttle: Throttle
+        :param filters: Filters evaluated on decoded event message before the callback is called
+        :type filters: list
+        :return bool
+        """
+        return StreamHubClient.on_event(
+            self, agent, name, self._wrap_coroutine_function(func), lazy=lazy, throttle=throttle, filters=filters
+        )
+
+    def trails(self, agent, name, max_queue_size=1000):
+        """
+        Returns async iterator over (agent, trail) pairs received for the subscription. When iterator falls
+        behind by more than max_queue_size trails, the oldest ones are discarded
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected trail name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param max_queue_size: Maximum number of not consumed trails
+        :type max_queue_size: int
+        :return _Stream
+        """
+        queue = asyncio.Queue(maxsize=max_queue_size)
+
+        self.on_trail(agent, name, functools.partial(self._enqueue, queue))
+
+        return _Stream(queue)
+
+    def events(self, agent, name, max_queue_size=1000):
+        """
+        Returns async iterator over (agent, event) pairs received for the subscription. When iterator falls
+        behind by more than max_queue_size events, the oldest ones are discarded
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected event name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param max_queue_size: Maximum number of not consumed events
+        :type max_queue_size: int
+        :return _Stream
+        """
+        queue = asyncio.Queue(maxsize=max_queue_size)
+
+        self.on_event(agent, name, functools.partial(self._enqueue, queue))
+
+        return _Stream(queue)
+
+    def _subscribe(self, topic, qos=1):
+        """
+        Sends subscription request without waiting for connection. Topics subscribed in disconnected state
+        are subscribed once connected
+
+        :param topic: Topic to subscribe to
+        :type topic: str
+        :param qos
+        :type qos: int
+        :return bool
+        """
+        self._subscribed_topics[topic] = qos
+
+        if not self.is_connected():
+            return True
+
+        (result, mid) = self.client.subscribe(topic, qos=qos)
+
+        if result != paho.MQTT_ERR_SUCCESS:
+            self.logger.warning("Unable to subscribe to %s" % topic)
+            del self._subscribed_topics[topic]
+            return False
+
+        if self._loop is not None:
+            self._subscription_futures[topic] = self._loop.create_future()
+            self._subscription_topics[mid] = topic
+
+        return True
+
+    def _subscribe_many(self, topics):
+        """
+        Sends subscription requests without waiting for connection. Topics subscribed in disconnected state
+        are subscribed once connected
+
+        :param topics: Topics to subscribe to with their QoS
+        :type topics: dict
+        :return bool
+        """
+        self._subscribed_topics.update(topics)
+
+        if not self.is_connected():
+            return True
+
+        return self._send_subscriptions(topics) is not None
+
+    async def _wait_connected(self, timeout):
+        if self.is_connected():
+            return True
+
+        if self._connecting is None:
+            return False
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self._connecting), timeout=timeout)
+        except (asyncio.TimeoutError, ConnectionException):
+            return False
+
+        return True
+
+    def _enqueue(self, queue, agent, item):
+        if queue.full():
+            queue.get_nowait()
+
+        queue.put_nowait((agent, item))
+
+    def _wrap_coroutine_function(self, func):
+        if not asyncio.iscoroutinefunction(func):
+            return func
+
+        @functools.wraps(func)
+        def wrapper(agent, item):
+            task = self._loop.create_task(func(agent, item))
+            task.add_done_callback(self._on_handler_done)
+
+        return wrapper
+
+    def _on_handler_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error('Handler failed: %s' % str(task.exception()))
+
+    def _call_in_loop(self, func, *args):
+        if self._loop is None:
+            return
+
+        if threading.get_ident() == self._loop_thread_id:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        try:
+            StreamHubClient._on_connect(self, client, userdata, flags, rc)
+        except ConnectionException as e:
+            self._reconnect = False
+            self._call_in_loop(self._resolve_connecting, e)
+        else:
+            self._call_in_loop(self._resolve_connecting, None)
+
+    def _resolve_connecting(self, error):
+        if self._connecting is None or self._connecting.done():
+            return
+
+        if error is not None:
+            self._connecting.set_exception(error)
+        else:
+            self._connecting.set_result(True)
+
+    def _on_disconnect(self, client, userdata, rc):
+        StreamHubClient._on_disconnect(self, client, userdata, rc)
+
+        self._call_in_loop(self._reset_connecting)
+
+    def _reset_connecting(self):
+        if self._connecting is not None and self._connecting.done() and self._reconnect:
+            self._connecting = self._loop.create_future()
+
+    def _on_subscribe(self, client, userdata, mid, granted_qos):
+        StreamHubClient._on_subscribe(self, client, userdata, mid, granted_qos)
+
+        topic = self._subscription_topics.pop(mid, None)
+        future = self._subscription_futures.pop(topic, None)
+
+        if future is not None:
+            self._call_in_loop(self._resolve_future, future)
+
+    def _create_publish_future(self):
+        return self._loop.create_future()
+
+    def _complete_publish(self, future, result):
+        self._call_in_loop(self._set_future_result, future, result)
+
+    def _set_future_result(self, future, result):
+        if not future.done():
+            future.set_result(result)
+
+    def _resolve_future(self, future):
+        if not future.done():
+            future.set_result(True)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._call_in_loop(self._add_socket, sock.fileno())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._call_in_loop(self._remove_socket)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._call_in_loop(self._add_writer)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._call_in_loop(self._remove_writer)
+
+    def _add_socket(self, fd):
+        self._remove_socket()
+
+        self._fd = fd
+        self._loop.add_reader(fd, self._on_readable)
+
+        if self.client.want_write():
+            self._add_writer()
+
+    def _remove_socket(self):
+        if self._fd is None:
+            return
+
+        self._loop.remove_reader(self._fd)
+        self._loop.remove_writer(self._fd)
+        self._fd = None
+
+    def _add_writer(self):
+        if self._fd is not None:
+            self._loop.add_writer(self._fd, self._on_writable)
+
+    def _remove_writer(self):
+        if self._fd is not None:
+            self._loop.remove_writer(self._fd)
+
+    def _on_readable(self):
+        rc = self.client.loop_read()
+
+        # TLS and WebSocket layers may buffer data which is not signalled by the socket anymore
+        sock = self.client.socket()
+
+        while rc == paho.MQTT_ERR_SUCCESS and sock is not None and sock.pending() > 0:
+            rc = self.client.loop_read()
+            sock = self.client.socket()
+
+    def _on_writable(self):
+        self.client.loop_write()
+
+    async def _misc_loop(self):
+        while True:
+            await asyncio.sleep(1)
+
+            if self.client.socket() is not None:
+                self.client.loop_misc()
+                continue
+
+            if not self._reconnect:
+                continue
+
+            delay = self.reconnect_policy.delay(self._reconnect_attempt)
+            self._reconnect_attempt += 1
+
+            self.logger.info("Reconnecting to Veides Stream Hub in %.1f seconds" % delay)
+            await asyncio.sleep(delay)
+
+            try:
+                self.reconnects += 1
+
+                if self._connection_metrics is not None:
+                    self._connection_metrics.reconnects.inc()
+
+                await self._loop.run_in_executor(None, self.client.reconnect)
+            except Exception as e:
+                self.logger.warning("Reconnect failed: %s" % str(e))
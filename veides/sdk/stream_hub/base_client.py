@@ -1,13 +1,42 @@
-import json
 import socket
-import ssl
 import logging
 import threading
+import time
+from concurrent.futures import Future
 import paho.mqtt.client as paho
 from paho.mqtt import __version__ as paho_version
 
 
 from veides.sdk.stream_hub.exceptions import ConnectionException, ConfigurationException
+from veides.sdk.stream_hub.codec import default_codec
+from veides.sdk.stream_hub.properties import DEFAULT_PORTS, TRANSPORT_WEBSOCKETS
+from veides.sdk.stream_hub.tls import SessionReusingContext, shared_ssl_context
+from veides.sdk.logs import build_logger
+
+
+class _ConnectionMetrics(object):
+    def __init__(self, registry):
+        """
+        :param registry: Registry to report to
+        :type registry: MetricsRegistry
+        """
+        self.publish_seconds = registry.histogram(
+            'veides_stream_hub_publish_seconds',
+            'Time spent handing a message to MQTT lib'
+        )
+        self.published = registry.counter(
+            'veides_stream_hub_publishes_total',
+            'Messages handed to MQTT lib',
+            {'result': 'sent'}
+        )
+        self.failed = registry.counter('veides_stream_hub_publishes_total', labels={'result': 'failed'})
+        self.queued = registry.counter('veides_stream_hub_publishes_total', labels={'result': 'queued'})
+        self.acknowledged = registry.counter(
+            'veides_stream_hub_publishes_acknowledged_total',
+            'Messages written to the socket (QoS 0) or acknowledged (QoS>0)'
+        )
+        self.reconnects = registry.counter('veides_stream_hub_reconnects_total', 'Reconnect attempts')
+        self.disconnects = registry.counter('veides_stream_hub_unexpected_disconnects_total', 'Connections lost')
 
 
 class BaseClient(object):
@@ -20,10 +49,21 @@ class BaseClient(object):
         log_level=logging.WARN,
         mqtt_log_level=logging.ERROR,
         logger=None,
-        mqtt_logger=None
+        mqtt_logger=None,
+        codec=None,
+        subscribe_batch_size=100,
+        reconnect_policy=None,
+        offline_queue=None,
+        max_inflight_messages=20,
+        max_queued_messages=0,
+        metrics=None,
+        transport=TRANSPORT_WEBSOCKETS,
+        port=None,
+        cafile=None
     ):
         """
         Underlying implementation of Veides Stream Hub client featuring communication over MQTT using WebSockets
+        or plain TCP, secured with TLS
 
         :param username: User's name.
         :param token: Users' token. It might be obtained in the console.
@@ -36,18 +76,81 @@ class BaseClient(object):
         :param mqtt_log_level: MQTT lib log level
         :param logger: SDK custom logger
         :param mqtt_logger: MQTT lib custom logger
-        
+        :param codec: JSON codec used to encode and decode messages. By default messages are decoded with the fastest
+            installed library and encoded with standard library json module, see default_codec()
+        :type codec: JsonCodec
+        :param subscribe_batch_size: Maximum number of topics sent in a single SUBSCRIBE packet
+        :type subscribe_batch_size: int
+        :param reconnect_policy: Backoff used between reconnect attempts. When provided, connection is supervised
+            by the SDK network thread instead of MQTT lib one
+        :type reconnect_policy: ReconnectPolicy
+        :param offline_queue: Queue for messages published in disconnected state. Without it, publishing waits
+            for connection and fails after timeout
+        :type offline_queue: OfflineQueue
+        :param max_inflight_messages: Maximum number of QoS>0 messages sent and not yet acknowledged. Further
+            messages are queued by MQTT lib. 0 means no limit
+        :type max_inflight_messages: int
+        :param max_queued_messages: Maximum number of messages queued by MQTT lib, including in-flight ones.
+            Publishing fails once the limit is reached. 0 means no limit
+        :type max_queued_messages: int
+        :param metrics: Registry to report client metrics to. Metrics are not collected by default
+        :type metrics: MetricsRegistry
+        :param transport: 'websockets' or 'tcp'
+        :type transport: str
+        :param port: Port to connect to. Default port of the transport is used when not set
+        :type port: int
+        :param cafile: Certificates file
+        :type cafile: str
+
         :raises ConfigurationException: If there's any issue while setting up TLS context
         """
         self.username = username
         self.token = token
         self.host = host
-        self.port = 9001
+        self.transport = transport
+        self.port = port if port is not None else DEFAULT_PORTS[transport]
 
         self.connected = threading.Event()
 
+        self.codec = codec if codec is not None else default_codec()
+
+        self.metrics = metrics
+        self._connection_metrics = _ConnectionMetrics(metrics) if metrics is not None else None
+
+        self.reconnect_policy = reconnect_policy
+        self.reconnects = 0
+        self._reconnect_attempt = 0
+        self._network_thread = None
+        self._stopping = threading.Event()
+
+        self.offline_queue = offline_queue
+        self._offline_flusher = None
+        self._offline_flush_lock = threading.Lock()
+
         self._subscribed_topics = {}
 
+        if not isinstance(subscribe_batch_size, int) or subscribe_batch_size < 1:
+            raise ConfigurationException("subscribe_batch_size should be a positive integer")
+
+        self.subscribe_batch_size = subscribe_batch_size
+
+        for (name, value) in (('max_inflight_messages', max_inflight_messages),
+                              ('max_queued_messages', max_queued_messages)):
+            if not isinstance(value, int) or value < 0:
+                raise ConfigurationException("%s should be a non-negative integer" % name)
+
+        # Messages handed to MQTT lib and not yet published (QoS 0) or acknowledged (QoS>0), by message id
+        self._pending_publishes = {}
+        # Message ids acknowledged before they were tracked
+        self._early_publishes = set()
+        self._publish_lock = threading.Lock()
+
+        # Duration (in seconds) of the last resubscription after (re)connect, measured until all SUBACKs arrived
+        self.last_resubscribe_duration = None
+        self._resubscribe_started = None
+        self._resubscribe_pending = set()
+        self._resubscribe_lock = threading.Lock()
+
         if logger is None:
             self.logger = self._build_logger(self.__module__ + "." + self.__class__.__name__, log_level)
         else:
@@ -58,18 +161,25 @@ class BaseClient(object):
         else:
             self.mqtt_logger = mqtt_logger
 
-        self.client = paho.Client(transport="websockets", clean_session=True)
+        self.client = paho.Client(transport=transport, clean_session=True)
 
         self.client.username_pw_set(self.username, self.token)
+        self.client.max_inflight_messages_set(max_inflight_messages)
+        self.client.max_queued_messages_set(max_queued_messages)
 
+        # SSL context is shared by clients using the same certificates. The wrapper keeps TLS session
+        # of this client, so it's resumed on reconnect
         try:
-            self.client.tls_set_context(ssl.create_default_context(capath=capath))
+            self._tls_context = SessionReusingContext(shared_ssl_context(capath=capath, cafile=cafile))
+            self.client.tls_set_context(self._tls_context)
         except Exception as e:
             raise ConfigurationException("Unable to use SSL/TLS: %s" % str(e))
 
         self.client.on_log = self._on_log
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
+        self.client.on_subscribe = self._on_subscribe
+        self.client.on_publish = self._on_publish
 
     def connect(self):
         """
@@ -80,38 +190,87 @@ class BaseClient(object):
         try:
             self.connected.clear()
             self.client.connect(self.host, port=self.port, keepalive=60)
-            self.client.loop_start()
+            self._start_network_loop()
 
             if not self.connected.wait(timeout=30):
-                self.client.loop_stop()
+                self._stop_network_loop()
                 raise ConnectionException("Timeout occurred while connecting to Veides Stream Hub: %s" % self.host)
 
         except socket.error as e:
-            self.client.loop_stop()
+            self._stop_network_loop()
             raise ConnectionException("Failed to connect to Veides Stream Hub: %s" % str(e))
 
     def disconnect(self):
         self.logger.info("Closing connection to Veides Stream Hub")
+        self._stopping.set()
         self.client.disconnect()
-        self.client.loop_stop()
+        self._stop_network_loop()
         self.logger.info("Closed connection to Veides Stream Hub")
 
     def is_connected(self):
         return self.connected.isSet()
 
-    def _build_logger(self, name, log_level):
-        logger = logging.getLogger(name)
-        logger.handlers = []
-        logger.setLevel(log_level)
+    def _start_network_loop(self):
+        if self.reconnect_policy is None:
+            self.client.loop_start()
+            return
 
-        handler = logging.StreamHandler()
-        handler.setFormatter(
-            logging.Formatter("%(asctime)s %(name)s [%(levelname)s] %(message)s")
-        )
+        self._stopping.clear()
+        self._reconnect_attempt = 0
+        self._network_thread = threading.Thread(target=self._supervise, name='VeidesNetwork', daemon=True)
+        self._network_thread.start()
 
-        logger.addHandler(handler)
+    def _stop_network_loop(self):
+        if self.reconnect_policy is None:
+            self.client.loop_stop()
+            return
+
+        self._stopping.set()
+
+        if self._network_thread is not None and self._network_thread is not threading.current_thread():
+            self._network_thread.join()
+
+        self._network_thread = None
+
+    def _supervise(self):
+        """
+        Runs MQTT network loop and reconnects with backoff defined by reconnect policy until stopped
+
+        :return void
+        """
+        while not self._stopping.is_set():
+            rc = paho.MQTT_ERR_SUCCESS
+
+            try:
+                while rc == paho.MQTT_ERR_SUCCESS and not self._stopping.is_set():
+                    rc = self.client.loop(timeout=1.0)
+            except ConnectionException as e:
+                # Connection refused by CONNACK, e.g. while the server restarts
+                self.logger.warning("Connection refused: %s" % str(e))
+
+            if self._stopping.is_set():
+                return
 
-        return logger
+            delay = self.reconnect_policy.delay(self._reconnect_attempt)
+            self._reconnect_attempt += 1
+
+            self.logger.info("Reconnecting to Veides Stream Hub in %.1f seconds" % delay)
+
+            if self._stopping.wait(delay):
+                return
+
+            try:
+                self.reconnects += 1
+
+                if self._connection_metrics is not None:
+                    self._connection_metrics.reconnects.inc()
+
+                self.client.reconnect()
+            except (socket.error, OSError, paho.WebsocketConnectionError) as e:
+                self.logger.warning("Reconnect failed: %s" % str(e))
+
+    def _build_logger(self, name, log_level):
+        return build_logger(name, log_level)
 
     def _publish(self, topic, data, qos=1):
         """
@@ -121,23 +280,191 @@ class BaseClient(object):
         :type data: dict
         :param qos
         :type qos: int
-        :return bool
+        :return bool: True if message was sent or queued to send after reconnect
         """
+        if self.offline_queue is not None and (not self.connected.is_set() or len(self.offline_queue) > 0):
+            return self._queue_offline(topic, data, qos)
+
         if not self.connected.wait(timeout=10):
             self.logger.warning("Could not send message in disconnected state")
             return False
 
-        self.logger.debug("Sending message to %s with data %s" % (topic, str(data)))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending message to %s with data %s" % (topic, str(data)))
 
-        payload = json.dumps(data)
+        rc = self._send(topic, self.codec.encode(data), qos)
 
-        result = self.client.publish(topic, payload, qos=qos, retain=False)
+        if rc == paho.MQTT_ERR_ACL_DENIED:
+            self.logger.warning("No permission to send message on %s" % topic)
+            return False
+
+        return rc == paho.MQTT_ERR_SUCCESS
+
+    def _publish_nowait(self, topic, data, qos=1):
+        """
+        Hands the message to MQTT lib without waiting for connection
+
+        :param topic: Topic to publish message to
+        :type topic: str
+        :param data
+        :type data: dict
+        :param qos
+        :type qos: int
+        :return Future: Completed with True once message is published (QoS 0) or acknowledged (QoS>0),
+            or with False if it could not be sent
+        """
+        future = self._create_publish_future()
+
+        if self.offline_queue is not None and (not self.connected.is_set() or len(self.offline_queue) > 0):
+            self._complete_publish(future, self._queue_offline(topic, data, qos))
+            return future
 
-        if result[0] == paho.MQTT_ERR_ACL_DENIED:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending message to %s with data %s" % (topic, str(data)))
+
+        if self._send(topic, self.codec.encode(data), qos, future) == paho.MQTT_ERR_ACL_DENIED:
             self.logger.warning("No permission to send message on %s" % topic)
+
+        return future
+
+    def _send(self, topic, payload, qos, future=None):
+        """
+        :param topic: Topic to publish message to
+        :type topic: str
+        :param payload: Encoded message
+        :type payload: str|bytes
+        :param qos
+        :type qos: int
+        :param future: Future to complete once message is published
+        :return int: MQTT lib result code
+        """
+        started = time.perf_counter() if self._connection_metrics is not None else None
+
+        result = self.client.publish(topic, payload, qos=qos, retain=False)
+        (rc, mid) = (result[0], result[1])
+
+        metrics = self._connection_metrics
+
+        if metrics is not None:
+            metrics.publish_seconds.observe(time.perf_counter() - started)
+            (metrics.published if rc == paho.MQTT_ERR_SUCCESS else metrics.failed).inc()
+
+        # MQTT lib keeps QoS>0 messages published in disconnected state and sends them once reconnected
+        if rc == paho.MQTT_ERR_SUCCESS or (rc == paho.MQTT_ERR_NO_CONN and qos > 0):
+            self._track_publish(mid, qos, future)
+        elif future is not None:
+            self._complete_publish(future, False)
+
+        return rc
+
+    def _track_publish(self, mid, qos, future):
+        with self._publish_lock:
+            if mid in self._early_publishes:
+                self._early_publishes.discard(mid)
+                lost = None
+                published = future
+
+                if self._connection_metrics is not None:
+                    self._connection_metrics.acknowledged.inc()
+            else:
+                # Message id is reused only when previous message with it was lost
+                lost = self._pending_publishes.get(mid)
+                self._pending_publishes[mid] = (future, qos)
+                published = None
+
+        if lost is not None and lost[0] is not None:
+            self._complete_publish(lost[0], False)
+
+        if published is not None:
+            self._complete_publish(published, True)
+
+    def _create_publish_future(self):
+        future = Future()
+        # Completed by the client only, so can't be cancelled by the caller
+        future.set_running_or_notify_cancel()
+
+        return future
+
+    def _complete_publish(self, future, result):
+        """
+        :param future: Future returned by _publish_nowait
+        :param result: Publish result
+        :type result: bool
+        :return void
+        """
+        future.set_result(result)
+
+    def _queue_offline(self, topic, data, qos):
+        payload = self.codec.encode(data)
+
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+
+        if not self.offline_queue.put(topic, payload, qos):
+            self.logger.warning("Offline queue is full, message to %s dropped" % topic)
+
+            if self._connection_metrics is not None:
+                self._connection_metrics.failed.inc()
+
             return False
 
-        return result[0] == paho.MQTT_ERR_SUCCESS
+        if self._connection_metrics is not None:
+            self._connection_metrics.queued.inc()
+
+        if self.connected.is_set():
+            self._start_offline_flush()
+
+        return True
+
+    def _start_offline_flush(self):
+        with self._offline_flush_lock:
+            if self._offline_flusher is not None:
+                return
+
+            self._offline_flusher = threading.Thread(target=self._flush_offline, name='VeidesOfflineFlush', daemon=True)
+            self._offline_flusher.start()
+
+    def _flush_offline(self):
+        """
+        Publishes queued messages in order, limited to flush_rate messages per second
+
+        :return void
+        """
+        queue = self.offline_queue
+        interval = 1.0 / queue.flush_rate
+        next_publish = time.monotonic()
+
+        while True:
+            with self._offline_flush_lock:
+                message = queue.peek() if self.connected.is_set() else None
+
+                if message is None:
+                    self._offline_flusher = None
+                    return
+
+            (topic, payload, qos) = message
+            rc = self._send(topic, payload, qos)
+
+            if rc == paho.MQTT_ERR_ACL_DENIED:
+                self.logger.warning("No permission to send message on %s" % topic)
+            elif rc == paho.MQTT_ERR_NO_CONN and qos > 0:
+                # MQTT lib keeps QoS>0 messages and sends them once reconnected
+                queue.pop()
+                continue
+            elif rc != paho.MQTT_ERR_SUCCESS:
+                with self._offline_flush_lock:
+                    self._offline_flusher = None
+                    return
+
+            queue.pop()
+
+            next_publish += interval
+            delay = next_publish - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_publish = time.monotonic()
 
     def _subscribe(self, topic, qos=1):
         """
@@ -161,6 +488,92 @@ class BaseClient(object):
 
         return result[0] == paho.MQTT_ERR_SUCCESS
 
+    def _unsubscribe(self, topic):
+        """
+        :param topic: Topic to unsubscribe from
+        :type topic: str
+        :return bool
+        """
+        self._subscribed_topics.pop(topic, None)
+
+        if not self.connected.is_set():
+            # Topic is not resubscribed after reconnect anymore
+            return True
+
+        result = self.client.unsubscribe(topic)
+
+        if result[0] != paho.MQTT_ERR_SUCCESS:
+            self.logger.warning("Unable to unsubscribe from %s" % topic)
+            return False
+
+        return True
+
+    def _unsubscribe_many(self, topics):
+        """
+        Unsubscribes from many topics using as few UNSUBSCRIBE packets as subscribe_batch_size allows
+
+        :param topics: Topics to unsubscribe from
+        :type topics: list
+        :return bool
+        """
+        for topic in topics:
+            self._subscribed_topics.pop(topic, None)
+
+        if not self.connected.is_set():
+            # Topics are not resubscribed after reconnect anymore
+            return True
+
+        failed = False
+
+        for i in range(0, len(topics), self.subscribe_batch_size):
+            chunk = topics[i:i + self.subscribe_batch_size]
+
+            if self.client.unsubscribe(chunk)[0] != paho.MQTT_ERR_SUCCESS:
+                self.logger.warning("Unable to unsubscribe from %d topics starting with %s" % (len(chunk), chunk[0]))
+                failed = True
+
+        return not failed
+
+    def _subscribe_many(self, topics):
+        """
+        Subscribes to many topics using as few SUBSCRIBE packets as subscribe_batch_size allows
+
+        :param topics: Topics to subscribe to with their QoS
+        :type topics: dict
+        :return bool
+        """
+        if not self.connected.wait(timeout=10):
+            self.logger.warning("Could not subscribe in disconnected state")
+            return False
+
+        return self._send_subscriptions(topics) is not None
+
+    def _send_subscriptions(self, topics):
+        """
+        :param topics: Topics to subscribe to with their QoS
+        :type topics: dict
+        :return list|None: Message ids of sent SUBSCRIBE packets, or None if any packet failed
+        """
+        items = list(topics.items())
+        mids = []
+        failed = False
+
+        for i in range(0, len(items), self.subscribe_batch_size):
+            chunk = items[i:i + self.subscribe_batch_size]
+            (result, mid) = self.client.subscribe(chunk)
+
+            if result != paho.MQTT_ERR_SUCCESS:
+                self.logger.warning("Unable to subscribe to %d topics starting with %s" % (len(chunk), chunk[0][0]))
+                failed = True
+                continue
+
+            mids.append(mid)
+
+            for topic, qos in chunk:
+                self._subscribed_topics[topic] = qos
+
+        return None if failed else mids
+
     def _on_log(self, client, userdata, level, string):
         """
         :param client: Paho client instance
@@ -189,14 +602,16 @@ class BaseClient(object):
         :return void
         """
         if rc == 0:
+            self._tls_context.save_session()
             self.connected.set()
+            self._reconnect_attempt = 0
             self.logger.info("Connected successfully")
 
             if len(self._subscribed_topics) > 0:
-                for subscription in self._subscribed_topics:
-                    (result, mid) = self.client.subscribe(subscription, qos=self._subscribed_topics[subscription])
-                    if result != paho.MQTT_ERR_SUCCESS:
-                        raise ConnectionException("Unable to subscribe to %s" % subscription)
+                self._resubscribe()
+
+            if self.offline_queue is not None and len(self.offline_queue) > 0:
+                self._start_offline_flush()
         elif rc == 1:
             raise ConnectionException("Unacceptable protocol version")
         elif rc == 2:
@@ -210,6 +625,74 @@ class BaseClient(object):
         else:
             raise ConnectionException("Connection failed with unknown reason. (rc=%d)" % rc)
 
+    def _resubscribe(self):
+        """
+        :raises ConnectionException: If any subscription could not be sent
+        :return void
+        """
+        topics = dict(self._subscribed_topics)
+
+        with self._resubscribe_lock:
+            self._resubscribe_started = time.monotonic()
+            self._resubscribe_pending = set()
+
+            mids = self._send_subscriptions(topics)
+
+            if mids is None:
+                raise ConnectionException("Unable to resubscribe to %d topics" % len(topics))
+
+            self._resubscribe_pending.update(mids)
+
+        self.logger.debug("Resubscribing to %d topics using %d packets" % (len(topics), len(mids)))
+
+    def _on_subscribe(self, client, userdata, mid, granted_qos):
+        """
+        :param client: Paho client instance
+        :type client: paho.Client
+        :param userdata: User-defined data
+        :type userdata: object
+        :param mid: Message id of SUBSCRIBE packet
+        :type mid: int
+        :param granted_qos: QoS granted for each topic
+        :type granted_qos: tuple
+        :return void
+        """
+        with self._resubscribe_lock:
+            if mid not in self._resubscribe_pending:
+                return
+
+            self._resubscribe_pending.discard(mid)
+
+            if self._resubscribe_pending:
+                return
+
+            self.last_resubscribe_duration = time.monotonic() - self._resubscribe_started
+
+        self.logger.info("Resubscribed in %.3f seconds" % self.last_resubscribe_duration)
+
+    def _on_publish(self, client, userdata, mid):
+        """
+        :param client: Paho client instance
+        :type client: paho.Client
+        :param userdata: User-defined data
+        :type userdata: object
+        :param mid: Message id of published (QoS 0) or acknowledged (QoS>0) message
+        :type mid: int
+        :return void
+        """
+        with self._publish_lock:
+            pending = self._pending_publishes.pop(mid, None)
+
+            if pending is None:
+                self._early_publishes.add(mid)
+                return
+
+        if self._connection_metrics is not None:
+            self._connection_metrics.acknowledged.inc()
+
+        if pending[0] is not None:
+            self._complete_publish(pending[0], True)
+
     def _on_disconnect(self, client, userdata, rc):
         """
         :param client: Paho client instance
@@ -222,7 +705,19 @@ class BaseClient(object):
         """
         self.connected.clear()
 
+        # QoS 0 messages not written to the socket yet are dropped by MQTT lib
+        with self._publish_lock:
+            lost = [mid for (mid, (_, qos)) in self._pending_publishes.items() if qos == 0]
+            lost = [self._pending_publishes.pop(mid)[0] for mid in lost]
+
+        for future in lost:
+            if future is not None:
+                self._complete_publish(future, False)
+
         if rc != 0:
             self.logger.error("Unexpected disconnection from Veides Stream Hub: %d" % rc)
+
+            if self._connection_metrics is not None:
+                self._connection_metrics.disconnects.inc()
         else:
             self.logger.info("Disconnected from Veides Stream Hub")
@@ -0,0 +1,205 @@
+import math
+import threading
+import time
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_NUMBER_TYPES = (int, float)
+
+
+class TrailBatch(object):
+    __slots__ = ('agents', 'names', 'values', 'timestamps')
+
+    def __init__(self, agents, names, values, timestamps):
+        """
+        Trails received in a batch window, stored as columns
+
+        :param agents: Agents' client ids
+        :type agents: list
+        :param names: Trail names
+        :type names: list
+        :param values: Trail values as float64. Values which are not int or float (strings, booleans, objects) are NaN
+        :type values: array.array|numpy.ndarray
+        :param timestamps: Trail timestamps as epoch seconds
+        :type timestamps: array.array|numpy.ndarray
+        """
+        self.agents = agents
+        self.names = names
+        self.values = values
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __str__(self):
+        return 'TrailBatch(size={})'.format(len(self))
+
+
+class TrailBatcher(object):
+    def __init__(self, func, max_messages=1000, max_delay=100, use_numpy=None, logger=None):
+        """
+        Accumulates trails and passes them to func as TrailBatch once max_messages trails are collected
+        or max_delay milliseconds passed since the first trail of the batch arrived. Delayed batches are
+        delivered by a background thread started with the first trail and stopped by close()
+
+        :param func: Callback for batch
+        :type func: callable
+        :param max_messages: Maximum number of trails in a batch
+        :type max_messages: int
+        :param max_delay: Maximum time (in ms) a trail waits in a batch
+        :type max_delay: int|float
+        :param use_numpy: Deliver columns as NumPy arrays. By default NumPy is used when installed
+        :type use_numpy: bool
+        :param logger: Logger used to report failed callbacks
+        :type logger: logging.Logger
+        """
+        if not callable(func):
+            raise TypeError('callback should be callable')
+
+        if not isinstance(max_messages, int) or max_messages < 1:
+            raise ValueError('max_messages should be a positive integer')
+
+        if not isinstance(max_delay, (int, float)) or max_delay <= 0:
+            raise ValueError('max_delay should be a positive number')
+
+        if use_numpy and numpy is None:
+            raise ValueError('NumPy is not installed')
+
+        self.func = func
+        self.max_messages = max_messages
+        self.max_delay = max_delay
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._wakeup = None
+        # Monotonic time the current batch is due, None while the batch is empty
+        self._deadline = None
+        self._reset()
+
+    def add(self, agent, name, value, timestamp):
+        """
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param value: Trail value
+        :type value: str|int|float
+        :param timestamp: Trail timestamp as epoch seconds
+        :type timestamp: int
+        :return void
+        """
+        # Exact type check, so booleans and numeric strings are not treated as numbers
+        value = float(value) if value.__class__ in _NUMBER_TYPES else math.nan
+
+        with self._lock:
+            self._agents.append(agent)
+            self._names.append(name)
+            self._values.append(value)
+            self._timestamps.append(timestamp)
+
+            size = len(self._agents)
+
+            if size == 1 and size < self.max_messages:
+                self._deadline = time.monotonic() + self.max_delay / 1000.0
+
+                if self._thread is None:
+                    self._start()
+                else:
+                    self._wakeup.set()
+
+        if size >= self.max_messages:
+            self.flush()
+
+    def flush(self):
+        """
+        Passes collected trails to the callback
+
+        :return void
+        """
+        self._flush()
+
+    def close(self):
+        """
+        Passes collected trails to the callback and stops the background thread.
+        The thread is started again by the next add()
+
+        :return void
+        """
+        with self._lock:
+            (thread, wakeup) = (self._thread, self._wakeup)
+            self._thread = None
+
+        if thread is not None:
+            wakeup.set()
+            thread.join()
+
+        self._flush()
+
+    def _start(self):
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._wakeup,), name='VeidesTrailBatcher', daemon=True)
+        self._thread.start()
+
+    def _run(self, wakeup):
+        current = threading.current_thread()
+
+        while True:
+            with self._lock:
+                if self._thread is not current:
+                    return
+
+                deadline = self._deadline
+
+            timeout = None if deadline is None else deadline - time.monotonic()
+
+            if timeout is not None and timeout <= 0:
+                self._flush(due=True)
+                continue
+
+            wakeup.wait(timeout)
+            wakeup.clear()
+
+    def _flush(self, due=False):
+        with self._flush_lock:
+            with self._lock:
+                if not self._agents:
+                    return
+
+                # A batch flushed by size in the meantime may have been replaced by a newer one
+                if due and (self._deadline is None or self._deadline > time.monotonic()):
+                    return
+
+                batch = self._build_batch()
+                self._deadline = None
+                self._reset()
+
+            try:
+                self.func(batch)
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error('Trail batch handler failed: %s' % str(e))
+
+    def _reset(self):
+        self._agents = []
+        self._names = []
+        self._values = array('d')
+        self._timestamps = array('q')
+
+    def _build_batch(self):
+        if self.use_numpy:
+            return TrailBatch(
+                self._agents,
+                self._names,
+                numpy.frombuffer(self._values, dtype=numpy.float64),
+                numpy.frombuffer(self._timestamps, dtype=numpy.int64)
+            )
+
+        return TrailBatch(self._agents, self._names, self._values, self._timestamps)
+
@@ -1,10 +1,129 @@
-import json
 import logging
+import threading
+import time
 import paho.mqtt.client as paho
 
 from veides.sdk.stream_hub.base_client import BaseClient
+from veides.sdk.stream_hub.exceptions import ConfigurationException
 from veides.sdk.stream_hub.properties import AuthProperties, ConnectionProperties
-from veides.sdk.stream_hub.models import Event, Trail, Timestamp
+from veides.sdk.stream_hub.models import (
+    Event,
+    Trail,
+    LazyEvent,
+    LazyTrail,
+    Timestamp,
+    TRAIL_VALUE_TYPES,
+    epoch_seconds
+)
+from veides.sdk.stream_hub.batching import TrailBatcher
+from veides.sdk.stream_hub.dispatcher import OVERFLOW_DROP_OLDEST
+from veides.sdk.stream_hub.throttling import Throttle
+from veides.sdk.stream_hub.filters import compile_filters
+from veides.sdk.stream_hub.topics import TopicTrie, SINGLE_LEVEL_WILDCARD, validate_topic_filter
+
+
+class _LazyHandler(object):
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+
+class _ProcessHandler(object):
+    __slots__ = ('pool', 'handler_id')
+
+    def __init__(self, pool, handler_id):
+        self.pool = pool
+        self.handler_id = handler_id
+
+
+class _FilteredHandler(object):
+    __slots__ = ('handler', 'accept')
+
+    def __init__(self, handler, accept):
+        self.handler = handler
+        self.accept = accept
+
+
+class _ThrottledHandler(object):
+    __slots__ = ('handler', 'throttle')
+
+    def __init__(self, handler, throttle):
+        self.handler = handler
+        self.throttle = throttle
+
+
+class _DispatchMetrics(object):
+    def __init__(self, registry, message_type):
+        """
+        :param registry: Registry to report to
+        :type registry: MetricsRegistry
+        :param message_type: 'trail' or 'event'
+        :type message_type: str
+        """
+        labels = {'type': message_type}
+
+        self.received = registry.counter(
+            'veides_stream_hub_messages_received_total',
+            'Messages received from Veides Stream Hub',
+            labels
+        )
+        self.dispatched = registry.counter(
+            'veides_stream_hub_messages_dispatched_total',
+            'Successful handler calls',
+            labels
+        )
+        self.handler_errors = registry.counter(
+            'veides_stream_hub_handler_errors_total',
+            'Handler calls which raised an exception',
+            labels
+        )
+        self.decode_errors = registry.counter(
+            'veides_stream_hub_decode_errors_total',
+            'Messages which could not be decoded',
+            labels
+        )
+        self.decode_seconds = registry.histogram(
+            'veides_stream_hub_decode_seconds',
+            'Time spent decoding message payload',
+            labels
+        )
+        self.model_seconds = registry.histogram(
+            'veides_stream_hub_model_seconds',
+            'Time spent creating Trail/Event from decoded payload',
+            labels
+        )
+        self.handler_seconds = registry.histogram(
+            'veides_stream_hub_handler_seconds',
+            'Time spent in handler',
+            labels
+        )
+
+
+class SubscriptionBatch(object):
+    def __init__(self, client):
+        """
+        Collects subscriptions made by on_trail/on_event calls and sends them in bulk on exit
+
+        :param client: Client the subscriptions are made for
+        :type client: StreamHubClient
+        """
+        self._client = client
+        self.topics = {}
+        self.result = None
+
+    def __enter__(self):
+        self._client._subscription_batch = self
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._client._subscription_batch = None
+
+        if exc_type is None and len(self.topics) > 0:
+            self.result = self._client._subscribe_many(self.topics)
+
+        return False
 
 
 class StreamHubClient(BaseClient):
@@ -15,7 +134,19 @@ class StreamHubClient(BaseClient):
             logger=None,
             mqtt_logger=None,
             log_level=logging.WARN,
-            mqtt_log_level=logging.ERROR
+            mqtt_log_level=logging.ERROR,
+            dispatch_executor=None,
+            epoch_timestamps=False,
+            codec=None,
+            reconnect_policy=None,
+            offline_queue=None,
+            max_inflight_messages=20,
+            max_queued_messages=0,
+            metrics=None,
+            latest_values=None,
+            reorder_buffer=None,
+            recorder=None,
+            subscribe_batch_size=100
     ):
         """
         Extends BaseClient with Veides Stream Hub features
@@ -30,6 +161,34 @@ class StreamHubClient(BaseClient):
         :type mqtt_logger: logging.Logger
         :param log_level: SDK logging level
         :param mqtt_log_level: MQTT lib logging level
+        :param dispatch_executor: Executor used to decode messages and run callbacks outside of MQTT network thread.
+            Callbacks run in MQTT network thread when not provided
+        :type dispatch_executor: DispatchExecutor
+        :param epoch_timestamps: Pass trail and event timestamps as integer epoch seconds instead of Timestamp
+        :type epoch_timestamps: bool
+        :param codec: JSON codec used to encode and decode messages. By default messages are decoded with the fastest
+            installed library and encoded with standard library json module, see default_codec()
+        :type codec: JsonCodec
+        :param reconnect_policy: Backoff used between reconnect attempts. When provided, connection is supervised
+            by the SDK network thread instead of MQTT lib one
+        :type reconnect_policy: ReconnectPolicy
+        :param offline_queue: Queue for messages published in disconnected state
+        :type offline_queue: OfflineQueue
+        :param max_inflight_messages: Maximum number of QoS>0 messages sent and not yet acknowledged. 0 means no limit
+        :type max_inflight_messages: int
+        :param max_queued_messages: Maximum number of messages waiting to be sent or acknowledged. 0 means no limit
+        :type max_queued_messages: int
+        :param metrics: Registry to report client metrics to. Metrics are not collected by default
+        :type metrics: MetricsRegistry
+        :param latest_values: Cache of the latest trail received for each agent and trail name, see get_latest()
+        :type latest_values: LatestValueCache
+        :param reorder_buffer: Buffer passing trails to callbacks in timestamp order, without duplicates
+        :type reorder_buffer: ReorderBuffer
+        :param recorder: Recorder appending every received trail and event to segment files, see TrafficReplayer
+        :type recorder: TrafficRecorder
+        :param subscribe_batch_size: Maximum number of topics sent in a single SUBSCRIBE packet by
+            subscription_batch() and resubscription after reconnect
+        :type subscribe_batch_size: int
         """
         BaseClient.__init__(
             self,
@@ -37,24 +196,146 @@ class StreamHubClient(BaseClient):
             token=auth_properties.token,
             host=connection_properties.host,
             capath=connection_properties.capath,
+            cafile=connection_properties.cafile,
+            transport=connection_properties.transport,
+            port=connection_properties.port,
             logger=logger,
             mqtt_logger=mqtt_logger,
             log_level=log_level,
             mqtt_log_level=mqtt_log_level,
+            codec=codec,
+            subscribe_batch_size=subscribe_batch_size,
+            reconnect_policy=reconnect_policy,
+            offline_queue=offline_queue,
+            max_inflight_messages=max_inflight_messages,
+            max_queued_messages=max_queued_messages,
+            metrics=metrics,
         )
 
-        self._handlers = {}
+        self._handlers = TopicTrie()
+        self._subscription_batch = None
+        self._batchers = []
+        self._process_pools = []
+        self._sinks = []
+        self._executor = dispatch_executor
+        self._epoch_timestamps = epoch_timestamps
+        self._latest_values = latest_values
+        self._reorder_buffer = reorder_buffer
+        self._reorder_lock = threading.Lock()
+        self._reorder_timer = None
+        self._recorder = recorder
+        self._throttling = False
+        self._pipelines_started = False
+
+        if metrics is not None:
+            self._trail_metrics = _DispatchMetrics(metrics, 'trail')
+            self._event_metrics = _DispatchMetrics(metrics, 'event')
+        else:
+            self._trail_metrics = None
+            self._event_metrics = None
+
+        self.client.message_callback_add('agent/+/trail/#', self._on_trail)
+        self.client.message_callback_add('agent/+/event/#', self._on_event)
+
+    def connect(self):
+        """
+        :raises ConnectionException: If there's any connection problem
+        """
+        self._start_pipelines()
+
+        BaseClient.connect(self)
+
+    def disconnect(self):
+        BaseClient.disconnect(self)
+
+        self._close_pipelines()
+
+    def subscription_batch(self):
+        """
+        Returns context manager which defers subscriptions made by on_trail/on_event calls and sends them
+        in as few SUBSCRIBE packets as possible on exit. Result of subscribing is available as `result` attribute:
+
+            with client.subscription_batch() as batch:
+                for agent in agents:
+                    client.on_trail(agent, 'uptime', on_uptime)
+
+        :return SubscriptionBatch
+        """
+        return SubscriptionBatch(self)
 
-    def on_trail(self, agent, name, func):
+    def publish(self, topic, data, qos=1):
         """
-        Register a callback for the trail sent by particular agent
+        Publishes the message without waiting for connection or delivery. Returned future is completed with True
+        once the message is written to the socket (QoS 0) or acknowledged by Veides Stream Hub (QoS 1), or with
+        False if it could not be sent. QoS 1 messages published in disconnected state are sent after reconnect
+
+        :param topic: Topic to publish message to
+        :type topic: str
+        :param data
+        :type data: dict
+        :param qos
+        :type qos: int
+        :return concurrent.futures.Future
+        """
+        return self._publish_nowait(topic, data, qos)
+
+    def publish_many(self, messages, qos=1):
+        """
+        Publishes many messages without waiting for connection or delivery
+
+        :param messages: Iterable of (topic, data) tuples
+        :type messages: iterable
+        :param qos
+        :type qos: int
+        :return list: Futures of subsequent messages, see publish()
+        """
+        return [self._publish_nowait(topic, data, qos) for (topic, data) in messages]
+
+    def get_latest(self, agent, name):
+        """
+        Returns the latest trail received from the agent. Requires latest_values cache
 
         :param agent: Agent's client id
         :type agent: str
-        :param name: Expected trail name
+        :param name: Trail name
+        :type name: str
+        :raises ConfigurationException: If client was created without latest_values cache
+        :return Trail|None: Trail or None if there's no fresh (or valid) one
+        """
+        return self._decode_latest(self._get_latest_values().get(agent, name))
+
+    def get_latest_many(self, keys):
+        """
+        Returns the latest trails for many agents and trail names. Requires latest_values cache
+
+        :param keys: Iterable of (agent, name) tuples
+        :type keys: iterable
+        :raises ConfigurationException: If client was created without latest_values cache
+        :return list: Trails (or None) in order of keys
+        """
+        return [self._decode_latest(trail) for trail in self._get_latest_values().get_many(keys)]
+
+    def on_trail(self, agent, name, func, lazy=False, process_pool=None, throttle=None, filters=None):
+        """
+        Register a callback for the trail sent by particular agent. Use `+` as agent to receive trails
+        from any agent and `+`/`#` wildcards in name to receive many trails with one subscription
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected trail name (may contain `+`/`#` wildcards)
         :type name: str
         :param func: Callback for trail arrival
         :type func: callable
+        :param lazy: Pass LazyTrail decoded on first access to value or timestamp, so trails discarded
+            by the callback are never decoded. Decoding errors are raised on access
+        :type lazy: bool
+        :param process_pool: Run the callback in worker processes of the pool. Callback has to be picklable
+        :type process_pool: ProcessHandlerPool
+        :param throttle: Rate limit, sampling or coalescing of trails passed to the callback
+        :type throttle: Throttle
+        :param filters: Filters (e.g. Deadband, Range, Equals, Matches) evaluated in order on decoded trail value,
+            before Trail is created. Trail is passed to the callback only if all of them accept its value
+        :type filters: list
         :return bool
         """
         self._validate_agent_client_id(agent)
@@ -65,21 +346,93 @@ class StreamHubClient(BaseClient):
         if len(name) == 0:
             raise ValueError('trail name should be at least 1 length')
 
+        validate_topic_filter(name)
+
         if not callable(func):
             raise TypeError('callback should be callable')
 
-        return self._add_handler_and_subscribe('trail', agent, name, self._on_trail, func)
+        self._validate_throttle(throttle)
+        self._track_sink(func)
+
+        if throttle is not None and throttle.coalesce:
+            if process_pool is not None:
+                raise ValueError('trails passed to process pool can not be coalesced')
+
+            if self._reorder_buffer is not None:
+                raise ValueError('trails can not be coalesced when reorder buffer is used')
+
+        if process_pool is None:
+            handler = _LazyHandler(func) if lazy else func
+        elif lazy:
+            raise ValueError('lazy trails can not be passed to process pool')
+        else:
+            handler = _ProcessHandler(process_pool, process_pool.register(func))
+
+            if process_pool.logger is None:
+                process_pool.logger = self.logger
+
+            if process_pool not in self._process_pools:
+                self._process_pools.append(process_pool)
+
+            # Workers are not started from network thread on the first trail
+            if self._pipelines_started:
+                process_pool.start()
+
+        handler = self._filtered(handler, filters, lazy)
+
+        return self._add_handler_and_subscribe('trail', agent, name, self._throttled(handler, throttle))
 
-    def on_event(self, agent, name, func):
+    def on_trail_batch(self, agent, name, func, max_messages=1000, max_delay=100):
         """
-        Register a callback for the event sent by particular agent
+        Register a callback for batches of trails sent by particular agent. Trails are delivered as TrailBatch
+        with columns of agents, names, float64 values and epoch seconds timestamps
 
-        :param agent: Agent's client id
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected trail name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param func: Callback for batch of trails
+        :type func: callable
+        :param max_messages: Maximum number of trails in a batch
+        :type max_messages: int
+        :param max_delay: Maximum time (in ms) a trail waits in a batch
+        :type max_delay: int|float
+        :return bool
+        """
+        self._validate_agent_client_id(agent)
+
+        if not isinstance(name, str):
+            raise TypeError('trail name should be a string')
+
+        if len(name) == 0:
+            raise ValueError('trail name should be at least 1 length')
+
+        validate_topic_filter(name)
+
+        batcher = TrailBatcher(func, max_messages=max_messages, max_delay=max_delay, logger=self.logger)
+        self._batchers.append(batcher)
+
+        return self._add_handler_and_subscribe('trail', agent, name, batcher)
+
+    def on_event(self, agent, name, func, lazy=False, throttle=None, filters=None):
+        """
+        Register a callback for the event sent by particular agent. Use `+` as agent to receive events
+        from any agent and `+`/`#` wildcards in name to receive many events with one subscription
+
+        :param agent: Agent's client id or `+`
         :type agent: str
-        :param name: Expected event name
+        :param name: Expected event name (may contain `+`/`#` wildcards)
         :type name: str
         :param func: Callback for event arrival
         :type func: callable
+        :param lazy: Pass LazyEvent decoded on first access to message or timestamp, so events discarded
+            by the callback are never decoded. Decoding errors are raised on access
+        :type lazy: bool
+        :param throttle: Rate limit, sampling or coalescing of events passed to the callback
+        :type throttle: Throttle
+        :param filters: Filters (e.g. Matches, Equals) evaluated in order on decoded event message, before Event
+            is created. Event is passed to the callback only if all of them accept its message
+        :type filters: list
         :return bool
         """
         self._validate_agent_client_id(agent)
@@ -90,10 +443,17 @@ class StreamHubClient(BaseClient):
         if len(name) == 0:
             raise ValueError('event name should be at least 1 length')
 
+        validate_topic_filter(name)
+
         if not callable(func):
             raise TypeError('callback should be callable')
 
-        return self._add_handler_and_subscribe('event', agent, name, self._on_event, func)
+        self._validate_throttle(throttle)
+        self._track_sink(func)
+
+        handler = self._filtered(_LazyHandler(func) if lazy else func, filters, lazy)
+
+        return self._add_handler_and_subscribe('event', agent, name, self._throttled(handler, throttle))
 
     def _on_trail(self, client, userdata, msg):
         """
@@ -107,21 +467,257 @@ class StreamHubClient(BaseClient):
         :type msg: paho.MQTTMessage
         :return void
         """
-        topic_parts = msg.topic.split('/')
-        agent = topic_parts[1]
-        name = topic_parts[-1]
-        payload = json.loads(msg.payload)
-        value = payload.get('value')
-        timestamp = payload.get('timestamp')
+        if self._trail_metrics is not None:
+            self._trail_metrics.received.inc()
 
-        func = self._get_handler('trail', agent, name)
+        topic = msg.topic
 
-        if func is not None:
-            try:
-                trail = Trail(name, value, Timestamp.from_string(timestamp))
-                func(agent, trail)
-            except (ValueError, TypeError) as e:
-                self.logger.error('Could not create Trail object: %s' % str(e))
+        if self._recorder is not None:
+            self._recorder.record(topic, msg.payload)
+
+        handlers = self._handlers.match(topic)
+        latest_values = self._latest_values
+
+        if not handlers and latest_values is None:
+            return
+
+        (_, agent, _, name) = topic.split('/', 3)
+
+        if latest_values is not None:
+            # Decoded on first read, so trails overwritten before being read are never decoded
+            latest_values.put(agent, name, LazyTrail(name, msg.payload, self._decode_trail))
+
+            if not handlers:
+                return
+
+        if self._throttling:
+            handlers = self._throttle(agent, name, msg.payload, handlers, self._dispatch_trail)
+
+            if not handlers:
+                return
+
+        if self._reorder_buffer is not None:
+            self._reorder_trail(agent, name, msg.payload, handlers)
+        elif self._executor is not None:
+            self._executor.submit(agent, self._dispatch_trail, agent, name, msg.payload, handlers)
+        else:
+            self._dispatch_trail(agent, name, msg.payload, handlers)
+
+    def _throttle(self, agent, name, raw_payload, handlers, dispatch):
+        """
+        Applies throttles of matching handlers. Coalesced handlers are dispatched separately
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail or event name
+        :type name: str
+        :param raw_payload: Received message payload
+        :type raw_payload: bytes
+        :param handlers: Handlers matching message topic
+        :type handlers: list
+        :param dispatch: _dispatch_trail or _dispatch_event
+        :type dispatch: callable
+        :return list: Handlers the message should be dispatched to
+        """
+        key = (agent, name)
+        passed = []
+
+        for handler in handlers:
+            if handler.__class__ is not _ThrottledHandler:
+                passed.append(handler)
+                continue
+
+            throttle = handler.throttle
+
+            if not throttle.allow(key):
+                continue
+
+            if not throttle.coalesce:
+                passed.append(handler.handler)
+            elif throttle.offer(key, raw_payload):
+                if self._executor is None:
+                    self._dispatch_coalesced(dispatch, agent, name, handler)
+                elif not self._executor.submit(agent, self._dispatch_coalesced, dispatch, agent, name, handler):
+                    throttle.cancel(key)
+
+        return passed
+
+    def _dispatch_coalesced(self, dispatch, agent, name, handler):
+        """
+        Passes the newest message to coalesced handler until no newer one arrives while it runs
+
+        :return void
+        """
+        key = (agent, name)
+        throttle = handler.throttle
+
+        while True:
+            dispatch(agent, name, throttle.take(key), [handler.handler])
+
+            if not throttle.done(key):
+                return
+
+    def _reorder_trail(self, agent, name, raw_payload, handlers):
+        """
+        Passes received trail through reorder buffer and dispatches released trails
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param raw_payload: Received message payload
+        :type raw_payload: bytes
+        :param handlers: Handlers matching trail topic
+        :type handlers: list
+        :return void
+        """
+        try:
+            payload = self.codec.decode_trail(raw_payload)
+            timestamp = epoch_seconds(payload[1])
+        except (ValueError, TypeError) as e:
+            self.logger.error('Could not decode trail payload: %s' % str(e))
+
+            if self._trail_metrics is not None:
+                self._trail_metrics.decode_errors.inc()
+
+            return
+
+        with self._reorder_lock:
+            released = self._reorder_buffer.add(agent, name, timestamp, raw_payload, (raw_payload, handlers, payload))
+
+            self._dispatch_released_trails(released)
+
+            if self._reorder_timer is None:
+                self._schedule_reorder_timer()
+
+    def _schedule_reorder_timer(self):
+        """
+        Schedules release of trails which wait longer than max_delay, so trails of agents which stopped sending
+        are released too. Called with reorder lock held
+
+        :return void
+        """
+        deadline = self._reorder_buffer.next_deadline()
+
+        if deadline is None:
+            return
+
+        # Timer fires at most 10 times per max_delay, so it doesn't run for every trail under load
+        delay = max(deadline - time.monotonic(), self._reorder_buffer.max_delay / 10.0)
+
+        self._reorder_timer = threading.Timer(delay, self._release_expired_trails)
+        self._reorder_timer.daemon = True
+        self._reorder_timer.start()
+
+    def _release_expired_trails(self):
+        with self._reorder_lock:
+            if self._reorder_timer is None:
+                # Cancelled on disconnect
+                return
+
+            self._reorder_timer = None
+            self._dispatch_released_trails(self._reorder_buffer.release_expired())
+            self._schedule_reorder_timer()
+
+    def _dispatch_released_trails(self, released):
+        """
+        :param released: (agent, name, (raw payload, handlers, decoded payload)) tuples released by reorder buffer
+        :type released: list
+        :return void
+        """
+        for (agent, name, (raw_payload, handlers, payload)) in released:
+            if self._executor is not None:
+                self._executor.submit(agent, self._dispatch_trail, agent, name, raw_payload, handlers, payload)
+            else:
+                self._dispatch_trail(agent, name, raw_payload, handlers, payload)
+
+    def _dispatch_trail(self, agent, name, raw_payload, handlers, payload=None):
+        """
+        Decodes received trail and passes it to handlers
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param raw_payload: Received message payload
+        :type raw_payload: bytes
+        :param handlers: Handlers matching trail topic
+        :type handlers: list
+        :param payload: Already decoded payload, if any
+        :type payload: tuple
+        :return void
+        """
+        metrics = self._trail_metrics
+        trail = None
+        lazy_trail = None
+        invalid = False
+
+        for handler in handlers:
+            if handler.__class__ is _LazyHandler:
+                if lazy_trail is None:
+                    lazy_trail = LazyTrail(name, raw_payload, self._decode_trail, trail)
+
+                self._call_handler(metrics, handler.func, agent, lazy_trail, 'Trail handler failed: %s')
+                continue
+
+            if invalid:
+                continue
+
+            if payload is None:
+                started = time.perf_counter() if metrics is not None else None
+
+                try:
+                    payload = self.codec.decode_trail(raw_payload)
+                except ValueError as e:
+                    self.logger.error('Could not decode trail payload: %s' % str(e))
+                    invalid = True
+
+                    if metrics is not None:
+                        metrics.decode_errors.inc()
+
+                    continue
+
+                if metrics is not None:
+                    metrics.decode_seconds.observe(time.perf_counter() - started)
+
+            (value, timestamp) = payload
+
+            if handler.__class__ is _FilteredHandler:
+                if not handler.accept(agent, name, value):
+                    continue
+
+                handler = handler.handler
+
+            if isinstance(handler, TrailBatcher):
+                try:
+                    handler.add(agent, name, value, epoch_seconds(timestamp))
+                except (ValueError, TypeError) as e:
+                    self.logger.error('Could not add trail to batch: %s' % str(e))
+
+                continue
+
+            if trail is None:
+                started = time.perf_counter() if metrics is not None else None
+
+                try:
+                    trail = self._create_trail(name, value, timestamp)
+                except (ValueError, TypeError) as e:
+                    self.logger.error('Could not create Trail object: %s' % str(e))
+                    invalid = True
+
+                    if metrics is not None:
+                        metrics.decode_errors.inc()
+
+                    continue
+
+                if metrics is not None:
+                    metrics.model_seconds.observe(time.perf_counter() - started)
+
+            if handler.__class__ is _ProcessHandler:
+                handler.pool.submit(handler.handler_id, agent, trail)
+                continue
+
+            self._call_handler(metrics, handler, agent, trail, 'Trail handler failed: %s')
 
     def _on_event(self, client, userdata, msg):
         """
@@ -135,36 +731,350 @@ class StreamHubClient(BaseClient):
         :type msg: paho.MQTTMessage
         :return void
         """
-        topic_parts = msg.topic.split('/')
-        agent = topic_parts[1]
-        name = topic_parts[-1]
-        payload = json.loads(msg.payload)
-        message = payload.get('message')
-        timestamp = payload.get('timestamp')
+        if self._event_metrics is not None:
+            self._event_metrics.received.inc()
+
+        topic = msg.topic
+
+        if self._recorder is not None:
+            self._recorder.record(topic, msg.payload)
+
+        handlers = self._handlers.match(topic)
+
+        if not handlers:
+            return
+
+        (_, agent, _, name) = topic.split('/', 3)
+
+        if self._throttling:
+            handlers = self._throttle(agent, name, msg.payload, handlers, self._dispatch_event)
+
+            if not handlers:
+                return
+
+        if self._executor is not None:
+            self._executor.submit(agent, self._dispatch_event, agent, name, msg.payload, handlers)
+        else:
+            self._dispatch_event(agent, name, msg.payload, handlers)
+
+    def _dispatch_event(self, agent, name, raw_payload, handlers):
+        """
+        Decodes received event and passes it to handlers
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Event name
+        :type name: str
+        :param raw_payload: Received message payload
+        :type raw_payload: bytes
+        :param handlers: Handlers matching event topic
+        :type handlers: list
+        :return void
+        """
+        metrics = self._event_metrics
+        payload = None
+        event = None
+        lazy_event = None
+        invalid = False
+
+        for handler in handlers:
+            if handler.__class__ is _LazyHandler:
+                if lazy_event is None:
+                    lazy_event = LazyEvent(name, raw_payload, self._decode_event, event)
+
+                self._call_handler(metrics, handler.func, agent, lazy_event, 'Event handler failed: %s')
+                continue
+
+            if invalid:
+                continue
+
+            if payload is None:
+                started = time.perf_counter() if metrics is not None else None
+
+                try:
+                    payload = self.codec.decode_event(raw_payload)
+                except ValueError as e:
+                    self.logger.error('Could not decode event payload: %s' % str(e))
+                    invalid = True
+
+                    if metrics is not None:
+                        metrics.decode_errors.inc()
+
+                    continue
+
+                if metrics is not None:
+                    metrics.decode_seconds.observe(time.perf_counter() - started)
+
+            if handler.__class__ is _FilteredHandler:
+                if not handler.accept(agent, name, payload[0]):
+                    continue
+
+                handler = handler.handler
+
+            if event is None:
+                started = time.perf_counter() if metrics is not None else None
+
+                try:
+                    event = self._create_event(name, payload[0], payload[1])
+                except (ValueError, TypeError) as e:
+                    self.logger.error('Could not create Event object: %s' % str(e))
+                    invalid = True
+
+                    if metrics is not None:
+                        metrics.decode_errors.inc()
+
+                    continue
+
+                if metrics is not None:
+                    metrics.model_seconds.observe(time.perf_counter() - started)
+
+            self._call_handler(metrics, handler, agent, event, 'Event handler failed: %s')
+
+    def _call_handler(self, metrics, func, agent, item, error_message):
+        """
+        :param metrics: Metrics to report to, if enabled
+        :type metrics: _DispatchMetrics
+        :param func: Handler
+        :type func: callable
+        :param agent: Agent's client id
+        :type agent: str
+        :param item: Trail or event passed to the handler
+        :param error_message: Message logged when handler fails
+        :type error_message: str
+        :return void
+        """
+        if metrics is None:
+            try:
+                func(agent, item)
+            except Exception as e:
+                self.logger.error(error_message % str(e))
+
+            return
+
+        started = time.perf_counter()
+
+        try:
+            func(agent, item)
+        except Exception as e:
+            self.logger.error(error_message % str(e))
+            metrics.handler_errors.inc()
+        else:
+            metrics.dispatched.inc()
+
+        metrics.handler_seconds.observe(time.perf_counter() - started)
+
+    def _get_latest_values(self):
+        if self._latest_values is None:
+            raise ConfigurationException('latest_values cache is not enabled')
+
+        return self._latest_values
+
+    def _decode_latest(self, trail):
+        if trail is None:
+            return None
+
+        try:
+            return trail.decode()
+        except (ValueError, TypeError) as e:
+            self.logger.error('Could not decode latest trail: %s' % str(e))
+            return None
+
+    def _decode_trail(self, name, raw_payload):
+        """
+        Creates Trail from raw payload. Used by LazyTrail
+
+        :raises TypeError: If value or timestamp has invalid type
+        :raises ValueError: If payload can't be decoded or timestamp has invalid value
+        :return Trail
+        """
+        (value, timestamp) = self.codec.decode_trail(raw_payload)
+
+        return self._create_trail(name, value, timestamp)
+
+    def _decode_event(self, name, raw_payload):
+        """
+        Creates Event from raw payload. Used by LazyEvent
+
+        :raises TypeError: If message or timestamp has invalid type
+        :raises ValueError: If payload can't be decoded or timestamp has invalid value
+        :return Event
+        """
+        (message, timestamp) = self.codec.decode_event(raw_payload)
+
+        return self._create_event(name, message, timestamp)
+
+    def _create_trail(self, name, value, timestamp):
+        """
+        Creates Trail from received payload. Name comes from the topic, so only payload is validated
+
+        :raises TypeError: If value or timestamp has invalid type
+        :raises ValueError: If name or timestamp has invalid value
+        :return Trail
+        """
+        if not name:
+            raise ValueError('Trail name should be at least 1 length')
+
+        if not isinstance(value, TRAIL_VALUE_TYPES):
+            raise TypeError('Trail value should be one of: string, integer, float')
+
+        return Trail._trusted(name, value, self._parse_timestamp(timestamp))
+
+    def _create_event(self, name, message, timestamp):
+        """
+        Creates Event from received payload. Name comes from the topic, so only payload is validated
+
+        :raises TypeError: If message or timestamp has invalid type
+        :raises ValueError: If name or timestamp has invalid value
+        :return Event
+        """
+        if not name:
+            raise ValueError('Event name should be at least 1 length')
+
+        if not isinstance(message, str):
+            raise TypeError('Event message should be a string')
+
+        return Event._trusted(name, message, self._parse_timestamp(timestamp))
+
+    def _parse_timestamp(self, timestamp):
+        if self._epoch_timestamps:
+            return epoch_seconds(timestamp)
+
+        return Timestamp.from_string(timestamp)
+
+    def _validate_throttle(self, throttle):
+        if throttle is None:
+            return
+
+        if not isinstance(throttle, Throttle):
+            raise TypeError('throttle should be a Throttle')
+
+        # Coalesced message waits for its scheduled delivery, which must not be dropped
+        if throttle.coalesce and self._executor is not None and self._executor.overflow == OVERFLOW_DROP_OLDEST:
+            raise ValueError('messages can not be coalesced when dispatch executor drops oldest tasks')
+
+    def _start_pipelines(self):
+        """
+        Starts dispatch executor and worker processes of process pools. Called before connecting
+
+        :return void
+        """
+        self._pipelines_started = True
 
-        func = self._get_handler('event', agent, name)
+        if self._executor is not None:
+            self._executor.start()
 
-        if func is not None:
+        for pool in self._process_pools:
+            pool.start()
+
+    def _close_pipelines(self):
+        """
+        Passes trails and events still buffered by the client to callbacks, sinks and recorder
+        and stops process pools. Called once disconnected
+
+        :return void
+        """
+        self._pipelines_started = False
+        self._flush_reorder_buffer()
+
+        if self._executor is not None:
+            self._executor.shutdown()
+
+        for batcher in self._batchers:
+            batcher.close()
+
+        for pool in self._process_pools:
+            pool.shutdown()
+
+        if self._recorder is not None:
+            self._recorder.flush()
+
+        for sink in self._sinks:
             try:
-                event = Event(name, message, Timestamp.from_string(timestamp))
-                func(agent, event)
-            except (ValueError, TypeError) as e:
-                self.logger.error('Could not create Event object: %s' % str(e))
+                sink.flush()
+            except Exception as e:
+                self.logger.error('Could not flush sink: %s' % str(e))
+
+    def _flush_reorder_buffer(self):
+        """
+        Stops reorder timer and dispatches all trails pending in reorder buffer
+
+        :return void
+        """
+        if self._reorder_buffer is None:
+            return
+
+        with self._reorder_lock:
+            if self._reorder_timer is not None:
+                self._reorder_timer.cancel()
+                self._reorder_timer = None
+
+            self._dispatch_released_trails(self._reorder_buffer.flush())
+
+    def _track_sink(self, func):
+        # Sinks buffer records, so they are flushed on disconnect. Checked by attribute, so sinks module
+        # is not imported with the client
+        if getattr(func, 'flush_on_disconnect', False) and func not in self._sinks:
+            self._sinks.append(func)
+
+    def _filtered(self, handler, filters, lazy):
+        if filters is None:
+            return handler
 
-    def _add_handler_and_subscribe(self, handler_type, agent, name, callback, handler):
+        if lazy:
+            raise ValueError('filters can not be used with lazy handlers, since they need decoded payload')
+
+        return _FilteredHandler(handler, compile_filters(filters))
+
+    def _throttled(self, handler, throttle):
+        if throttle is None:
+            return handler
+
+        self._throttling = True
+
+        return _ThrottledHandler(handler, throttle)
+
+    def _add_handler_and_subscribe(self, handler_type, agent, name, handler):
         topic = 'agent/{}/{}/{}'.format(agent, handler_type, name)
 
-        self.client.message_callback_add(topic, callback)
-        self._handlers['{}_{}_{}'.format(handler_type, agent, name)] = handler
+        self._handlers.add(topic, handler)
+
+        if topic in self._subscribed_topics:
+            return True
+
+        batch = self._subscription_batch
+
+        if batch is not None:
+            batch.topics[topic] = 1
+            return True
 
         return self._subscribe(topic, 1)
 
-    def _get_handler(self, handler_type, agent, name):
-        return self._handlers.get('{}_{}_{}'.format(handler_type, agent, name), None)
+    def _remove_handler_and_unsubscribe(self, handler_type, agent, name):
+        topic = 'agent/{}/{}/{}'.format(agent, handler_type, name)
+
+        self._handlers.remove(topic)
+
+        return self._unsubscribe(topic)
+
+    def _remove_handlers_and_unsubscribe(self, keys):
+        """
+        :param keys: (handler type, agent, name) tuples
+        :type keys: list
+        :return bool
+        """
+        topics = ['agent/{}/{}/{}'.format(agent, handler_type, name) for (handler_type, agent, name) in keys]
+
+        for topic in topics:
+            self._handlers.remove(topic)
+
+        return self._unsubscribe_many(topics)
 
     def _validate_agent_client_id(self, client_id):
         if not isinstance(client_id, str):
             raise TypeError('agent client id should be a string')
 
+        if client_id == SINGLE_LEVEL_WILDCARD:
+            return
+
         if len(client_id) != 32:
             raise ValueError('agent client id should be 32 length string')
@@ -0,0 +1,167 @@
+import json
+
+
+class JsonCodec(object):
+    name = 'json'
+
+    def encode(self, data):
+        """
+        :param data: Message data
+        :type data: dict
+        :return str|bytes
+        """
+        return json.dumps(data)
+
+    def decode(self, payload):
+        """
+        :param payload: Raw message payload
+        :type payload: bytes
+        :raises ValueError: If payload is not a valid JSON object
+        :return dict
+        """
+        data = json.loads(payload)
+
+        if not isinstance(data, dict):
+            raise ValueError('payload should be a JSON object')
+
+        return data
+
+    def decode_trail(self, payload):
+        """
+        :param payload: Raw trail payload
+        :type payload: bytes
+        :raises ValueError: If payload is not a valid JSON object
+        :return tuple: (value, timestamp)
+        """
+        data = self.decode(payload)
+
+        return data.get('value'), data.get('timestamp')
+
+    def decode_event(self, payload):
+        """
+        :param payload: Raw event payload
+        :type payload: bytes
+        :raises ValueError: If payload is not a valid JSON object
+        :return tuple: (message, timestamp)
+        """
+        data = self.decode(payload)
+
+        return data.get('message'), data.get('timestamp')
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode(self, data):
+        return self._dumps(data)
+
+    def decode(self, payload):
+        data = self._loads(payload)
+
+        if not isinstance(data, dict):
+            raise ValueError('payload should be a JSON object')
+
+        return data
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+
+        self._dumps = ujson.dumps
+        self._loads = ujson.loads
+
+    def encode(self, data):
+        return self._dumps(data)
+
+    def decode(self, payload):
+        data = self._loads(payload)
+
+        if not isinstance(data, dict):
+            raise ValueError('payload should be a JSON object')
+
+        return data
+
+
+class MsgspecCodec(JsonCodec):
+    name = 'msgspec'
+
+    def __init__(self):
+        import msgspec
+        from typing import Any
+
+        trail = msgspec.defstruct('TrailPayload', [('value', Any, None), ('timestamp', Any, None)])
+        event = msgspec.defstruct('EventPayload', [('message', Any, None), ('timestamp', Any, None)])
+
+        self._error = msgspec.DecodeError
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder(dict)
+        self._trail_decoder = msgspec.json.Decoder(trail)
+        self._event_decoder = msgspec.json.Decoder(event)
+
+    def encode(self, data):
+        return self._encoder.encode(data)
+
+    def decode(self, payload):
+        try:
+            return self._decoder.decode(payload)
+        except self._error as e:
+            raise ValueError(str(e))
+
+    def decode_trail(self, payload):
+        try:
+            trail = self._trail_decoder.decode(payload)
+        except self._error as e:
+            raise ValueError(str(e))
+
+        return trail.value, trail.timestamp
+
+    def decode_event(self, payload):
+        try:
+            event = self._event_decoder.decode(payload)
+        except self._error as e:
+            raise ValueError(str(e))
+
+        return event.message, event.timestamp
+
+
+class _DecodingCodec(JsonCodec):
+    def __init__(self, codec):
+        """
+        Decodes with given codec and encodes with standard library json module
+
+        :param codec: Codec used for decoding
+        :type codec: JsonCodec
+        """
+        self.name = codec.name
+        self.decode = codec.decode
+        self.decode_trail = codec.decode_trail
+        self.decode_event = codec.decode_event
+
+
+def default_codec():
+    """
+    Returns codec decoding with the fastest available library. Optional JSON libraries are tried in order:
+    orjson, msgspec, ujson. Standard library json module is used when none of them is installed
+
+    Messages are always encoded with standard library json module, so installing one of these libraries
+    doesn't change what is published (they differ e.g. in handling of NaN and non-string dict keys).
+    Pass OrjsonCodec, MsgspecCodec or UjsonCodec as codec to encode with them too
+
+    :return JsonCodec
+    """
+    for codec in (OrjsonCodec, MsgspecCodec, UjsonCodec):
+        try:
+            return _DecodingCodec(codec())
+        except ImportError:
+            pass
+
+    return JsonCodec()
@@ -0,0 +1,245 @@
+import logging
+import threading
+from collections import deque
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+_COUNTERS = ('submitted', 'processed', 'dropped_oldest', 'dropped_newest', 'dropped_stopped')
+
+
+class _Lane(object):
+    def __init__(self, executor, index):
+        self.executor = executor
+        self.tasks = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.busy = False
+        self.submitted = 0
+        self.processed = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        # Tasks submitted after shutdown
+        self.dropped_stopped = 0
+        self.thread = threading.Thread(
+            target=self._run,
+            name='VeidesDispatch-{}'.format(index),
+            daemon=True
+        )
+
+    def _run(self):
+        tasks = self.tasks
+        condition = self.condition
+
+        while True:
+            with condition:
+                while not tasks and self.running:
+                    condition.wait()
+
+                if not tasks:
+                    return
+
+                (func, args) = tasks.popleft()
+                self.busy = True
+                condition.notify_all()
+
+            try:
+                func(*args)
+            except Exception as e:
+                self.executor.logger.error('Dispatched task failed: %s' % str(e))
+
+            with condition:
+                self.busy = False
+                self.processed += 1
+                condition.notify_all()
+
+
+class DispatchExecutor(object):
+    def __init__(self, workers=4, queue_size=10000, overflow=OVERFLOW_BLOCK, logger=None):
+        """
+        Runs tasks on a pool of worker threads. Tasks submitted with the same key always run on the same
+        worker thread, so they are executed in submission order
+
+        :param workers: Number of worker threads (lanes)
+        :type workers: int
+        :param queue_size: Maximum number of pending tasks per lane
+        :type queue_size: int
+        :param overflow: What to do when a lane queue is full. One of: `block` (wait for free space),
+            `drop_oldest` (discard the oldest pending task), `drop_newest` (discard the submitted task)
+        :type overflow: str
+        :param logger: Logger used to report failed tasks
+        :type logger: logging.Logger
+        """
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('workers should be a positive integer')
+
+        if not isinstance(queue_size, int) or queue_size < 1:
+            raise ValueError('queue_size should be a positive integer')
+
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow should be one of: {}'.format(', '.join(OVERFLOW_POLICIES)))
+
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.logger = logger or logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+
+        self._lanes = None
+        self._started = False
+        self._lock = threading.Lock()
+
+        # Counters of lanes which were already shut down
+        self._totals = dict.fromkeys(_COUNTERS, 0)
+
+    @property
+    def dropped(self):
+        stats = self.stats()
+
+        return stats['dropped_oldest'] + stats['dropped_newest'] + stats['dropped_stopped']
+
+    @property
+    def running(self):
+        return self._lanes is not None
+
+    def start(self):
+        """
+        Starts worker threads. Does nothing if already started
+
+        :return void
+        """
+        with self._lock:
+            if self._lanes is not None:
+                return
+
+            lanes = [_Lane(self, i) for i in range(self.workers)]
+
+            for lane in lanes:
+                lane.running = True
+                lane.thread.start()
+
+            self._lanes = lanes
+            self._started = True
+
+    def shutdown(self, wait=True):
+        """
+        Stops worker threads after pending tasks are processed
+
+        :param wait: Wait until worker threads finish
+        :type wait: bool
+        :return void
+        """
+        with self._lock:
+            lanes = self._lanes
+            self._lanes = None
+
+        if lanes is None:
+            return
+
+        for lane in lanes:
+            with lane.condition:
+                lane.running = False
+                lane.condition.notify_all()
+
+        if wait:
+            for lane in lanes:
+                if lane.thread is not threading.current_thread():
+                    lane.thread.join()
+
+        with self._lock:
+            for lane in lanes:
+                for counter in _COUNTERS:
+                    self._totals[counter] += getattr(lane, counter)
+
+    def submit(self, key, func, *args):
+        """
+        Schedules func(*args) on the lane assigned to the key. Worker threads are started on the first submit
+        if start() was not called. Tasks submitted after shutdown() are dropped until start() is called again
+
+        :param key: Ordering key (e.g. agent's client id)
+        :type key: str
+        :param func: Task to run
+        :type func: callable
+        :return bool: False if the task was dropped
+        """
+        lanes = self._lanes
+
+        if lanes is None:
+            if not self._started:
+                self.start()
+
+            lanes = self._lanes
+
+            if lanes is None:
+                with self._lock:
+                    self._totals['dropped_stopped'] += 1
+
+                return False
+
+        lane = lanes[hash(key) % len(lanes)]
+        tasks = lane.tasks
+
+        with lane.condition:
+            if not lane.running:
+                # Executor was shut down in the meantime
+                lane.dropped_stopped += 1
+                return False
+
+            lane.submitted += 1
+
+            if len(tasks) >= self.queue_size:
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    lane.dropped_newest += 1
+                    return False
+                elif self.overflow == OVERFLOW_DROP_OLDEST:
+                    tasks.popleft()
+                    lane.dropped_oldest += 1
+                else:
+                    while len(tasks) >= self.queue_size and lane.running:
+                        lane.condition.wait()
+
+                    if not lane.running:
+                        lane.submitted -= 1
+                        lane.dropped_stopped += 1
+                        return False
+
+            tasks.append((func, args))
+            lane.condition.notify_all()
+
+        return True
+
+    def join(self, timeout=None):
+        """
+        Waits until all submitted tasks are processed
+
+        :param timeout: Maximum time (in seconds) to wait for each lane
+        :type timeout: float
+        :return bool: False if timeout occurred
+        """
+        lanes = self._lanes or []
+
+        for lane in lanes:
+            with lane.condition:
+                if not lane.condition.wait_for(lambda: not lane.tasks and not lane.busy, timeout=timeout):
+                    return False
+
+        return True
+
+    def stats(self):
+        """
+        :return dict
+        """
+        lanes = self._lanes or []
+
+        with self._lock:
+            stats = dict(self._totals)
+
+        for lane in lanes:
+            for counter in _COUNTERS:
+                stats[counter] += getattr(lane, counter)
+
+        stats['pending'] = sum(len(lane.tasks) for lane in lanes)
+
+        return stats
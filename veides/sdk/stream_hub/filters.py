@@ -0,0 +1,200 @@
+import re
+from abc import ABC, abstractmethod
+
+_NUMBER_TYPES = (int, float)
+
+
+def _is_number(value):
+    # Exact type check, so booleans are not treated as numbers
+    return value.__class__ in _NUMBER_TYPES
+
+
+class Filter(ABC):
+    """
+    Base class of filters passed to on_trail/on_event. Filters get decoded trail value or event message,
+    before Trail/Event object is created
+    """
+
+    def __init__(self):
+        self.rejected = 0
+
+    @abstractmethod
+    def accept(self, agent, name, value):
+        """
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail or event name
+        :type name: str
+        :param value: Decoded trail value or event message
+        :return bool: False if the message should not be passed to the callback
+        """
+
+
+class Deadband(Filter):
+    def __init__(self, delta=0):
+        """
+        Passes a value only when it differs from the last passed value of the agent and name by more than delta.
+        Non-numeric values are passed when changed. With delta 0 only changed values are passed
+
+        :param delta: Maximum change of numeric value which is ignored
+        :type delta: int|float
+        """
+        if not _is_number(delta) or delta < 0:
+            raise ValueError('delta should be a non-negative number')
+
+        Filter.__init__(self)
+        self.delta = delta
+        # (agent, name) -> last passed value
+        self._last = {}
+
+    def accept(self, agent, name, value):
+        key = (agent, name)
+        last = self._last.get(key, self)
+
+        if last is not self:
+            if _is_number(value) and _is_number(last):
+                changed = abs(value - last) > self.delta
+            else:
+                changed = value != last
+
+            if not changed:
+                self.rejected += 1
+                return False
+
+        self._last[key] = value
+
+        return True
+
+
+class Range(Filter):
+    def __init__(self, min_value=None, max_value=None, outside=False):
+        """
+        Passes numeric values between min_value and max_value (inclusive), or outside of them when outside is set.
+        Non-numeric values are never passed
+
+        :param min_value: Lower bound. No lower bound if not set
+        :type min_value: int|float
+        :param max_value: Upper bound. No upper bound if not set
+        :type max_value: int|float
+        :param outside: Pass values outside of the range instead
+        :type outside: bool
+        """
+        if min_value is None and max_value is None:
+            raise ValueError('at least one of min_value and max_value should be set')
+
+        for bound in (min_value, max_value):
+            if bound is not None and not _is_number(bound):
+                raise ValueError('bounds should be numbers')
+
+        if min_value is not None and max_value is not None and min_value > max_value:
+            raise ValueError('min_value should not be greater than max_value')
+
+        Filter.__init__(self)
+        self.min_value = min_value
+        self.max_value = max_value
+        self.outside = outside
+
+    def accept(self, agent, name, value):
+        if not _is_number(value):
+            self.rejected += 1
+            return False
+
+        inside = (self.min_value is None or value >= self.min_value) and \
+                 (self.max_value is None or value <= self.max_value)
+
+        if inside == self.outside:
+            self.rejected += 1
+            return False
+
+        return True
+
+
+class Equals(Filter):
+    def __init__(self, *values):
+        """
+        Passes values equal to any of given ones
+
+        :param values: Expected values
+        """
+        if not values:
+            raise ValueError('at least one value should be given')
+
+        try:
+            values = frozenset(values)
+        except TypeError:
+            raise ValueError('values should be hashable')
+
+        Filter.__init__(self)
+        self.values = values
+
+    def accept(self, agent, name, value):
+        try:
+            if value in self.values:
+                return True
+        except TypeError:
+            # Unhashable value, e.g. a list
+            pass
+
+        self.rejected += 1
+
+        return False
+
+
+class Matches(Filter):
+    def __init__(self, pattern, flags=0):
+        """
+        Passes strings (event messages or string trail values) containing a match of the regular expression
+
+        :param pattern: Regular expression
+        :type pattern: str
+        :param flags: re module flags
+        :type flags: int
+        """
+        Filter.__init__(self)
+
+        try:
+            self.pattern = re.compile(pattern, flags)
+        except (re.error, TypeError) as e:
+            raise ValueError('invalid pattern: %s' % str(e))
+
+    def accept(self, agent, name, value):
+        if value.__class__ is str and self.pattern.search(value) is not None:
+            return True
+
+        self.rejected += 1
+
+        return False
+
+
+def compile_filters(filters):
+    """
+    Combines filters into a single function evaluating them in order, until one rejects the value
+
+    :param filters: Filters
+    :type filters: list
+    :raises TypeError: If any of filters is not a Filter
+    :raises ValueError: If there are no filters
+    :return callable: Function taking agent, name and value, returning False if any filter rejects the value
+    """
+    filters = tuple(filters)
+
+    if not filters:
+        raise ValueError('at least one filter should be given')
+
+    for item in filters:
+        if not isinstance(item, Filter):
+            raise TypeError('filters should be Filter instances')
+
+    if len(filters) == 1:
+        return filters[0].accept
+
+    accepts = tuple(item.accept for item in filters)
+
+    def accept(agent, name, value):
+        for func in accepts:
+            if not func(agent, name, value):
+                return False
+
+        return True
+
+    return accept
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LatestValueCache(object):
+    def __init__(self, max_entries=100000, ttl=None):
+        """
+        Keeps the latest item received for each (agent, name) pair. When max_entries is reached, the entry updated
+        least recently is evicted. Reads don't take a lock, so they're cheap to call from many threads
+
+        :param max_entries: Maximum number of kept entries
+        :type max_entries: int
+        :param ttl: Time (in seconds) after which an entry is considered stale and not returned. No limit by default
+        :type ttl: int|float
+        """
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise ValueError('max_entries should be a positive integer')
+
+        if ttl is not None and (not isinstance(ttl, (int, float)) or ttl <= 0):
+            raise ValueError('ttl should be a positive number')
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evicted = 0
+
+        # (agent, name) -> (item, expiration time)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, agent, name, item):
+        """
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param item: Latest item
+        :return void
+        """
+        key = (agent, name)
+        now = time.monotonic()
+        expires = now + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            entries = self._entries
+            entries[key] = (item, expires)
+            entries.move_to_end(key)
+
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evicted += 1
+
+            if expires is not None:
+                self._remove_stale(now)
+
+    def get(self, agent, name):
+        """
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :return object|None: Latest item or None if there's no fresh one
+        """
+        entry = self._entries.get((agent, name))
+
+        if entry is None:
+            return None
+
+        (item, expires) = entry
+
+        if expires is not None and expires < time.monotonic():
+            return None
+
+        return item
+
+    def get_many(self, keys):
+        """
+        :param keys: Iterable of (agent, name) tuples
+        :type keys: iterable
+        :return list: Latest items (or None) in order of keys
+        """
+        entries = self._entries
+        now = time.monotonic() if self.ttl is not None else None
+        result = []
+
+        for key in keys:
+            entry = entries.get(key)
+
+            if entry is None or (now is not None and entry[1] < now):
+                result.append(None)
+            else:
+                result.append(entry[0])
+
+        return result
+
+    def purge(self):
+        """
+        Removes stale entries
+
+        :return int: Number of removed entries
+        """
+        if self.ttl is None:
+            return 0
+
+        with self._lock:
+            return self._remove_stale(time.monotonic())
+
+    def _remove_stale(self, now):
+        # Entries are ordered by update time and share the same TTL, so stale ones are at the beginning
+        entries = self._entries
+        removed = 0
+
+        while entries:
+            (_, expires) = next(iter(entries.values()))
+
+            if expires >= now:
+                break
+
+            entries.popitem(last=False)
+            removed += 1
+
+        return removed
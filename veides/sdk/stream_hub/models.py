@@ -1,16 +1,117 @@
-from datetime import datetime
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Many agents usually report within the same second, so recently parsed timestamps are reused
+TIMESTAMP_CACHE_SIZE = 4096
+
+_EPOCH = datetime(1970, 1, 1)
+
+TRAIL_VALUE_TYPES = (str, float, int)
+
+_new = object.__new__
 
 
 class Timestamp(datetime):
+    __slots__ = ()
+
     @staticmethod
     def from_string(timestamp):
-        return Timestamp.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+        """
+        :param timestamp: Timestamp in `%Y-%m-%dT%H:%M:%SZ` format
+        :type timestamp: str
+        :raises TypeError: If timestamp is not a string
+        :raises ValueError: If timestamp is not in expected format
+        :return Timestamp
+        """
+        if not isinstance(timestamp, str):
+            raise TypeError('timestamp should be a string')
+
+        return _parse_timestamp(timestamp)
+
+    @staticmethod
+    def from_epoch(seconds):
+        """
+        :param seconds: Seconds since epoch (UTC)
+        :type seconds: int
+        :return Timestamp
+        """
+        value = _EPOCH + timedelta(seconds=seconds)
+
+        return Timestamp(value.year, value.month, value.day, value.hour, value.minute, value.second)
+
+    def epoch(self):
+        """
+        :return int: Seconds since epoch (UTC)
+        """
+        return calendar.timegm(self.utctimetuple())
 
     def __str__(self):
-        return self.strftime("%Y-%m-%dT%H:%M:%SZ")
+        return self.strftime(TIMESTAMP_FORMAT)
+
+
+def epoch_seconds(timestamp):
+    """
+    :param timestamp: Timestamp in `%Y-%m-%dT%H:%M:%SZ` format
+    :type timestamp: str
+    :raises TypeError: If timestamp is not a string
+    :raises ValueError: If timestamp is not in expected format
+    :return int
+    """
+    if not isinstance(timestamp, str):
+        raise TypeError('timestamp should be a string')
+
+    return _parse_epoch_seconds(timestamp)
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_timestamp(timestamp):
+    return Timestamp(*_split_timestamp(timestamp))
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_epoch_seconds(timestamp):
+    return _parse_timestamp(timestamp).epoch()
+
+
+def _split_timestamp(timestamp):
+    """
+    Fixed format replacement of strptime(timestamp, TIMESTAMP_FORMAT)
+
+    :param timestamp: Timestamp in `%Y-%m-%dT%H:%M:%SZ` format
+    :type timestamp: str
+    :raises ValueError: If timestamp is not in expected format
+    :return tuple: (year, month, day, hour, minute, second)
+    """
+    if (
+        len(timestamp) != 20
+        or timestamp[4] != '-'
+        or timestamp[7] != '-'
+        or timestamp[10] != 'T'
+        or timestamp[13] != ':'
+        or timestamp[16] != ':'
+        or timestamp[19] != 'Z'
+    ):
+        raise ValueError("timestamp '%s' does not match format '%s'" % (timestamp, TIMESTAMP_FORMAT))
+
+    year = timestamp[0:4]
+    month = timestamp[5:7]
+    day = timestamp[8:10]
+    hour = timestamp[11:13]
+    minute = timestamp[14:16]
+    second = timestamp[17:19]
+
+    if not (year + month + day + hour + minute + second).isdigit():
+        raise ValueError("timestamp '%s' does not match format '%s'" % (timestamp, TIMESTAMP_FORMAT))
+
+    return int(year), int(month), int(day), int(hour), int(minute), int(second)
 
 
 class Trail(object):
+    __slots__ = ('name', 'value', 'timestamp')
+
     def __init__(self, name, value, timestamp):
         """
         :param name
@@ -18,7 +119,7 @@ class Trail(object):
         :param value
         :type value: str|int|float
         :param timestamp
-        :type timestamp: Timestamp
+        :type timestamp: Timestamp|int
         """
         if not isinstance(name, str):
             raise TypeError('Trail name should be a string')
@@ -26,21 +127,37 @@ class Trail(object):
         if len(name) == 0:
             raise ValueError('Trail name should be at least 1 length')
 
-        if not any([isinstance(value, t) for t in [str, float, int]]):
+        if not isinstance(value, TRAIL_VALUE_TYPES):
             raise TypeError('Trail value should be one of: string, integer, float')
 
-        if not isinstance(timestamp, Timestamp):
-            raise TypeError('Trail timestamp should be of type Timestamp')
+        if not isinstance(timestamp, Timestamp) and not _is_epoch(timestamp):
+            raise TypeError('Trail timestamp should be of type Timestamp or integer epoch seconds')
 
         self.name = name
         self.value = value
         self.timestamp = timestamp
 
+    @classmethod
+    def _trusted(cls, name, value, timestamp):
+        """
+        Creates Trail without validation. Use only for values which were already validated
+
+        :return Trail
+        """
+        trail = _new(cls)
+        trail.name = name
+        trail.value = value
+        trail.timestamp = timestamp
+
+        return trail
+
     def __str__(self):
         return 'Trail(name={}, value={}, timestamp={})'.format(self.name, self.value, self.timestamp)
 
 
 class Event(object):
+    __slots__ = ('name', 'message', 'timestamp')
+
     def __init__(self, name, message, timestamp):
         """
         :param name
@@ -48,7 +165,7 @@ class Event(object):
         :param message
         :type message: str
         :param timestamp
-        :type timestamp: Timestamp
+        :type timestamp: Timestamp|int
         """
         if not isinstance(name, str):
             raise TypeError('Event name should be a string')
@@ -59,12 +176,146 @@ class Event(object):
         if not isinstance(message, str):
             raise TypeError('Event message should be a string')
 
-        if not isinstance(timestamp, Timestamp):
-            raise TypeError('Event timestamp should be of type Timestamp')
+        if not isinstance(timestamp, Timestamp) and not _is_epoch(timestamp):
+            raise TypeError('Event timestamp should be of type Timestamp or integer epoch seconds')
 
         self.name = name
         self.message = message
         self.timestamp = timestamp
 
+    @classmethod
+    def _trusted(cls, name, message, timestamp):
+        """
+        Creates Event without validation. Use only for values which were already validated
+
+        :return Event
+        """
+        event = _new(cls)
+        event.name = name
+        event.message = message
+        event.timestamp = timestamp
+
+        return event
+
     def __str__(self):
         return 'Event(name={}, message={}, timestamp={})'.format(self.name, self.message, self.timestamp)
+
+
+def _is_epoch(timestamp):
+    return isinstance(timestamp, int) and not isinstance(timestamp, bool)
+
+
+class LazyTrail(object):
+    __slots__ = ('name', 'payload', '_factory', '_trail')
+
+    def __init__(self, name, payload, factory, trail=None):
+        """
+        Trail which payload is decoded on first access to value or timestamp
+
+        :param name: Trail name taken from the topic
+        :type name: str
+        :param payload: Raw message payload
+        :type payload: bytes
+        :param factory: Callable creating Trail from name and raw payload
+        :type factory: callable
+        :param trail: Already decoded trail, if any
+        :type trail: Trail
+        """
+        self.name = name
+        self.payload = payload
+        self._factory = factory
+        self._trail = trail
+
+    @property
+    def value(self):
+        """
+        :raises TypeError: If payload contains value or timestamp of invalid type
+        :raises ValueError: If payload can't be decoded
+        :return str|int|float
+        """
+        return self.decode().value
+
+    @property
+    def timestamp(self):
+        """
+        :raises TypeError: If payload contains value or timestamp of invalid type
+        :raises ValueError: If payload can't be decoded
+        :return Timestamp|int
+        """
+        return self.decode().timestamp
+
+    def decode(self):
+        """
+        Decodes the payload on first call and returns decoded trail
+
+        :raises TypeError: If payload contains field of invalid type
+        :raises ValueError: If payload can't be decoded
+        :return Trail
+        """
+        trail = self._trail
+
+        if trail is None:
+            trail = self._trail = self._factory(self.name, self.payload)
+
+        return trail
+
+    def __str__(self):
+        return 'LazyTrail(name={}, value={}, timestamp={})'.format(self.name, self.value, self.timestamp)
+
+
+class LazyEvent(object):
+    __slots__ = ('name', 'payload', '_factory', '_event')
+
+    def __init__(self, name, payload, factory, event=None):
+        """
+        Event which payload is decoded on first access to message or timestamp
+
+        :param name: Event name taken from the topic
+        :type name: str
+        :param payload: Raw message payload
+        :type payload: bytes
+        :param factory: Callable creating Event from name and raw payload
+        :type factory: callable
+        :param event: Already decoded event, if any
+        :type event: Event
+        """
+        self.name = name
+        self.payload = payload
+        self._factory = factory
+        self._event = event
+
+    @property
+    def message(self):
+        """
+        :raises TypeError: If payload contains message or timestamp of invalid type
+        :raises ValueError: If payload can't be decoded
+        :return str
+        """
+        return self.decode().message
+
+    @property
+    def timestamp(self):
+        """
+        :raises TypeError: If payload contains message or timestamp of invalid type
+        :raises ValueError: If payload can't be decoded
+        :return Timestamp|int
+        """
+        return self.decode().timestamp
+
+    def decode(self):
+        """
+        Decodes the payload on first call and returns decoded event
+
+        :raises TypeError: If payload contains field of invalid type
+        :raises ValueError: If payload can't be decoded
+        :return Event
+        """
+        event = self._event
+
+        if event is None:
+            event = self._event = self._factory(self.name, self.payload)
+
+        return event
+
+    def __str__(self):
+        return 'LazyEvent(name={}, message={}, timestamp={})'.format(self.name, self.message, self.timestamp)
@@ -0,0 +1,240 @@
+import os
+import struct
+import threading
+from collections import deque
+
+from veides.sdk.stream_hub.segments import RECORD_HEADER, SegmentWriter, iter_records, list_segments, read_record
+
+# QoS and topic length preceding topic and payload in a spilled record
+_MESSAGE_HEADER = struct.Struct('>BH')
+
+# Approximate memory used by a queued message apart from its topic and payload
+_MESSAGE_OVERHEAD = 128
+
+_SEGMENT_PREFIX = 'offline'
+
+
+class _DiskQueue(object):
+    def __init__(self, directory, max_bytes, segment_size):
+        """
+        FIFO of records stored in segment files. Segments left by previous process are consumed first
+
+        :param directory: Directory to store segments in
+        :type directory: str
+        :param max_bytes: Maximum size (in bytes) of stored records
+        :type max_bytes: int
+        :param segment_size: Maximum size (in bytes) of a single segment
+        :type segment_size: int
+        """
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.bytes = 0
+
+        self._segments = deque()
+
+        for _, path in list_segments(directory, _SEGMENT_PREFIX):
+            self._segments.append(path)
+
+            for _, record in iter_records(path):
+                self.count += 1
+                self.bytes += RECORD_HEADER.size + len(record)
+
+        self._writer = SegmentWriter(directory, _SEGMENT_PREFIX, max_segment_size=segment_size)
+        self._reader = None
+        self._offset = 0
+        self._head = None
+
+    def put(self, record):
+        size = RECORD_HEADER.size + len(record)
+
+        if self.bytes + size > self.max_bytes:
+            return False
+
+        (path, _) = self._writer.append(record)
+
+        if not self._segments or self._segments[-1] != path:
+            self._segments.append(path)
+
+        self.count += 1
+        self.bytes += size
+
+        return True
+
+    def peek(self):
+        if self._head is None and self.count > 0:
+            self._head = self._read_next()
+
+        return self._head
+
+    def pop(self):
+        if self.peek() is None:
+            return
+
+        self._offset += RECORD_HEADER.size + len(self._head)
+        self.count -= 1
+        self.bytes -= RECORD_HEADER.size + len(self._head)
+        self._head = None
+
+        if self.count == 0:
+            self._clear()
+
+    def close(self):
+        self._close_reader()
+        self._writer.close()
+
+    def _read_next(self):
+        while self._segments:
+            path = self._segments[0]
+
+            if path == self._writer.path:
+                self._writer.flush()
+
+            if self._reader is None:
+                self._reader = open(path, 'rb')
+                self._offset = 0
+
+            record = read_record(self._reader, self._offset)
+
+            if record is not None:
+                return record
+
+            if path == self._writer.path:
+                return None
+
+            self._close_reader()
+            self._segments.popleft()
+            os.remove(path)
+
+        return None
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _clear(self):
+        self._close_reader()
+        self._writer.close()
+
+        while self._segments:
+            os.remove(self._segments.popleft())
+
+
+class OfflineQueue(object):
+    def __init__(
+        self,
+        max_memory=16 * 1024 * 1024,
+        spill_directory=None,
+        max_disk=1024 * 1024 * 1024,
+        segment_size=16 * 1024 * 1024,
+        flush_rate=1000
+    ):
+        """
+        Keeps messages published in disconnected state. Messages are kept in memory up to max_memory bytes
+        and then written to segment files in spill_directory, if provided. Queued messages are published
+        in order after reconnect, at most flush_rate messages per second
+
+        :param max_memory: Maximum size (in bytes) of messages kept in memory
+        :type max_memory: int
+        :param spill_directory: Directory to write messages to once memory limit is reached
+        :type spill_directory: str
+        :param max_disk: Maximum size (in bytes) of messages written to disk
+        :type max_disk: int
+        :param segment_size: Maximum size (in bytes) of a single segment file
+        :type segment_size: int
+        :param flush_rate: Maximum number of queued messages published per second after reconnect
+        :type flush_rate: int|float
+        """
+        if not isinstance(flush_rate, (int, float)) or flush_rate <= 0:
+            raise ValueError('flush_rate should be a positive number')
+
+        self.max_memory = max_memory
+        self.flush_rate = flush_rate
+        self.dropped = 0
+
+        self._memory = deque()
+        self._memory_bytes = 0
+        self._disk = _DiskQueue(spill_directory, max_disk, segment_size) if spill_directory is not None else None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._memory) + (self._disk.count if self._disk is not None else 0)
+
+    def put(self, topic, payload, qos):
+        """
+        :param topic: Topic to publish message to
+        :type topic: str
+        :param payload: Encoded message
+        :type payload: bytes
+        :param qos
+        :type qos: int
+        :return bool: False if message was dropped because of the limits
+        """
+        with self._lock:
+            # Once spilling started, newer messages go to disk as well, so the order is preserved
+            if self._disk is None or self._disk.count == 0:
+                size = len(topic) + len(payload) + _MESSAGE_OVERHEAD
+
+                if self._memory_bytes + size <= self.max_memory:
+                    self._memory.append((topic, payload, qos))
+                    self._memory_bytes += size
+                    return True
+
+            if self._disk is not None and self._disk.put(self._encode(topic, payload, qos)):
+                return True
+
+            self.dropped += 1
+
+            return False
+
+    def peek(self):
+        """
+        Returns the oldest message without removing it
+
+        :return tuple|None: (topic, payload, qos)
+        """
+        with self._lock:
+            if self._memory:
+                return self._memory[0]
+
+            if self._disk is not None:
+                record = self._disk.peek()
+
+                if record is not None:
+                    return self._decode(record)
+
+            return None
+
+    def pop(self):
+        """
+        Removes the oldest message
+
+        :return void
+        """
+        with self._lock:
+            if self._memory:
+                (topic, payload, _) = self._memory.popleft()
+                self._memory_bytes -= len(topic) + len(payload) + _MESSAGE_OVERHEAD
+            elif self._disk is not None:
+                self._disk.pop()
+
+    def close(self):
+        """
+        Closes spill files. Messages written to disk are consumed by the next queue using the same directory
+
+        :return void
+        """
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+
+    def _encode(self, topic, payload, qos):
+        topic = topic.encode('utf-8')
+
+        return _MESSAGE_HEADER.pack(qos, len(topic)) + topic + payload
+
+    def _decode(self, record):
+        (qos, topic_length) = _MESSAGE_HEADER.unpack_from(record)
+        start = _MESSAGE_HEADER.size
+
+        return record[start:start + topic_length].decode('utf-8'), record[start + topic_length:], qos
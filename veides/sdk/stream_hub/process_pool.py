@@ -0,0 +1,395 @@
+import logging
+import marshal
+import multiprocessing
+import pickle
+import threading
+import zlib
+
+from veides.sdk.stream_hub.models import Trail, Timestamp
+
+_REGISTER = b'R'
+_BATCH = b'B'
+_STOP = b'S'
+
+
+def _work(connection, errors):
+    """
+    Worker process loop. Runs registered handlers for trails of received batches in order
+
+    :param connection: Pipe end batches are received from
+    :type connection: multiprocessing.connection.Connection
+    :param errors: Queue failures are reported to
+    :type errors: multiprocessing.Queue
+    :return void
+    """
+    handlers = {}
+
+    while True:
+        try:
+            message = connection.recv_bytes()
+        except (EOFError, OSError):
+            return
+
+        kind = message[:1]
+
+        if kind == _STOP:
+            return
+
+        if kind == _REGISTER:
+            (handler_id, func) = pickle.loads(message[1:])
+            handlers[handler_id] = func
+            continue
+
+        (handler_ids, agents, names, values, timestamps, epoch) = marshal.loads(message[1:])
+        failures = []
+
+        for i in range(len(agents)):
+            timestamp = timestamps[i] if epoch[i] else Timestamp.from_epoch(timestamps[i])
+
+            try:
+                handlers[handler_ids[i]](agents[i], Trail._trusted(names[i], values[i], timestamp))
+            except Exception as e:
+                failures.append('%s (agent %s, trail %s)' % (str(e), agents[i], names[i]))
+
+        if failures:
+            errors.put(failures)
+
+
+class _Worker(object):
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.lock = threading.Lock()
+        # Set under lock once STOP is sent, so no trail is added after the final batch
+        self.closed = False
+        # Set when the process could not receive a batch. Its agents are handled by other workers
+        self.dead = False
+        self._reset()
+
+    def _reset(self):
+        self.handler_ids = []
+        self.agents = []
+        self.names = []
+        self.values = []
+        self.timestamps = []
+        self.epoch = bytearray()
+
+    def take_batch(self):
+        """
+        :return bytes|None: Encoded pending trails or None if there are none
+        """
+        if not self.agents:
+            return None
+
+        batch = _BATCH + marshal.dumps((
+            self.handler_ids,
+            self.agents,
+            self.names,
+            self.values,
+            self.timestamps,
+            bytes(self.epoch),
+        ))
+        self._reset()
+
+        return batch
+
+
+class ProcessHandlerPool(object):
+    def __init__(self, workers=4, max_batch=1000, max_delay=50, context=None, logger=None):
+        """
+        Runs trail callbacks in worker processes, so CPU-bound callbacks are not serialized by GIL.
+        Trails are sent to workers in batches encoded with marshal, and trails of the same agent are always
+        handled by the same worker, in order. Exceptions raised by callbacks are logged by the client process
+
+        Callbacks have to be picklable (e.g. module level functions). Worker processes are started by the client
+        on connect (or by start()), so trails submitted while the pool is not running are dropped. When a worker
+        process exits, trails which could not be sent to it are dropped and its agents are moved to other workers
+
+        :param workers: Number of worker processes
+        :type workers: int
+        :param max_batch: Maximum number of trails sent to a worker at once
+        :type max_batch: int
+        :param max_delay: Maximum time (in ms) a trail waits before being sent to a worker
+        :type max_delay: int|float
+        :param context: multiprocessing start method ('fork', 'spawn' or 'forkserver'). Platform default if not set
+        :type context: str
+        :param logger: Logger used to report failed callbacks. Logger of the client the pool is registered in
+            is used by default
+        :type logger: logging.Logger
+        """
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('workers should be a positive integer')
+
+        if not isinstance(max_batch, int) or max_batch < 1:
+            raise ValueError('max_batch should be a positive integer')
+
+        if not isinstance(max_delay, (int, float)) or max_delay <= 0:
+            raise ValueError('max_delay should be a positive number')
+
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.logger = logger
+        self.submitted = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._context = multiprocessing.get_context(context)
+        self._handlers = []
+        self._workers = None
+        self._errors = None
+        self._collector = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._workers is not None
+
+    def register(self, func):
+        """
+        Registers callback in worker processes
+
+        :param func: Picklable callback taking agent's client id and Trail
+        :type func: callable
+        :raises TypeError: If callback is not callable or can't be pickled
+        :return int: Callback id used by submit()
+        """
+        if not callable(func):
+            raise TypeError('callback should be callable')
+
+        with self._lock:
+            handler_id = len(self._handlers)
+
+            try:
+                message = _REGISTER + pickle.dumps((handler_id, func))
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                raise TypeError('callback should be picklable: %s' % str(e))
+
+            self._handlers.append(message)
+            workers = self._workers
+
+        if workers is not None:
+            for worker in workers:
+                with worker.lock:
+                    worker.connection.send_bytes(message)
+
+        return handler_id
+
+    def start(self):
+        """
+        Starts worker processes. Does nothing if already started
+
+        :return void
+        """
+        with self._lock:
+            if self._workers is not None:
+                return
+
+            self._errors = self._context.Queue()
+            workers = []
+
+            for i in range(self.workers):
+                (receiver, sender) = self._context.Pipe(duplex=False)
+                process = self._context.Process(
+                    target=_work,
+                    args=(receiver, self._errors),
+                    name='VeidesHandler-{}'.format(i),
+                    daemon=True
+                )
+                process.start()
+                receiver.close()
+
+                for message in self._handlers:
+                    sender.send_bytes(message)
+
+                workers.append(_Worker(process, sender))
+
+            self._collector = threading.Thread(
+                target=self._collect_errors,
+                args=(self._errors,),
+                name='VeidesHandlerErrors',
+                daemon=True
+            )
+            self._collector.start()
+            self._workers = workers
+
+    def shutdown(self, wait=True):
+        """
+        Sends pending trails and stops worker processes after they handle them
+
+        :param wait: Wait until worker processes finish
+        :type wait: bool
+        :return void
+        """
+        with self._lock:
+            workers = self._workers
+            self._workers = None
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if workers is None:
+            return
+
+        for worker in workers:
+            with worker.lock:
+                if not worker.dead and self._send(worker, worker.take_batch()):
+                    self._send(worker, _STOP)
+
+                worker.connection.close()
+                worker.closed = True
+
+        if wait:
+            self._stop_collector(workers, self._errors, self._collector)
+        else:
+            threading.Thread(
+                target=self._stop_collector,
+                args=(workers, self._errors, self._collector),
+                name='VeidesHandlerShutdown',
+                daemon=True
+            ).start()
+
+    def submit(self, handler_id, agent, trail):
+        """
+        Queues trail to be handled by a worker process. Trail is dropped and counted in `dropped`
+        if the pool is not running
+
+        :param handler_id: Callback id returned by register()
+        :type handler_id: int
+        :param agent: Agent's client id
+        :type agent: str
+        :param trail: Trail to pass to the callback
+        :type trail: Trail
+        :return void
+        """
+        workers = self._workers
+
+        if workers is None:
+            self.dropped += 1
+            return
+
+        worker = self._worker_for(workers, agent)
+        timestamp = trail.timestamp
+        batch = None
+
+        if worker is None:
+            self.dropped += 1
+            return
+
+        with worker.lock:
+            if worker.closed:
+                self.dropped += 1
+                return
+
+            worker.handler_ids.append(handler_id)
+            worker.agents.append(agent)
+            worker.names.append(trail.name)
+            worker.values.append(trail.value)
+
+            if isinstance(timestamp, int):
+                worker.timestamps.append(timestamp)
+                worker.epoch.append(1)
+            else:
+                worker.timestamps.append(timestamp.epoch())
+                worker.epoch.append(0)
+
+            self.submitted += 1
+
+            if len(worker.agents) >= self.max_batch:
+                batch = worker.take_batch()
+                self._send(worker, batch)
+
+        if batch is None and self._timer is None:
+            with self._lock:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.max_delay / 1000.0, self._flush_on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def flush(self):
+        """
+        Sends pending trails to worker processes
+
+        :return void
+        """
+        for worker in self._workers or []:
+            with worker.lock:
+                if not worker.closed:
+                    self._send(worker, worker.take_batch())
+
+    def _worker_for(self, workers, agent):
+        """
+        :return _Worker|None: Worker handling agent's trails, or None if all workers exited
+        """
+        count = len(workers)
+        index = zlib.crc32(agent.encode('utf-8')) % count
+
+        for i in range(count):
+            worker = workers[(index + i) % count]
+
+            if not worker.dead:
+                return worker
+
+        return None
+
+    def _send(self, worker, message):
+        """
+        Sends message to worker process. Called with worker lock held
+
+        :param worker: Receiving worker
+        :type worker: _Worker
+        :param message: Encoded batch or STOP, nothing is sent if None
+        :type message: bytes
+        :return bool: False if worker process exited
+        """
+        if message is None:
+            return True
+
+        try:
+            worker.connection.send_bytes(message)
+        except (OSError, EOFError) as e:
+            lost = len(marshal.loads(message[1:])[1]) if message[:1] == _BATCH else 0
+
+            worker.dead = True
+            worker.closed = True
+            self.dropped += lost
+            self._logger().error(
+                'Process handler worker %s exited (%s), %d trails dropped. Its agents are moved to other workers'
+                % (worker.process.name, str(e), lost)
+            )
+
+            return False
+
+        return True
+
+    def _logger(self):
+        return self.logger if self.logger is not None else logging.getLogger(__name__)
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+
+        self.flush()
+
+    def _stop_collector(self, workers, errors, collector):
+        for worker in workers:
+            worker.process.join()
+
+        # Workers are done, so no more failures are reported
+        errors.put(None)
+        collector.join()
+
+    def _collect_errors(self, errors):
+        while True:
+            failures = errors.get()
+
+            if failures is None:
+                return
+
+            self.failed += len(failures)
+            logger = self._logger()
+
+            for failure in failures:
+                logger.error('Process handler failed: %s' % failure)
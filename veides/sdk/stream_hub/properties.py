@@ -1,6 +1,14 @@
 import os
 from veides.sdk.stream_hub.exceptions import ConfigurationException
 
+TRANSPORT_WEBSOCKETS = 'websockets'
+TRANSPORT_TCP = 'tcp'
+
+DEFAULT_PORTS = {
+    TRANSPORT_WEBSOCKETS: 9001,
+    TRANSPORT_TCP: 8883,
+}
+
 
 class AuthProperties:
     def __init__(self, username, token):
@@ -44,15 +52,32 @@ class AuthProperties:
 
 
 class ConnectionProperties:
-    def __init__(self, host, capath="/etc/ssl/certs"):
+    def __init__(self, host, capath="/etc/ssl/certs", transport=TRANSPORT_WEBSOCKETS, port=None, cafile=None):
         """
         :param host: Hostname used to connect to Veides Stream Hub
         :type host: str
         :param capath: Path to certificates directory
         :type capath: str
+        :param transport: 'websockets' for MQTT over WebSocket or 'tcp' for plain MQTT, both over TLS.
+            Plain MQTT avoids WebSocket framing and masking done in Python for every packet
+        :type transport: str
+        :param port: Port to connect to. 9001 for 'websockets' and 8883 for 'tcp' by default
+        :type port: int
+        :param cafile: Path to certificates file, used in addition to capath
+        :type cafile: str
+        :raises ConfigurationException: If transport or port is invalid
         """
+        if transport not in DEFAULT_PORTS:
+            raise ConfigurationException("transport should be one of: %s" % ', '.join(sorted(DEFAULT_PORTS)))
+
+        if port is not None and (not isinstance(port, int) or not 0 < port < 65536):
+            raise ConfigurationException("port should be an integer between 1 and 65535")
+
         self._host = host
         self._capath = capath
+        self._cafile = cafile
+        self._transport = transport
+        self._port = port if port is not None else DEFAULT_PORTS[transport]
 
     @property
     def host(self):
@@ -62,19 +87,46 @@ class ConnectionProperties:
     def capath(self):
         return self._capath
 
+    @property
+    def cafile(self):
+        return self._cafile
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def port(self):
+        return self._port
+
     @staticmethod
     def from_env():
         """
         Returns ConnectionProperties instance built from env variables. Required variables are:
             1. VEIDES_STREAM_HUB_CLIENT_HOST: Hostname used to connect to Veides Stream Hub
 
-        :raises ConfigurationException: If required variables are not provided
+        Optional variables are:
+            1. VEIDES_STREAM_HUB_CLIENT_CAPATH: Path to certificates directory
+            2. VEIDES_STREAM_HUB_CLIENT_TRANSPORT: 'websockets' or 'tcp'
+            3. VEIDES_STREAM_HUB_CLIENT_PORT: Port to connect to
+            4. VEIDES_STREAM_HUB_CLIENT_CAFILE: Path to certificates file
+
+        :raises ConfigurationException: If required variables are not provided or any variable is invalid
         :return ConnectionProperties
         """
         host = os.getenv('VEIDES_STREAM_HUB_CLIENT_HOST', None)
         capath = os.getenv('VEIDES_STREAM_HUB_CLIENT_CAPATH', "/etc/ssl/certs")
+        transport = os.getenv('VEIDES_STREAM_HUB_CLIENT_TRANSPORT', TRANSPORT_WEBSOCKETS)
+        port = os.getenv('VEIDES_STREAM_HUB_CLIENT_PORT', None)
+        cafile = os.getenv('VEIDES_STREAM_HUB_CLIENT_CAFILE', None)
 
         if host is None:
             raise ConfigurationException("Missing 'VEIDES_STREAM_HUB_CLIENT_HOST' variable in env")
 
-        return ConnectionProperties(host, capath)
+        if port is not None:
+            try:
+                port = int(port)
+            except ValueError:
+                raise ConfigurationException("'VEIDES_STREAM_HUB_CLIENT_PORT' variable should be an integer")
+
+        return ConnectionProperties(host, capath, transport=transport, port=port, cafile=cafile)
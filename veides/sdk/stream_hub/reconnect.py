@@ -0,0 +1,44 @@
+import random
+
+
+class ReconnectPolicy(object):
+    def __init__(self, min_delay=1, max_delay=120, factor=2, jitter=0.5):
+        """
+        Exponential backoff with jitter used between reconnect attempts. Delay of n-th attempt is drawn from
+        [base * (1 - jitter), base] where base = min(max_delay, min_delay * factor ** n)
+
+        :param min_delay: Delay (in seconds) before the first attempt
+        :type min_delay: int|float
+        :param max_delay: Maximum delay (in seconds) between attempts
+        :type max_delay: int|float
+        :param factor: Multiplier applied to the delay after each failed attempt
+        :type factor: int|float
+        :param jitter: Part of the delay which is randomized, between 0 and 1
+        :type jitter: float
+        """
+        if min_delay <= 0 or max_delay < min_delay:
+            raise ValueError('delays should be positive and min_delay should not be greater than max_delay')
+
+        if factor < 1:
+            raise ValueError('factor should be at least 1')
+
+        if not 0 <= jitter <= 1:
+            raise ValueError('jitter should be between 0 and 1')
+
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """
+        :param attempt: Number of failed attempts so far
+        :type attempt: int
+        :return float: Delay (in seconds)
+        """
+        try:
+            base = min(self.max_delay, self.min_delay * self.factor ** attempt)
+        except OverflowError:
+            base = self.max_delay
+
+        return base * (1 - self.jitter * random.random())
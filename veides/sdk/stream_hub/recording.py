@@ -0,0 +1,251 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+
+from veides.sdk.stream_hub.segments import RECORD_HEADER, SegmentWriter, list_segments
+
+# Receive time and topic length preceding topic and payload in a record
+_MESSAGE_HEADER = struct.Struct('>dH')
+
+# Receive time and record offset of an index entry
+_INDEX_ENTRY = struct.Struct('>dQ')
+
+INDEX_SUFFIX = '.idx'
+
+DEFAULT_PREFIX = 'traffic'
+
+
+def _index_path(segment):
+    return segment + INDEX_SUFFIX
+
+
+class _ReplayedMessage(object):
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class TrafficRecorder(object):
+    def __init__(
+            self,
+            directory,
+            prefix=DEFAULT_PREFIX,
+            max_segment_size=64 * 1024 * 1024,
+            index_interval=1000,
+            fsync=False
+    ):
+        """
+        Appends received messages (topic, receive time and raw payload) to segment files, to be replayed
+        with TrafficReplayer. Every index_interval-th record is also written to an index file next to
+        the segment, so replay can start at given time without reading whole segments
+
+        :param directory: Directory to store segments in. Created if it doesn't exist
+        :type directory: str
+        :param prefix: Segment file name prefix
+        :type prefix: str
+        :param max_segment_size: Maximum size (in bytes) of a single segment
+        :type max_segment_size: int
+        :param index_interval: Number of records between index entries
+        :type index_interval: int
+        :param fsync: Call fsync when flushing
+        :type fsync: bool
+        """
+        if not isinstance(index_interval, int) or index_interval < 1:
+            raise ValueError('index_interval should be a positive integer')
+
+        self.directory = directory
+        self.index_interval = index_interval
+        self.recorded = 0
+
+        self._writer = SegmentWriter(directory, prefix, max_segment_size=max_segment_size, fsync=fsync)
+        self._segment = None
+        self._index = None
+        self._segment_records = 0
+        self._lock = threading.Lock()
+
+    def record(self, topic, payload, received=None):
+        """
+        :param topic: Message topic
+        :type topic: str
+        :param payload: Raw message payload
+        :type payload: bytes
+        :param received: Receive time as epoch seconds. Current time by default
+        :type received: float
+        :return void
+        """
+        if received is None:
+            received = time.time()
+
+        topic = topic.encode('utf-8')
+        record = _MESSAGE_HEADER.pack(received, len(topic)) + topic + payload
+
+        with self._lock:
+            (path, offset) = self._writer.append(record)
+
+            if path != self._segment:
+                self._start_index(path)
+
+            if self._segment_records % self.index_interval == 0:
+                self._index.write(_INDEX_ENTRY.pack(received, offset))
+
+            self._segment_records += 1
+            self.recorded += 1
+
+    def flush(self):
+        with self._lock:
+            self._writer.flush()
+
+            if self._index is not None:
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+            self._close_index()
+            self._segment = None
+
+    def _start_index(self, path):
+        self._close_index()
+        self._segment = path
+        self._segment_records = 0
+        self._index = open(_index_path(path), 'ab')
+
+    def _close_index(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+class TrafficReplayer(object):
+    def __init__(self, directory, prefix=DEFAULT_PREFIX):
+        """
+        Reads messages recorded by TrafficRecorder from memory-mapped segments
+
+        :param directory: Directory containing segments
+        :type directory: str
+        :param prefix: Segment file name prefix
+        :type prefix: str
+        """
+        self.directory = directory
+        self.prefix = prefix
+
+    def messages(self, start=None, end=None):
+        """
+        Yields recorded messages in order
+
+        :param start: Skip messages received before this time (epoch seconds)
+        :type start: float
+        :param end: Stop at the first message received after this time (epoch seconds)
+        :type end: float
+        :return generator: (receive time, topic, payload) tuples
+        """
+        for _, path in list_segments(self.directory, self.prefix):
+            offset = self._find_offset(path, start) if start is not None else 0
+
+            for (received, topic, payload) in self._read_segment(path, offset):
+                if start is not None and received < start:
+                    continue
+
+                if end is not None and received > end:
+                    return
+
+                yield received, topic, payload
+
+    def replay(self, client, speed=None, start=None, end=None):
+        """
+        Passes recorded messages to the client as if they were received from Veides Stream Hub
+
+        :param client: Client to pass messages to
+        :type client: StreamHubClient
+        :param speed: Replay speed relative to recorded one, e.g. 1 for real time or 10 for ten times faster.
+            Messages are replayed as fast as possible when None
+        :type speed: int|float
+        :param start: Skip messages received before this time (epoch seconds)
+        :type start: float
+        :param end: Stop at the first message received after this time (epoch seconds)
+        :type end: float
+        :return int: Number of replayed messages
+        """
+        if speed is not None and (not isinstance(speed, (int, float)) or speed <= 0):
+            raise ValueError('speed should be a positive number')
+
+        on_trail = client._on_trail
+        on_event = client._on_event
+        first = None
+        started = None
+        count = 0
+
+        for (received, topic, payload) in self.messages(start, end):
+            if speed is not None:
+                if first is None:
+                    (first, started) = (received, time.perf_counter())
+                else:
+                    delay = (received - first) / speed - (time.perf_counter() - started)
+
+                    if delay > 0:
+                        time.sleep(delay)
+
+            message = _ReplayedMessage(topic, payload)
+
+            if topic.split('/', 3)[2] == 'trail':
+                on_trail(None, None, message)
+            else:
+                on_event(None, None, message)
+
+            count += 1
+
+        return count
+
+    def _find_offset(self, path, start):
+        """
+        :return int: Offset of the last indexed record received before start, or 0 if there's none
+        """
+        index = _index_path(path)
+
+        if not os.path.exists(index):
+            return 0
+
+        with open(index, 'rb') as file:
+            data = file.read()
+
+        entries = [
+            _INDEX_ENTRY.unpack_from(data, i)
+            for i in range(0, len(data) - _INDEX_ENTRY.size + 1, _INDEX_ENTRY.size)
+        ]
+
+        if not entries:
+            return 0
+
+        position = bisect_left([received for (received, _) in entries], start)
+
+        return entries[position - 1][1] if position > 0 else 0
+
+    def _read_segment(self, path, offset):
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                size = len(data)
+                header_size = RECORD_HEADER.size + _MESSAGE_HEADER.size
+
+                while offset + header_size <= size:
+                    (length,) = RECORD_HEADER.unpack_from(data, offset)
+                    end = offset + RECORD_HEADER.size + length
+
+                    # Incomplete record left by interrupted write
+                    if end > size:
+                        return
+
+                    (received, topic_length) = _MESSAGE_HEADER.unpack_from(data, offset + RECORD_HEADER.size)
+                    topic_start = offset + header_size
+                    payload_start = topic_start + topic_length
+
+                    yield received, data[topic_start:payload_start].decode('utf-8'), data[payload_start:end]
+
+                    offset = end
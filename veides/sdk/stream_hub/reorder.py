@@ -0,0 +1,200 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class _KeyState(object):
+    __slots__ = ('heap', 'seen', 'released', 'newest')
+
+    def __init__(self):
+        # (timestamp, sequence number, item) of pending items
+        self.heap = []
+        # Payload hash -> timestamp, for items which are pending or released with the newest released timestamp
+        self.seen = {}
+        # Timestamp of the last released item
+        self.released = None
+        # The newest timestamp received
+        self.newest = None
+
+
+class ReorderBuffer(object):
+    def __init__(self, lateness=5, max_delay=10, max_pending=1000, max_keys=100000):
+        """
+        Holds trails of each agent and trail name for up to lateness seconds (by trail timestamp) and releases
+        them in timestamp order. Trails with the same payload as a pending or just released one are dropped
+        as duplicates, trails older than the last released one are dropped as late
+
+        :param lateness: How much (in seconds of trail time) a trail may be delayed relatively to the newest one
+        :type lateness: int
+        :param max_delay: Maximum time (in seconds) a trail waits in the buffer, so trails of agents which stopped
+            sending are released too. Checked when other trails arrive and by the client's timer. No limit when None
+        :type max_delay: int|float
+        :param max_pending: Maximum number of pending trails per agent and trail name. The oldest trail is
+            released early when exceeded
+        :type max_pending: int
+        :param max_keys: Maximum number of tracked agent and trail name pairs. Trails of the least recently
+            updated pair are released and its state is dropped when exceeded
+        :type max_keys: int
+        """
+        if not isinstance(lateness, int) or lateness < 0:
+            raise ValueError('lateness should be a non-negative integer')
+
+        if max_delay is not None and (not isinstance(max_delay, (int, float)) or max_delay <= 0):
+            raise ValueError('max_delay should be a positive number')
+
+        if not isinstance(max_pending, int) or max_pending < 1:
+            raise ValueError('max_pending should be a positive integer')
+
+        if not isinstance(max_keys, int) or max_keys < 1:
+            raise ValueError('max_keys should be a positive integer')
+
+        self.lateness = lateness
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_keys = max_keys
+
+        self.late = 0
+        self.duplicates = 0
+        self.forced = 0
+
+        self._keys = OrderedDict()
+        # (deadline, key, timestamp) in order of arrival
+        self._deadlines = deque()
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        :return int: Number of pending items
+        """
+        with self._lock:
+            return sum(len(state.heap) for state in self._keys.values())
+
+    def add(self, agent, name, timestamp, payload, item):
+        """
+        Adds the item and returns items which can be released
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail name
+        :type name: str
+        :param timestamp: Trail timestamp as epoch seconds
+        :type timestamp: int
+        :param payload: Raw message payload, used to detect duplicates
+        :type payload: bytes
+        :param item: Item released when its turn comes
+        :return list: (agent, name, item) tuples in timestamp order (for each agent and trail name)
+        """
+        key = (agent, name)
+        digest = hash(payload)
+        released = []
+
+        with self._lock:
+            keys = self._keys
+            state = keys.get(key)
+
+            if state is None:
+                state = keys[key] = _KeyState()
+            else:
+                keys.move_to_end(key)
+
+            if state.released is not None and timestamp < state.released:
+                self.late += 1
+            elif digest in state.seen:
+                self.duplicates += 1
+            else:
+                self._sequence += 1
+                heapq.heappush(state.heap, (timestamp, self._sequence, item))
+                state.seen[digest] = timestamp
+
+                if state.newest is None or timestamp > state.newest:
+                    state.newest = timestamp
+
+                self._release(key, state, state.newest - self.lateness, released)
+
+                if len(state.heap) > self.max_pending:
+                    self.forced += 1
+                    self._release(key, state, state.heap[0][0], released)
+
+                if self.max_delay is not None:
+                    self._deadlines.append((time.monotonic() + self.max_delay, key, timestamp))
+
+            if len(keys) > self.max_keys:
+                (old_key, old_state) = keys.popitem(last=False)
+
+                if old_state.heap:
+                    self.forced += 1
+                    self._release(old_key, old_state, old_state.newest, released)
+
+            if self._deadlines:
+                self._release_expired(time.monotonic(), released)
+
+        return released
+
+    def next_deadline(self):
+        """
+        :return float|None: time.monotonic() time at which a pending item might expire, or None if there are
+            no such items
+        """
+        with self._lock:
+            return self._deadlines[0][0] if self._deadlines else None
+
+    def release_expired(self):
+        """
+        Returns items which waited longer than max_delay
+
+        :return list: (agent, name, item) tuples
+        """
+        released = []
+
+        with self._lock:
+            self._release_expired(time.monotonic(), released)
+
+        return released
+
+    def flush(self):
+        """
+        Returns all pending items
+
+        :return list: (agent, name, item) tuples
+        """
+        released = []
+
+        with self._lock:
+            for key, state in self._keys.items():
+                if state.heap:
+                    self._release(key, state, state.newest, released)
+
+            self._deadlines.clear()
+
+        return released
+
+    def _release_expired(self, now, released):
+        deadlines = self._deadlines
+
+        while deadlines and deadlines[0][0] <= now:
+            (_, key, timestamp) = deadlines.popleft()
+            state = self._keys.get(key)
+
+            if state is not None and state.heap and state.heap[0][0] <= timestamp:
+                self.forced += 1
+                self._release(key, state, timestamp, released)
+
+    def _release(self, key, state, until, released):
+        """
+        Releases pending items with timestamp lower or equal to until
+        """
+        heap = state.heap
+        (agent, name) = key
+
+        while heap and heap[0][0] <= until:
+            (timestamp, _, item) = heapq.heappop(heap)
+            state.released = timestamp
+            released.append((agent, name, item))
+
+        seen = state.seen
+
+        # Hashes of items older than the last released one are not needed anymore, as such items are late
+        if state.released is not None and len(seen) > 2 * len(heap) + 16:
+            state.seen = {digest: t for digest, t in seen.items() if t >= state.released}
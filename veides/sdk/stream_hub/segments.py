@@ -0,0 +1,174 @@
+import os
+import re
+import struct
+
+RECORD_HEADER = struct.Struct('>I')
+
+SEGMENT_SUFFIX = '.seg'
+
+
+def segment_path(directory, prefix, sequence):
+    """
+    :param directory: Directory containing segments
+    :type directory: str
+    :param prefix: Segment file name prefix
+    :type prefix: str
+    :param sequence: Segment sequence number
+    :type sequence: int
+    :return str
+    """
+    return os.path.join(directory, '{}-{:020d}{}'.format(prefix, sequence, SEGMENT_SUFFIX))
+
+
+def list_segments(directory, prefix):
+    """
+    Returns segments found in the directory, oldest first
+
+    :param directory: Directory containing segments
+    :type directory: str
+    :param prefix: Segment file name prefix
+    :type prefix: str
+    :return list: List of (sequence, path) tuples
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    pattern = re.compile(r'^{}-(\d+){}$'.format(re.escape(prefix), re.escape(SEGMENT_SUFFIX)))
+    segments = []
+
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+
+        if match is not None:
+            segments.append((int(match.group(1)), os.path.join(directory, name)))
+
+    return sorted(segments)
+
+
+def read_record(file, offset):
+    """
+    Reads a single length-prefixed record
+
+    :param file: Segment file opened in binary mode
+    :param offset: Record offset in the segment
+    :type offset: int
+    :return bytes|None: Record or None if there's no complete record at the offset
+    """
+    file.seek(offset)
+    header = file.read(RECORD_HEADER.size)
+
+    if len(header) < RECORD_HEADER.size:
+        return None
+
+    (length,) = RECORD_HEADER.unpack(header)
+    record = file.read(length)
+
+    if len(record) < length:
+        return None
+
+    return record
+
+
+def iter_records(path, offset=0):
+    """
+    Yields (offset, record) tuples of complete records stored in the segment
+
+    :param path: Segment path
+    :type path: str
+    :param offset: Offset to start from
+    :type offset: int
+    :return generator
+    """
+    with open(path, 'rb') as file:
+        while True:
+            record = read_record(file, offset)
+
+            if record is None:
+                return
+
+            yield offset, record
+
+            offset += RECORD_HEADER.size + len(record)
+
+
+class SegmentWriter(object):
+    def __init__(self, directory, prefix, max_segment_size=16 * 1024 * 1024, fsync=False):
+        """
+        Appends length-prefixed records to segment files. A new segment is started once current one reaches
+        max_segment_size bytes
+
+        :param directory: Directory to store segments in. Created if it doesn't exist
+        :type directory: str
+        :param prefix: Segment file name prefix
+        :type prefix: str
+        :param max_segment_size: Maximum size (in bytes) of a single segment
+        :type max_segment_size: int
+        :param fsync: Call fsync when flushing
+        :type fsync: bool
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        existing = list_segments(directory, prefix)
+
+        self.directory = directory
+        self.prefix = prefix
+        self.max_segment_size = max_segment_size
+        self.fsync = fsync
+
+        self._sequence = existing[-1][0] + 1 if existing else 0
+        self._file = None
+        self._path = None
+        self._size = 0
+
+    @property
+    def path(self):
+        """
+        :return str|None: Path of the segment currently written to
+        """
+        return self._path
+
+    def append(self, record):
+        """
+        :param record: Record to append
+        :type record: bytes
+        :return tuple: (segment path, record offset)
+        """
+        length = RECORD_HEADER.size + len(record)
+
+        if self._file is None or (self._size > 0 and self._size + length > self.max_segment_size):
+            self._rotate()
+
+        offset = self._size
+
+        self._file.write(RECORD_HEADER.pack(len(record)))
+        self._file.write(record)
+        self._size += length
+
+        return self._path, offset
+
+    def flush(self):
+        if self._file is None:
+            return
+
+        self._file.flush()
+
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is None:
+            return
+
+        self.flush()
+        self._file.close()
+        self._file = None
+        self._path = None
+        self._size = 0
+
+    def _rotate(self):
+        self.close()
+
+        self._path = segment_path(self.directory, self.prefix, self._sequence)
+        self._sequence += 1
+        self._file = open(self._path, 'ab')
+        self._size = self._file.tell()
@@ -0,0 +1,360 @@
+import logging
+import threading
+import zlib
+
+from veides.sdk.stream_hub.base_client import BaseClient
+from veides.sdk.stream_hub.client import StreamHubClient
+from veides.sdk.stream_hub.exceptions import ConfigurationException, ConnectionException
+
+
+class _Shard(StreamHubClient):
+    def __init__(self, owner, index, *args, **kwargs):
+        """
+        StreamHubClient reporting connection changes to ShardedStreamHubClient
+
+        :param owner: Client owning the shard
+        :type owner: ShardedStreamHubClient
+        :param index: Shard number
+        :type index: int
+        """
+        self.owner = owner
+        self.index = index
+
+        StreamHubClient.__init__(self, *args, **kwargs)
+
+    def disconnect(self):
+        # Executor, reorder buffer and other objects might be shared with other shards, so they are closed
+        # by the owner once all shards are disconnected
+        BaseClient.disconnect(self)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        StreamHubClient._on_connect(self, client, userdata, flags, rc)
+
+        if rc == 0:
+            self.owner._request_rebalance()
+
+    def _on_disconnect(self, client, userdata, rc):
+        StreamHubClient._on_disconnect(self, client, userdata, rc)
+
+        if rc != 0:
+            self.owner._request_rebalance()
+
+
+class ShardedStreamHubClient(object):
+    def __init__(
+            self,
+            auth_properties,
+            connection_properties,
+            shards=4,
+            logger=None,
+            log_level=logging.WARN,
+            **kwargs
+    ):
+        """
+        Spreads subscriptions over many connections to Veides Stream Hub, so messages are received by many
+        MQTT network threads. Subscriptions are assigned to shards by crc32 of agent's client id. When a shard
+        loses connection, its subscriptions are moved to the next connected shards and moved back once it
+        reconnects. Subscriptions are moved in bulk by a background thread, not by network threads of shards.
+        Wildcard (`+`) agent subscriptions are assigned the same way, so they are handled by a single shard
+
+        :param auth_properties: Auth related properties
+        :type auth_properties: AuthProperties
+        :param connection_properties: Properties related to Veides Stream Hub connection
+        :type connection_properties: ConnectionProperties
+        :param shards: Number of connections
+        :type shards: int
+        :param logger: Custom SDK logger
+        :type logger: logging.Logger
+        :param log_level: SDK logging level
+        :param kwargs: Other StreamHubClient arguments, passed to every shard. Objects like dispatch_executor,
+            reorder_buffer, recorder, metrics or latest_values are shared by shards. They are started on connect()
+            and flushed or stopped by disconnect() of this client, once all shards are disconnected
+        :raises ConfigurationException: If number of shards is invalid
+        """
+        if not isinstance(shards, int) or shards < 1:
+            raise ConfigurationException('shards should be a positive integer')
+
+        self.shards = [
+            _Shard(self, i, auth_properties, connection_properties, logger=logger, log_level=log_level, **kwargs)
+            for i in range(shards)
+        ]
+        self.logger = self.shards[0].logger
+
+        # (handler type, agent, name) -> (func, on_trail/on_event options, index of shard holding the subscription)
+        self._subscriptions = {}
+        self._lock = threading.RLock()
+
+        # Number of requested and done rebalances. Requests made during a rebalance are handled by a single one
+        self._rebalance_requests = 0
+        self._rebalances = 0
+        self._rebalance_condition = threading.Condition()
+        self._rebalance_thread = None
+        self._stopped = False
+
+    @property
+    def port(self):
+        return self.shards[0].port
+
+    @port.setter
+    def port(self, port):
+        for shard in self.shards:
+            shard.port = port
+
+    def connect(self):
+        """
+        Connects all shards. Subscriptions of shards which could not connect are handled by the connected ones
+
+        :raises ConnectionException: If none of shards could connect
+        """
+        errors = []
+
+        with self._rebalance_condition:
+            self._stopped = False
+
+        for shard in self.shards:
+            try:
+                shard.connect()
+            except ConnectionException as e:
+                self.logger.error('Shard %d could not connect: %s' % (shard.index, str(e)))
+                errors.append(e)
+
+        if len(errors) == len(self.shards):
+            raise ConnectionException('None of shards could connect: %s' % str(errors[0]))
+
+    def disconnect(self):
+        for shard in self.shards:
+            shard.disconnect()
+
+        # Trails pending in a shared reorder buffer are passed to shared executor before it's stopped
+        for shard in self.shards:
+            shard._flush_reorder_buffer()
+
+        for shard in self.shards:
+            shard._close_pipelines()
+
+        with self._rebalance_condition:
+            self._stopped = True
+            thread = self._rebalance_thread
+            self._rebalance_thread = None
+            self._rebalance_condition.notify_all()
+
+        if thread is not None:
+            thread.join()
+
+    def is_connected(self):
+        """
+        :return bool: True if any shard is connected
+        """
+        return any(shard.is_connected() for shard in self.shards)
+
+    def shard_for(self, agent):
+        """
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :return int: Index of the shard the agent's subscriptions are preferably assigned to
+        """
+        return zlib.crc32(agent.encode('utf-8')) % len(self.shards)
+
+    def publish(self, topic, data, qos=1):
+        """
+        Publishes the message using a connected shard chosen by topic, see StreamHubClient.publish()
+
+        :param topic: Topic to publish message to
+        :type topic: str
+        :param data
+        :type data: dict
+        :param qos
+        :type qos: int
+        :return concurrent.futures.Future
+        """
+        return self.shards[self._assign(zlib.crc32(topic.encode('utf-8')) % len(self.shards))].publish(
+            topic,
+            data,
+            qos
+        )
+
+    def publish_many(self, messages, qos=1):
+        """
+        :param messages: Iterable of (topic, data) tuples
+        :type messages: iterable
+        :param qos
+        :type qos: int
+        :return list: Futures of subsequent messages, see publish()
+        """
+        return [self.publish(topic, data, qos) for (topic, data) in messages]
+
+    def on_trail(self, agent, name, func, lazy=False, throttle=None, filters=None):
+        """
+        Register a callback for the trail sent by particular agent, see StreamHubClient.on_trail()
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected trail name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param func: Callback for trail arrival
+        :type func: callable
+        :param lazy: Pass LazyTrail decoded on first access to value or timestamp
+        :type lazy: bool
+        :param throttle: Rate limit, sampling or coalescing of trails passed to the callback
+        :type throttle: Throttle
+        :param filters: Filters evaluated on decoded trail value before the callback is called
+        :type filters: list
+        :return bool
+        """
+        return self._add_subscription(
+            'trail', agent, name, func, {'lazy': lazy, 'throttle': throttle, 'filters': filters}
+        )
+
+    def on_event(self, agent, name, func, lazy=False, throttle=None, filters=None):
+        """
+        Register a callback for the event sent by particular agent, see StreamHubClient.on_event()
+
+        :param agent: Agent's client id or `+`
+        :type agent: str
+        :param name: Expected event name (may contain `+`/`#` wildcards)
+        :type name: str
+        :param func: Callback for event arrival
+        :type func: callable
+        :param lazy: Pass LazyEvent decoded on first access to message or timestamp
+        :type lazy: bool
+        :param throttle: Rate limit, sampling or coalescing of events passed to the callback
+        :type throttle: Throttle
+        :param filters: Filters evaluated on decoded event message before the callback is called
+        :type filters: list
+        :return bool
+        """
+        return self._add_subscription(
+            'event', agent, name, func, {'lazy': lazy, 'throttle': throttle, 'filters': filters}
+        )
+
+    def _add_subscription(self, handler_type, agent, name, func, options):
+        with self._lock:
+            if not isinstance(agent, str):
+                raise TypeError('agent client id should be a string')
+
+            key = (handler_type, agent, name)
+            previous = self._subscriptions.get(key)
+            index = self._assign(self.shard_for(agent)) if previous is None else previous[2]
+
+            result = self._register(self.shards[index], key, func, options)
+            self._subscriptions[key] = (func, options, index)
+
+            return result
+
+    def _register(self, shard, key, func, options):
+        (handler_type, agent, name) = key
+
+        if handler_type == 'trail':
+            return shard.on_trail(agent, name, func, **options)
+
+        return shard.on_event(agent, name, func, **options)
+
+    def _assign(self, preferred):
+        """
+        :param preferred: Index of preferred shard
+        :type preferred: int
+        :return int: Index of the first connected shard starting from the preferred one, or the preferred one
+            if none is connected
+        """
+        count = len(self.shards)
+
+        for i in range(count):
+            index = (preferred + i) % count
+
+            if self.shards[index].connected.is_set():
+                return index
+
+        return preferred
+
+    def _request_rebalance(self):
+        """
+        Schedules moving subscriptions after a shard connected or disconnected. Called from network thread
+        of the shard, so subscriptions of other shards are not changed there
+
+        :return void
+        """
+        with self._rebalance_condition:
+            if self._stopped:
+                return
+
+            self._rebalance_requests += 1
+
+            if self._rebalance_thread is None:
+                self._rebalance_thread = threading.Thread(
+                    target=self._run_rebalances,
+                    name='VeidesRebalance',
+                    daemon=True
+                )
+                self._rebalance_thread.start()
+
+            self._rebalance_condition.notify_all()
+
+    def _run_rebalances(self):
+        condition = self._rebalance_condition
+
+        while True:
+            with condition:
+                while not self._stopped and self._rebalances == self._rebalance_requests:
+                    condition.wait()
+
+                if self._stopped:
+                    return
+
+                requests = self._rebalance_requests
+
+            try:
+                self._rebalance()
+            except Exception as e:
+                self.logger.error('Could not move subscriptions between shards: %s' % str(e))
+
+            with condition:
+                self._rebalances = requests
+                condition.notify_all()
+
+    def _wait_rebalanced(self, timeout=None):
+        """
+        :param timeout: Time (in seconds) to wait
+        :type timeout: int|float
+        :return bool: True if all requested rebalances are done
+        """
+        with self._rebalance_condition:
+            return self._rebalance_condition.wait_for(
+                lambda: self._rebalances == self._rebalance_requests,
+                timeout
+            )
+
+    def _rebalance(self):
+        """
+        Moves subscriptions to shards they should be assigned to after a shard connected or disconnected
+
+        :return void
+        """
+        with self._lock:
+            # Shard index -> keys of subscriptions moved to it, and from it
+            added = {}
+            removed = {}
+
+            for key, (func, options, current) in self._subscriptions.items():
+                index = self._assign(self.shard_for(key[1]))
+
+                if index != current:
+                    added.setdefault(index, []).append(key)
+                    removed.setdefault(current, []).append(key)
+
+            # Subscribed on the new shards first, so no message is missed in between
+            for index, keys in added.items():
+                shard = self.shards[index]
+
+                with shard.subscription_batch():
+                    for key in keys:
+                        (func, options, _) = self._subscriptions[key]
+                        self._register(shard, key, func, options)
+                        self._subscriptions[key] = (func, options, index)
+
+            for index, keys in removed.items():
+                self.shards[index]._remove_handlers_and_unsubscribe(keys)
+
+            moved = sum(len(keys) for keys in added.values())
+
+        if moved > 0:
+            self.logger.info('Moved %d subscriptions between shards' % moved)
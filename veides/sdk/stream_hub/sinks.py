@@ -0,0 +1,425 @@
+import csv
+import gzip
+import io
+import logging
+import os
+import re
+import threading
+import time
+
+from veides.sdk.stream_hub.codec import default_codec
+from veides.sdk.stream_hub.models import Trail, LazyTrail
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+
+FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+
+# Never call fsync, leaving it to the OS
+FSYNC_NEVER = 'never'
+# Call fsync before a file is closed on rotation or close()
+FSYNC_ON_ROTATE = 'rotate'
+# Call fsync after every bulk write
+FSYNC_ALWAYS = 'always'
+
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_ON_ROTATE, FSYNC_ALWAYS)
+
+FIELDS = ('type', 'agent', 'name', 'value', 'timestamp')
+
+COMPRESSED_SUFFIX = '.gz'
+
+
+def list_files(directory, prefix, file_format):
+    """
+    Returns files written by sinks to the directory, oldest first
+
+    :param directory: Directory containing files
+    :type directory: str
+    :param prefix: File name prefix
+    :type prefix: str
+    :param file_format: 'ndjson' or 'csv'
+    :type file_format: str
+    :return list: List of (sequence, path) tuples
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    pattern = re.compile(r'^{}-(\d+)\.{}(?:{})?$'.format(
+        re.escape(prefix),
+        re.escape(file_format),
+        re.escape(COMPRESSED_SUFFIX)
+    ))
+    files = []
+
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+
+        if match is not None:
+            files.append((int(match.group(1)), os.path.join(directory, name)))
+
+    return sorted(files)
+
+
+class FileSink(object):
+    # Tells the client to call flush() on disconnect
+    flush_on_disconnect = True
+
+    def __init__(
+            self,
+            directory,
+            prefix='stream',
+            file_format=FORMAT_NDJSON,
+            max_file_size=64 * 1024 * 1024,
+            max_file_age=3600,
+            compress=False,
+            compress_level=6,
+            flush_interval=1.0,
+            max_buffer=10000,
+            max_pending=1000000,
+            fsync=FSYNC_ON_ROTATE,
+            codec=None,
+            logger=None
+    ):
+        """
+        Archives trails and events to rotating NDJSON or CSV files. Attach it as on_trail/on_event callback.
+        Callback only appends the record to a buffer. Buffered records are formatted and written in bulk
+        by a background thread every flush_interval seconds, or once max_buffer records are waiting
+
+        Records have type ('trail' or 'event'), agent, name, value (trail value or event message) and timestamp
+
+        :param directory: Directory to store files in. Created if it doesn't exist
+        :type directory: str
+        :param prefix: File name prefix. Files are named `<prefix>-<sequence>.<format>[.gz]`
+        :type prefix: str
+        :param file_format: 'ndjson' or 'csv'
+        :type file_format: str
+        :param max_file_size: Size (in bytes, before compression) after which a new file is started
+        :type max_file_size: int
+        :param max_file_age: Time (in seconds) after which a new file is started. Files are not rotated
+            by time if None
+        :type max_file_age: int|float
+        :param compress: Write gzip-compressed files
+        :type compress: bool
+        :param compress_level: gzip compression level, from 1 (fastest) to 9
+        :type compress_level: int
+        :param flush_interval: Maximum time (in seconds) a record waits in the buffer
+        :type flush_interval: int|float
+        :param max_buffer: Number of buffered records which triggers a write
+        :type max_buffer: int
+        :param max_pending: Maximum number of buffered records. Further records are dropped and counted
+            in `dropped` until the background thread catches up
+        :type max_pending: int
+        :param fsync: 'never', 'rotate' (before file is closed) or 'always' (after every write)
+        :type fsync: str
+        :param codec: JSON codec used for NDJSON. Standard library json module is used by default, pass
+            e.g. OrjsonCodec to write faster
+        :type codec: JsonCodec
+        :param logger: Logger used to report write errors
+        :type logger: logging.Logger
+        """
+        if file_format not in FORMATS:
+            raise ValueError('file_format should be one of: %s' % ', '.join(FORMATS))
+
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError('fsync should be one of: %s' % ', '.join(FSYNC_POLICIES))
+
+        for (name, value) in (('max_file_size', max_file_size), ('max_buffer', max_buffer),
+                              ('max_pending', max_pending)):
+            if not isinstance(value, int) or value < 1:
+                raise ValueError('%s should be a positive integer' % name)
+
+        for (name, value) in (('max_file_age', max_file_age), ('flush_interval', flush_interval)):
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                raise ValueError('%s should be a positive number' % name)
+
+        if flush_interval is None:
+            raise ValueError('flush_interval should be a positive number')
+
+        if not isinstance(compress_level, int) or not 1 <= compress_level <= 9:
+            raise ValueError('compress_level should be an integer between 1 and 9')
+
+        os.makedirs(directory, exist_ok=True)
+
+        existing = list_files(directory, prefix, file_format)
+
+        self.directory = directory
+        self.prefix = prefix
+        self.file_format = file_format
+        self.max_file_size = max_file_size
+        self.max_file_age = max_file_age
+        self.compress = compress
+        self.compress_level = compress_level
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.codec = codec if codec is not None else default_codec()
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self._sequence = existing[-1][0] + 1 if existing else 0
+        self._raw = None
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._opened = None
+
+    @property
+    def path(self):
+        """
+        :return str|None: Path of the file currently written to
+        """
+        return self._path
+
+    def __call__(self, agent, item):
+        """
+        on_trail/on_event callback
+
+        :param agent: Agent's client id
+        :type agent: str
+        :param item: Received trail or event
+        :type item: Trail|Event
+        :return void
+        """
+        if isinstance(item, (Trail, LazyTrail)):
+            self.add('trail', agent, item.name, item.value, item.timestamp)
+        else:
+            self.add('event', agent, item.name, item.message, item.timestamp)
+
+    def add(self, record_type, agent, name, value, timestamp):
+        """
+        Buffers a record
+
+        :param record_type: 'trail' or 'event'
+        :type record_type: str
+        :param agent: Agent's client id
+        :type agent: str
+        :param name: Trail or event name
+        :type name: str
+        :param value: Trail value or event message
+        :param timestamp: Timestamp or epoch seconds
+        :type timestamp: Timestamp|int
+        :return void
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError('sink is closed')
+
+            if len(self._buffer) >= self.max_pending:
+                self.dropped += 1
+                return
+
+            self._buffer.append((record_type, agent, name, value, timestamp))
+            size = len(self._buffer)
+
+            if self._thread is None:
+                self._start()
+
+        if size >= self.max_buffer:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Writes buffered records and flushes the file. Calls fsync unless fsync policy is 'never'
+
+        :return void
+        """
+        with self._write_lock:
+            self._write_pending()
+
+            if self._file is not None:
+                self._flush_file(self.fsync != FSYNC_NEVER)
+
+    def close(self):
+        """
+        Writes buffered records, stops the background thread and closes the file
+
+        :return void
+        """
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._thread = None
+
+        if thread is not None:
+            self._wakeup.set()
+            thread.join()
+
+        with self._write_lock:
+            self._write_pending()
+            self._close_file()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='VeidesSink', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            with self._write_lock:
+                try:
+                    if self._write_pending() and self._file is not None:
+                        self._flush_file(self.fsync == FSYNC_ALWAYS)
+                except (OSError, ValueError) as e:
+                    self.logger.error('Could not write records: %s' % str(e))
+
+            if self._closed:
+                return
+
+    def _write_pending(self):
+        """
+        Formats and writes buffered records. Called with write lock held
+
+        :return int: Number of written records
+        """
+        with self._lock:
+            (records, self._buffer) = (self._buffer, [])
+
+        if not records:
+            return 0
+
+        if self._file is not None and self.max_file_age is not None and \
+                time.monotonic() - self._opened >= self.max_file_age:
+            self._close_file()
+
+        try:
+            data = self._format(records)
+        except (TypeError, ValueError):
+            records = self._formattable(records)
+
+            if not records:
+                return 0
+
+            data = self._format(records)
+
+        try:
+            if self._file is None:
+                self._open_file()
+
+            self._file.write(data)
+        except OSError:
+            self.failed += len(records)
+            raise
+
+        self._size += len(data)
+        self.written += len(records)
+
+        if self._size >= self.max_file_size:
+            self._close_file()
+
+        return len(records)
+
+    def _formattable(self, records):
+        """
+        Formats records one by one after a batch could not be formatted, so only the offending records
+        are counted as failed
+
+        :param records: Buffered records
+        :type records: list
+        :return list: Records which can be formatted
+        """
+        formattable = []
+
+        for record in records:
+            try:
+                self._format([record])
+            except (TypeError, ValueError) as e:
+                self.failed += 1
+                self.logger.error('Could not format %s %s of agent %s: %s' % (record[0], record[2], record[1], str(e)))
+            else:
+                formattable.append(record)
+
+        return formattable
+
+    def _format(self, records):
+        """
+        :param records: Buffered records
+        :type records: list
+        :return bytes
+        """
+        # Many records share the same second, so each timestamp is formatted once per write
+        timestamps = {}
+        rows = []
+
+        for (record_type, agent, name, value, timestamp) in records:
+            formatted = timestamps.get(timestamp)
+
+            if formatted is None:
+                formatted = timestamps[timestamp] = timestamp if isinstance(timestamp, int) else str(timestamp)
+
+            rows.append((record_type, agent, name, value, formatted))
+
+        if self.file_format == FORMAT_CSV:
+            output = io.StringIO()
+            writer = csv.writer(output, lineterminator='\n')
+
+            if self._file is None or self._size == 0:
+                writer.writerow(FIELDS)
+
+            writer.writerows(rows)
+
+            return output.getvalue().encode('utf-8')
+
+        encode = self.codec.encode
+        lines = []
+
+        for row in rows:
+            line = encode(dict(zip(FIELDS, row)))
+            lines.append(line.encode('utf-8') if line.__class__ is str else line)
+
+        lines.append(b'')
+
+        return b'\n'.join(lines)
+
+    def _open_file(self):
+        suffix = '.' + self.file_format + (COMPRESSED_SUFFIX if self.compress else '')
+
+        self._path = os.path.join(self.directory, '{}-{:020d}{}'.format(self.prefix, self._sequence, suffix))
+        self._sequence += 1
+        self._raw = open(self._path, 'ab')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='ab', compresslevel=self.compress_level) \
+            if self.compress else self._raw
+        self._size = 0
+        self._opened = time.monotonic()
+
+    def _flush_file(self, fsync):
+        self._file.flush()
+
+        if self._file is not self._raw:
+            self._raw.flush()
+
+        if fsync:
+            os.fsync(self._raw.fileno())
+
+    def _close_file(self):
+        if self._file is None:
+            return
+
+        if self._file is not self._raw:
+            # Writes gzip trailer
+            self._file.close()
+
+        self._raw.flush()
+
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self._raw.fileno())
+
+        self._raw.close()
+
+        self._raw = None
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._opened = None
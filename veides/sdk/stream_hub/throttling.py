@@ -0,0 +1,141 @@
+import threading
+import time
+
+
+class Throttle(object):
+    def __init__(self, max_rate=None, sample_every=None, coalesce=False, clock=time.monotonic):
+        """
+        Limits trails/events passed to a callback, separately for each agent and trail/event name. Suppressed
+        messages are dropped right after topic matching, before they are decoded
+
+        :param max_rate: Maximum number of messages passed per second. Messages arriving sooner than 1/max_rate
+            seconds after the previously passed one are suppressed
+        :type max_rate: int|float
+        :param sample_every: Pass only every n-th message, starting with the first one
+        :type sample_every: int
+        :param coalesce: Keep only the newest message while the callback is busy and pass it once the callback
+            returns. Takes effect when callbacks run on dispatch executor, since otherwise the callback is always
+            free when a message arrives
+        :type coalesce: bool
+        :param clock: Time source (in seconds)
+        :type clock: callable
+        """
+        if max_rate is not None and (not isinstance(max_rate, (int, float)) or max_rate <= 0):
+            raise ValueError('max_rate should be a positive number')
+
+        if sample_every is not None and (not isinstance(sample_every, int) or sample_every < 1):
+            raise ValueError('sample_every should be a positive integer')
+
+        self.max_rate = max_rate
+        self.sample_every = sample_every
+        self.coalesce = coalesce
+        self.clock = clock
+
+        self.rate_limited = 0
+        self.sampled_out = 0
+        self.coalesced = 0
+
+        self._interval = 1.0 / max_rate if max_rate is not None else None
+        # (agent, name) -> time the next message may be passed at
+        self._next_allowed = {}
+        # (agent, name) -> number of messages seen
+        self._seen = {}
+        # (agent, name) -> newest payload waiting for the callback, or None if delivery is scheduled
+        # and nothing newer arrived
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def suppressed(self):
+        """
+        :return int: Number of messages not passed to the callback
+        """
+        return self.rate_limited + self.sampled_out + self.coalesced
+
+    def allow(self, key):
+        """
+        Applies sampling and rate limit. Called from a single (network) thread
+
+        :param key: (agent, name) tuple
+        :type key: tuple
+        :return bool: False if the message should be suppressed
+        """
+        if self.sample_every is not None:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+
+            if seen % self.sample_every != 0:
+                self.sampled_out += 1
+                return False
+
+        if self._interval is not None:
+            now = self.clock()
+
+            if now < self._next_allowed.get(key, now):
+                self.rate_limited += 1
+                return False
+
+            self._next_allowed[key] = now + self._interval
+
+        return True
+
+    def offer(self, key, payload):
+        """
+        Stores the newest payload of the key for coalesced delivery
+
+        :param key: (agent, name) tuple
+        :type key: tuple
+        :param payload: Raw message payload
+        :type payload: bytes
+        :return bool: True if delivery should be scheduled, False if it's already scheduled
+        """
+        with self._lock:
+            if key in self._pending:
+                if self._pending[key] is not None:
+                    self.coalesced += 1
+
+                self._pending[key] = payload
+                return False
+
+            self._pending[key] = payload
+            return True
+
+    def take(self, key):
+        """
+        :param key: (agent, name) tuple
+        :type key: tuple
+        :return bytes: The newest payload of the key
+        """
+        with self._lock:
+            payload = self._pending[key]
+            self._pending[key] = None
+
+            return payload
+
+    def done(self, key):
+        """
+        Called once the callback returned
+
+        :param key: (agent, name) tuple
+        :type key: tuple
+        :return bool: True if a newer payload arrived in the meantime and delivery should be scheduled again
+        """
+        with self._lock:
+            if self._pending[key] is None:
+                del self._pending[key]
+                return False
+
+            return True
+
+    def cancel(self, key):
+        """
+        Drops the payload waiting for scheduled delivery which can't happen, e.g. because dispatch
+        executor dropped it
+
+        :param key: (agent, name) tuple
+        :type key: tuple
+        :return void
+        """
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.coalesced += 1
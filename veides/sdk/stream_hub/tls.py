@@ -0,0 +1,127 @@
+import os
+import ssl
+import threading
+
+# (capath, cafile) -> (signature of CA files, SSLContext)
+_contexts = {}
+_lock = threading.Lock()
+
+
+def _signature(path):
+    """
+    :return tuple|None: Modification time and size of file or directory, or None if it doesn't exist
+    """
+    if path is None:
+        return None
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def shared_ssl_context(capath=None, cafile=None):
+    """
+    Returns process-wide SSL context trusting given certificates, so clients using the same certificates
+    don't load them separately. Context is created again when certificates file or directory was modified
+    since it was cached
+
+    Shared contexts should not be modified
+
+    :param capath: Path to certificates directory
+    :type capath: str
+    :param cafile: Path to certificates file
+    :type cafile: str
+    :raises ssl.SSLError: If certificates can't be loaded
+    :return ssl.SSLContext
+    """
+    key = (capath, cafile)
+    signature = (_signature(capath), _signature(cafile))
+
+    with _lock:
+        cached = _contexts.get(key)
+
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    context = ssl.create_default_context(capath=capath, cafile=cafile)
+
+    with _lock:
+        _contexts[key] = (signature, context)
+
+    return context
+
+
+def invalidate_ssl_contexts(capath=None, cafile=None):
+    """
+    Drops cached SSL contexts, e.g. after certificates were replaced in place. Clients created later
+    load certificates again
+
+    :param capath: Drop only contexts using this certificates directory
+    :type capath: str
+    :param cafile: Drop only contexts using this certificates file
+    :type cafile: str
+    :return int: Number of dropped contexts
+    """
+    with _lock:
+        keys = [
+            key for key in _contexts
+            if (capath is None or key[0] == capath) and (cafile is None or key[1] == cafile)
+        ]
+
+        for key in keys:
+            del _contexts[key]
+
+    return len(keys)
+
+
+class SessionReusingContext(object):
+    def __init__(self, context):
+        """
+        Wraps SSL context passed to MQTT lib, so the TLS session of the previous connection is offered when
+        reconnecting and the server can resume it instead of doing a full handshake
+
+        :param context: Context to wrap
+        :type context: ssl.SSLContext
+        """
+        self.context = context
+        self.session = None
+        self.resumed = 0
+        self._socket = None
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+    def wrap_socket(self, sock, **kwargs):
+        """
+        :return ssl.SSLSocket
+        """
+        if self.session is not None and 'server_hostname' in kwargs:
+            kwargs['session'] = self.session
+
+        self._socket = self.context.wrap_socket(sock, **kwargs)
+
+        return self._socket
+
+    def save_session(self):
+        """
+        Keeps session of the current connection to be resumed later. Should be called once some data
+        was received, since TLS 1.3 servers send session tickets after handshake
+
+        :return void
+        """
+        sock = self._socket
+
+        if sock is None:
+            return
+
+        try:
+            if sock.session_reused:
+                self.resumed += 1
+
+            self.session = sock.session
+        except (ValueError, OSError):
+            # Socket is already closed
+            pass
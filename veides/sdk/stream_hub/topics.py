@@ -0,0 +1,225 @@
+import threading
+
+SINGLE_LEVEL_WILDCARD = '+'
+MULTI_LEVEL_WILDCARD = '#'
+
+
+class _Node(object):
+    __slots__ = ('children', 'value', 'has_value')
+
+    def __init__(self):
+        self.children = {}
+        self.value = None
+        self.has_value = False
+
+
+class TopicTrie(object):
+    def __init__(self):
+        """
+        Maps MQTT topic filters (with `+` and `#` wildcards) to values and resolves a topic
+        to the values of all matching filters in O(topic depth)
+        """
+        self._root = _Node()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, topic_filter):
+        node = self._find(topic_filter)
+
+        return node is not None and node.has_value
+
+    def add(self, topic_filter, value):
+        """
+        Stores a value for the topic filter. Value previously stored for the same filter is replaced
+
+        :param topic_filter: MQTT topic filter
+        :type topic_filter: str
+        :param value: Value to store
+        :type value: object
+        :return void
+        """
+        validate_topic_filter(topic_filter)
+
+        with self._lock:
+            node = self._root
+
+            for level in topic_filter.split('/'):
+                child = node.children.get(level)
+
+                if child is None:
+                    child = node.children[level] = _Node()
+
+                node = child
+
+            if not node.has_value:
+                self._size += 1
+
+            node.value = value
+            node.has_value = True
+
+    def get(self, topic_filter, default=None):
+        """
+        :param topic_filter: MQTT topic filter
+        :type topic_filter: str
+        :param default: Value returned when filter is not stored
+        :return object
+        """
+        node = self._find(topic_filter)
+
+        if node is None or not node.has_value:
+            return default
+
+        return node.value
+
+    def remove(self, topic_filter):
+        """
+        Removes value stored for the topic filter
+
+        :param topic_filter: MQTT topic filter
+        :type topic_filter: str
+        :return bool: False if filter was not stored
+        """
+        with self._lock:
+            path = []
+            node = self._root
+
+            for level in topic_filter.split('/'):
+                child = node.children.get(level)
+
+                if child is None:
+                    return False
+
+                path.append((node, level))
+                node = child
+
+            if not node.has_value:
+                return False
+
+            node.value = None
+            node.has_value = False
+            self._size -= 1
+
+            for parent, level in reversed(path):
+                child = parent.children[level]
+
+                if child.has_value or child.children:
+                    break
+
+                del parent.children[level]
+
+            return True
+
+    def match(self, topic):
+        """
+        Returns values of all filters matching the topic
+
+        :param topic: Topic of received message (without wildcards)
+        :type topic: str
+        :return list
+        """
+        result = []
+        levels = topic.split('/')
+        depth = len(levels)
+        nodes = [self._root]
+
+        for i in range(depth):
+            level = levels[i]
+            next_nodes = []
+
+            for node in nodes:
+                children = node.children
+
+                if not children:
+                    continue
+
+                multi = children.get(MULTI_LEVEL_WILDCARD)
+
+                if multi is not None and multi.has_value:
+                    result.append(multi.value)
+
+                child = children.get(level)
+
+                if child is not None:
+                    next_nodes.append(child)
+
+                single = children.get(SINGLE_LEVEL_WILDCARD)
+
+                if single is not None:
+                    next_nodes.append(single)
+
+            if not next_nodes:
+                return result
+
+            nodes = next_nodes
+
+        for node in nodes:
+            if node.has_value:
+                result.append(node.value)
+
+            # `a/#` matches `a` as well
+            multi = node.children.get(MULTI_LEVEL_WILDCARD)
+
+            if multi is not None and multi.has_value:
+                result.append(multi.value)
+
+        return result
+
+    def filters(self):
+        """
+        Returns all stored topic filters
+
+        :return list
+        """
+        result = []
+        stack = [(self._root, [])]
+
+        while stack:
+            node, levels = stack.pop()
+
+            if node.has_value:
+                result.append('/'.join(levels))
+
+            for level, child in node.children.items():
+                stack.append((child, levels + [level]))
+
+        return result
+
+    def _find(self, topic_filter):
+        node = self._root
+
+        for level in topic_filter.split('/'):
+            node = node.children.get(level)
+
+            if node is None:
+                return None
+
+        return node
+
+
+def validate_topic_filter(topic_filter):
+    """
+    :param topic_filter: MQTT topic filter
+    :type topic_filter: str
+    :raises ValueError: If wildcards are used improperly
+    :return void
+    """
+    levels = topic_filter.split('/')
+
+    for i, level in enumerate(levels):
+        if level == MULTI_LEVEL_WILDCARD:
+            if i != len(levels) - 1:
+                raise ValueError("'#' wildcard is allowed only as the last topic level")
+        elif level != SINGLE_LEVEL_WILDCARD and (SINGLE_LEVEL_WILDCARD in level or MULTI_LEVEL_WILDCARD in level):
+            raise ValueError("Wildcards should occupy an entire topic level")
+
+
+def is_wildcard(topic_filter):
+    """
+    :param topic_filter: MQTT topic filter
+    :type topic_filter: str
+    :return bool
+    """
+    return SINGLE_LEVEL_WILDCARD in topic_filter or MULTI_LEVEL_WILDCARD in topic_filter